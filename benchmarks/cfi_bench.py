@@ -0,0 +1,86 @@
+import argparse
+
+from typing import Any, Callable
+from epubcfi.cfi import (
+  parse, split, parse_lines, to_absolute, dumps_many, group_by_spine, union_ranges, Path, PathRange,
+  PathColumns, PathStore, SpatialIndex, SpatialOffset, reconcile,
+)
+from epubcfi.cfi.handler import _capture_cfi
+from epubcfi.cfi.tokenizer import Tokenizer, EOF
+from .corpus import SHAPES, generate
+from .runner import Runner, print_result
+
+
+def _tokenize(texts: list[str]):
+  for text in texts:
+    tokenizer = Tokenizer(text)
+    while not isinstance(tokenizer.read(), EOF):
+      pass
+
+def _cases(texts: list[str]) -> dict[str, tuple[int, Callable[[], Any]]]:
+  cfi_texts = [_capture_cfi(text)[1] for text in texts]
+  paths = [parse(text) for text in texts]
+  ranges = [path for path in paths if isinstance(path, PathRange)]
+  points = [path for path in paths if isinstance(path, Path)]
+  pairs = list(zip(points, points[1:]))
+  strings = [str(path) for path in paths]
+  sorted_ranges = sorted(ranges, key=lambda r: r.absolute_start)
+  spatial = [path for path in points if isinstance(path.offset, SpatialOffset)]
+  spatial_index = SpatialIndex(spatial)
+  store = PathStore(points)
+  encoded_texts = [text.encode("utf8") for text in texts]
+  lines = "\n".join(texts).encode("utf8")
+
+  return {
+    "tokenize": (len(cfi_texts), lambda: _tokenize(cfi_texts)),
+    "parse": (len(texts), lambda: [parse(text) for text in texts]),
+    "parse_bytes": (len(encoded_texts), lambda: [parse(text) for text in encoded_texts]),
+    "parse_lines": (len(texts), lambda: list(parse_lines(lines))),
+    "split": (len(texts), lambda: [split(text) for text in texts]),
+    "to_absolute": (len(ranges), lambda: [to_absolute(r) for r in ranges]),
+    "compare": (len(pairs), lambda: [(a < b, a == b) for a, b in pairs]),
+    "sorted": (len(paths), lambda: sorted(paths)),
+    "str": (len(paths), lambda: [str(path) for path in paths]),
+    "str_uncached": (len(points), lambda: [str(Path(path.steps, path.offset)) for path in points]),
+    "dumps_many": (len(paths), lambda: dumps_many(paths)),
+    "roundtrip": (len(strings), lambda: [str(parse(f"epubcfi({text})")) for text in strings]),
+    "group_by_spine": (len(texts), lambda: group_by_spine(texts)),
+    "union_ranges": (len(sorted_ranges), lambda: union_ranges(sorted_ranges)),
+    "spatial_nearest": (
+      len(spatial),
+      lambda: [spatial_index.nearest(path, path.offset.x, path.offset.y, k=3) for path in spatial],
+    ),
+    "store_add": (len(points), lambda: PathStore(points)),
+    "store_sorted": (len(points), lambda: list(store.iter_sorted())),
+    "reconcile": (len(paths), lambda: reconcile(paths, paths[len(paths) // 2:] + paths[:len(paths) // 4])),
+    "columnar_sorted": (len(points), lambda: PathColumns(points).sorted()),
+  }
+
+def main(argv: list[str] | None = None):
+  parser = argparse.ArgumentParser(description="benchmarks of the epubcfi.cfi package")
+  parser.add_argument("--size", type=int, default=5000, help="CFIs per corpus")
+  parser.add_argument("--seed", type=int, default=0)
+  parser.add_argument("--repeats", type=int, default=5)
+  parser.add_argument("--corpus", nargs="*", default=list(SHAPES.keys()), choices=list(SHAPES.keys()))
+  parser.add_argument("--case", nargs="*", default=None, help="only run these cases")
+  parser.add_argument("--no-allocations", action="store_true", help="skip the tracemalloc pass")
+  parser.add_argument("--output", default=None, help="save the results as JSON")
+  args = parser.parse_args(argv)
+
+  runner = Runner(repeats=args.repeats, measure_allocations=not args.no_allocations)
+  for corpus_name in args.corpus:
+    texts = generate(SHAPES[corpus_name], args.size, args.seed)
+    for name, (operations, func) in _cases(texts).items():
+      if operations == 0 or (args.case is not None and name not in args.case):
+        continue
+      print_result(runner.run(name, corpus_name, operations, func))
+
+  if args.output is not None:
+    runner.save(args.output, {
+      "suite": "cfi",
+      "size": args.size,
+      "seed": args.seed,
+    })
+
+if __name__ == "__main__":
+  main()
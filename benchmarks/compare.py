@@ -0,0 +1,42 @@
+import sys
+import json
+import argparse
+
+def main(argv: list[str] | None = None) -> int:
+  parser = argparse.ArgumentParser(description="compare two benchmark result files")
+  parser.add_argument("baseline")
+  parser.add_argument("current")
+  parser.add_argument("--threshold", type=float, default=0.1, help="slowdown ratio reported as regression")
+  args = parser.parse_args(argv)
+
+  baseline = _load(args.baseline)
+  current = _load(args.current)
+  regressions: int = 0
+
+  for key, result in current.items():
+    base = baseline.get(key, None)
+    name, corpus = key
+    if base is None:
+      print(f"{name:<16} {corpus:<12} {result['ops_per_sec']:>14,.0f} ops/s (new)")
+      continue
+    ratio = result["ops_per_sec"] / base["ops_per_sec"] if base["ops_per_sec"] > 0 else float("inf")
+    mark = ""
+    if ratio < 1.0 - args.threshold:
+      mark = " REGRESSION"
+      regressions += 1
+    print(
+      f"{name:<16} {corpus:<12} {base['ops_per_sec']:>14,.0f} -> " +
+      f"{result['ops_per_sec']:>14,.0f} ops/s {ratio:>6.2f}x{mark}",
+    )
+  return 1 if regressions > 0 else 0
+
+def _load(path: str) -> dict[tuple[str, str], dict]:
+  with open(path, "r", encoding="utf8") as file:
+    data = json.load(file)
+  return {
+    (result["name"], result["corpus"]): result
+    for result in data["results"]
+  }
+
+if __name__ == "__main__":
+  sys.exit(main())
@@ -0,0 +1,74 @@
+import random
+
+from dataclasses import dataclass
+
+# characters that must be escaped with "^" inside an assertion, plus some plain ones
+_ASSERTION_CHARS = "abcdefghijklmnopqrstuvwxyz0123456789-_.^[](),;="
+_ESCAPED_CHARS = "^[](),;="
+
+@dataclass
+class CorpusShape:
+  min_depth: int = 2
+  max_depth: int = 12
+  assertion_rate: float = 0.2
+  escape_rate: float = 0.1
+  range_rate: float = 0.3
+  temporal_rate: float = 0.05
+  spatial_rate: float = 0.05
+
+SHAPES: dict[str, CorpusShape] = {
+  "shallow": CorpusShape(min_depth=2, max_depth=4, assertion_rate=0.0, range_rate=0.0),
+  "reader": CorpusShape(),
+  "deep": CorpusShape(min_depth=16, max_depth=40, assertion_rate=0.1),
+  "assertions": CorpusShape(assertion_rate=0.9, escape_rate=0.3),
+  "media": CorpusShape(range_rate=0.0, temporal_rate=0.4, spatial_rate=0.4),
+  "ranges": CorpusShape(range_rate=1.0),
+}
+
+def generate(shape: CorpusShape, size: int, seed: int = 0) -> list[str]:
+  rand = random.Random(seed)
+  # books have few spine items, annotations of one book share long prefixes
+  spine = [_spine_step(rand, index) for index in range(1, 40)]
+  return [_cfi(rand, shape, spine) for _ in range(size)]
+
+def _cfi(rand: random.Random, shape: CorpusShape, spine: list[str]) -> str:
+  prefix = rand.choice(spine)
+  depth = rand.randint(shape.min_depth, shape.max_depth)
+  steps = "".join(_step(rand, shape) for _ in range(depth))
+
+  if rand.random() < shape.range_rate:
+    start = _step(rand, shape, odd=True) + f":{rand.randint(0, 400)}"
+    end = _step(rand, shape, odd=True) + f":{rand.randint(0, 400)}"
+    return f"book.epub#epubcfi({prefix}!{steps},{start},{end})"
+
+  return f"book.epub#epubcfi({prefix}!{steps}{_offset(rand, shape)})"
+
+def _spine_step(rand: random.Random, index: int) -> str:
+  return f"/6/{index * 2}[{_assertion_text(rand, 0.0)}]"
+
+def _step(rand: random.Random, shape: CorpusShape, odd: bool = False) -> str:
+  index = rand.randint(1, 60) * 2
+  if odd:
+    index -= 1
+  if rand.random() < shape.assertion_rate:
+    return f"/{index}[{_assertion_text(rand, shape.escape_rate)}]"
+  return f"/{index}"
+
+def _offset(rand: random.Random, shape: CorpusShape) -> str:
+  value = rand.random()
+  if value < shape.temporal_rate:
+    if rand.random() < 0.5:
+      return f"~{rand.randint(0, 7200)}"
+    return f"~{rand.randint(0, 7200)}@{rand.randint(0, 100)}:{rand.randint(0, 100)}"
+  if value < shape.temporal_rate + shape.spatial_rate:
+    return f"@{rand.randint(0, 100)}:{rand.randint(0, 100)}"
+  return f"/{rand.randint(0, 30) * 2 + 1}:{rand.randint(0, 2000)}"
+
+def _assertion_text(rand: random.Random, escape_rate: float) -> str:
+  chars: list[str] = []
+  for _ in range(rand.randint(3, 16)):
+    if rand.random() < escape_rate:
+      chars.append("^" + rand.choice(_ESCAPED_CHARS))
+    else:
+      chars.append(rand.choice(_ASSERTION_CHARS[:38]))
+  return "".join(chars)
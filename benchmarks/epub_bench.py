@@ -0,0 +1,88 @@
+import os
+import shutil
+import argparse
+import tempfile
+
+from epubcfi.cfi import parse
+from epubcfi.epub import EpubNode, Catalog
+from epubcfi.epub.unzip import Unzip
+from epubcfi.epub.picker import pick
+from epubcfi.epub.shared import publish_book, attach_book
+from .epub_generator import SIZES, generate_epub, sample_cfis
+from .runner import Runner, print_result
+
+
+def _bench_size(runner: Runner, size_name: str, temp_path: str, labels: int):
+  shape = SIZES[size_name]
+  epub_path = generate_epub(os.path.join(temp_path, f"{size_name}.epub"), shape)
+  cfis = [parse(cfi) for cfi in sample_cfis(shape, labels)]
+
+  def extract():
+    cache_path = tempfile.mkdtemp(dir=temp_path)
+    Unzip(cache_path).unzip_file(epub_path)
+    shutil.rmtree(cache_path)
+
+  def scan():
+    # a new catalog every time, otherwise the book is skipped as unchanged
+    db_path = os.path.join(tempfile.mkdtemp(dir=temp_path), "catalog.db")
+    with Catalog(db_path, workers=0) as catalog:
+      catalog.scan(os.path.dirname(epub_path))
+    shutil.rmtree(os.path.dirname(db_path))
+
+  def cold_label():
+    with EpubNode(cache_path=tempfile.mkdtemp(dir=temp_path), remove_cache_path=True) as node:
+      node.ncx_label(epub_path, cfis[0])
+
+  warm_node = EpubNode(cache_path=tempfile.mkdtemp(dir=temp_path), remove_cache_path=True)
+  extracted_path = Unzip(tempfile.mkdtemp(dir=temp_path)).unzip_file(epub_path)
+
+  try:
+    print_result(runner.run("extract", size_name, 1, extract))
+    print_result(runner.run("pick", size_name, 1, lambda: pick(extracted_path)))
+    # what another process pays for the book once the first one published it
+    index_path = f"{extracted_path}.book"
+    publish_book(index_path, pick(extracted_path))
+    print_result(runner.run("attach_book", size_name, 1, lambda: attach_book(index_path)))
+    print_result(runner.run("catalog_scan", size_name, 1, scan))
+    print_result(runner.run("label_cold", size_name, 1, cold_label))
+    print_result(runner.run(
+      "label_warm", size_name, len(cfis),
+      lambda: [warm_node.ncx_label(epub_path, cfi) for cfi in cfis],
+    ))
+    # the first call builds the length table of the whole book
+    warm_node.progress(epub_path, cfis[0])
+    print_result(runner.run(
+      "progress_warm", size_name, len(cfis),
+      lambda: [warm_node.progress(epub_path, cfi) for cfi in cfis],
+    ))
+    # the first search indexes every document, the next ones only read the postings
+    warm_node.search(epub_path, "the")
+    print_result(runner.run("search_warm", size_name, 1, lambda: warm_node.search(epub_path, "the")))
+  finally:
+    warm_node.__exit__(None, None, None)
+
+def main(argv: list[str] | None = None):
+  parser = argparse.ArgumentParser(description="end-to-end benchmarks on synthetic EPUB files")
+  parser.add_argument("--sizes", nargs="*", default=list(SIZES.keys()), choices=list(SIZES.keys()))
+  parser.add_argument("--labels", type=int, default=200, help="labels looked up by the warm benchmark")
+  parser.add_argument("--repeats", type=int, default=3)
+  parser.add_argument("--allocations", action="store_true", help="also run the tracemalloc pass")
+  parser.add_argument("--output", default=None, help="save the results as JSON")
+  args = parser.parse_args(argv)
+
+  runner = Runner(repeats=args.repeats, measure_allocations=args.allocations)
+  temp_path = tempfile.mkdtemp()
+  try:
+    for size_name in args.sizes:
+      _bench_size(runner, size_name, temp_path, args.labels)
+  finally:
+    shutil.rmtree(temp_path)
+
+  if args.output is not None:
+    runner.save(args.output, {
+      "suite": "epub",
+      "sizes": { name: vars(SIZES[name]) for name in args.sizes },
+    })
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,171 @@
+import os
+import random
+import zipfile
+
+from dataclasses import dataclass, replace
+from xml.sax.saxutils import escape
+
+_WORDS = (
+  "the of and to in that it was he for on are as with his they at be this from have or one had by word but " +
+  "not what all were we when your can said there use an each which she do how their if will up other about out " +
+  "many then them these so some her would make like him into time has look two more write go see number no way"
+).split()
+_FIXED_DATE = (2020, 1, 1, 0, 0, 0)
+
+@dataclass
+class BookShape:
+  spine_length: int = 20
+  chapter_paragraphs: int = 40
+  paragraph_words: int = 60
+  nesting_depth: int = 1
+  ncx_entries: int | None = None
+  asset_count: int = 0
+  asset_bytes: int = 0
+  seed: int = 0
+
+SIZES: dict[str, BookShape] = {
+  "tiny": BookShape(spine_length=3, chapter_paragraphs=10),
+  "small": BookShape(spine_length=20),
+  "medium": BookShape(spine_length=80, chapter_paragraphs=80, nesting_depth=2, asset_count=20, asset_bytes=2 << 20),
+  "large": BookShape(
+    spine_length=300,
+    chapter_paragraphs=120,
+    nesting_depth=4,
+    ncx_entries=1200,
+    asset_count=100,
+    asset_bytes=20 << 20,
+  ),
+}
+
+def generate_epub(path: str, shape: BookShape) -> str:
+  rand = random.Random(shape.seed)
+  with zipfile.ZipFile(path, "w") as zip_file:
+    _write(zip_file, "mimetype", "application/epub+zip", zipfile.ZIP_STORED)
+    _write(zip_file, "META-INF/container.xml", _container())
+    _write(zip_file, "OEBPS/content.opf", _package(shape))
+    _write(zip_file, "OEBPS/toc.ncx", _ncx(shape))
+    for index in range(shape.spine_length):
+      _write(zip_file, f"OEBPS/{_chapter_name(index)}", _chapter(rand, shape, index))
+    for index in range(shape.asset_count):
+      # random bytes do not compress, like the images and fonts of real books
+      data = rand.randbytes(shape.asset_bytes // shape.asset_count)
+      _write(zip_file, f"OEBPS/images/{_asset_name(index)}", data, zipfile.ZIP_STORED)
+  return path
+
+# CFIs pointing at the paragraphs of the generated chapters, in a deterministic order
+def sample_cfis(shape: BookShape, count: int, seed: int = 0) -> list[str]:
+  rand = random.Random(seed)
+  cfis: list[str] = []
+  for _ in range(count):
+    chapter = rand.randrange(shape.spine_length)
+    paragraph = rand.randrange(shape.chapter_paragraphs)
+    sections = "/2" * shape.nesting_depth
+    offset = rand.randrange(shape.paragraph_words)
+    cfis.append(f"book.epub#epubcfi(/6/{(chapter + 1) * 2}!/4{sections}/{(paragraph + 1) * 2}/1:{offset})")
+  return cfis
+
+def _write(zip_file: zipfile.ZipFile, name: str, data: str | bytes, compress_type: int = zipfile.ZIP_DEFLATED):
+  info = zipfile.ZipInfo(name, date_time=_FIXED_DATE)
+  info.compress_type = compress_type
+  if isinstance(data, str):
+    data = data.encode("utf8")
+  zip_file.writestr(info, data)
+
+def _chapter_name(index: int) -> str:
+  return f"chapter{index + 1:04}.xhtml"
+
+def _asset_name(index: int) -> str:
+  return f"image{index + 1:04}.bin"
+
+def _container() -> str:
+  return (
+    "<?xml version=\"1.0\" encoding=\"UTF-8\"?>\n" +
+    "<container xmlns=\"urn:oasis:names:tc:opendocument:xmlns:container\" version=\"1.0\">\n" +
+    "<rootfiles>\n" +
+    "<rootfile full-path=\"OEBPS/content.opf\" media-type=\"application/oebps-package+xml\"/>\n" +
+    "</rootfiles>\n" +
+    "</container>\n"
+  )
+
+def _package(shape: BookShape) -> str:
+  items: list[str] = ["<item id=\"ncx\" href=\"toc.ncx\" media-type=\"application/x-dtbncx+xml\"/>"]
+  itemrefs: list[str] = []
+  for index in range(shape.spine_length):
+    items.append(
+      f"<item id=\"c{index + 1}\" href=\"{_chapter_name(index)}\" media-type=\"application/xhtml+xml\"/>",
+    )
+    itemrefs.append(f"<itemref idref=\"c{index + 1}\"/>")
+  for index in range(shape.asset_count):
+    items.append(
+      f"<item id=\"a{index + 1}\" href=\"images/{_asset_name(index)}\" media-type=\"application/octet-stream\"/>",
+    )
+  return (
+    "<?xml version=\"1.0\" encoding=\"UTF-8\"?>\n" +
+    "<package xmlns=\"http://www.idpf.org/2007/opf\" unique-identifier=\"uid\" version=\"3.0\">\n" +
+    "<metadata xmlns:dc=\"http://purl.org/dc/elements/1.1/\">\n" +
+    f"<dc:identifier id=\"uid\">generated-{shape.seed}</dc:identifier>\n" +
+    f"<dc:title>Generated Book {shape.seed}</dc:title>\n" +
+    "<dc:creator>Generator</dc:creator>\n" +
+    "<dc:language>en</dc:language>\n" +
+    "</metadata>\n" +
+    "<manifest>\n" + "\n".join(items) + "\n</manifest>\n" +
+    "<spine toc=\"ncx\">\n" + "\n".join(itemrefs) + "\n</spine>\n" +
+    "</package>\n"
+  )
+
+def _ncx(shape: BookShape) -> str:
+  entries = shape.ncx_entries or shape.spine_length
+  nav_points: list[str] = []
+  for index in range(entries):
+    # chapters first, the remaining entries point to paragraphs inside them
+    chapter = index % shape.spine_length
+    href = _chapter_name(chapter)
+    label = f"Chapter {chapter + 1}"
+    if index >= shape.spine_length:
+      paragraph = (index // shape.spine_length) % shape.chapter_paragraphs
+      href = f"{href}#p{paragraph + 1}"
+      label = f"{label}, part {paragraph + 1}"
+    nav_points.append(
+      f"<navPoint id=\"n{index + 1}\" playOrder=\"{index + 1}\">" +
+      f"<navLabel><text>{escape(label)}</text></navLabel>" +
+      f"<content src=\"{href}\"/></navPoint>",
+    )
+  return (
+    "<?xml version=\"1.0\" encoding=\"UTF-8\"?>\n" +
+    "<ncx xmlns=\"http://www.daisy.org/z3986/2005/ncx/\" version=\"2005-1\">\n" +
+    f"<head><meta name=\"dtb:uid\" content=\"generated-{shape.seed}\"/></head>\n" +
+    f"<docTitle><text>Generated Book {shape.seed}</text></docTitle>\n" +
+    "<navMap>\n" + "\n".join(nav_points) + "\n</navMap>\n" +
+    "</ncx>\n"
+  )
+
+def _chapter(rand: random.Random, shape: BookShape, index: int) -> str:
+  paragraphs: list[str] = []
+  for paragraph in range(shape.chapter_paragraphs):
+    words = " ".join(rand.choice(_WORDS) for _ in range(shape.paragraph_words))
+    paragraphs.append(f"<p id=\"p{paragraph + 1}\">{words}</p>")
+  body = "".join(paragraphs)
+  for _ in range(shape.nesting_depth):
+    body = f"<section>{body}</section>"
+  return (
+    "<?xml version=\"1.0\" encoding=\"UTF-8\"?>\n" +
+    "<html xmlns=\"http://www.w3.org/1999/xhtml\">" +
+    f"<head><title>Chapter {index + 1}</title></head>" +
+    f"<body>{body}</body>" +
+    "</html>\n"
+  )
+
+def main():
+  # pylint: disable=import-outside-toplevel
+  import argparse
+  parser = argparse.ArgumentParser(description="write a synthetic EPUB file")
+  parser.add_argument("output")
+  parser.add_argument("--size", default="small", choices=list(SIZES.keys()))
+  parser.add_argument("--seed", type=int, default=0)
+  args = parser.parse_args()
+  shape = replace(SIZES[args.size], seed=args.seed)
+  generate_epub(args.output, shape)
+  print(f"{args.output}: {os.path.getsize(args.output):,} bytes")
+
+if __name__ == "__main__":
+  main()
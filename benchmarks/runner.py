@@ -0,0 +1,93 @@
+import gc
+import sys
+import json
+import time
+import platform
+import tracemalloc
+
+from dataclasses import dataclass, asdict
+from typing import Any, Callable
+
+@dataclass
+class BenchmarkResult:
+  name: str
+  corpus: str
+  operations: int
+  repeats: int
+  best_seconds: float
+  ops_per_sec: float
+  peak_bytes: int
+  retained_bytes: int
+  retained_blocks: int
+
+class Runner:
+  def __init__(self, repeats: int = 5, measure_allocations: bool = True):
+    self._repeats: int = repeats
+    self._measure_allocations: bool = measure_allocations
+    self.results: list[BenchmarkResult] = []
+
+  def run(self, name: str, corpus: str, operations: int, func: Callable[[], Any]) -> BenchmarkResult:
+    func()  # warm up caches and lazy imports
+    best_seconds = float("inf")
+    for _ in range(self._repeats):
+      gc.collect()
+      started_at = time.perf_counter()
+      func()
+      best_seconds = min(best_seconds, time.perf_counter() - started_at)
+
+    peak_bytes, retained_bytes, retained_blocks = 0, 0, 0
+    if self._measure_allocations:
+      peak_bytes, retained_bytes, retained_blocks = self._allocations(func)
+
+    result = BenchmarkResult(
+      name=name,
+      corpus=corpus,
+      operations=operations,
+      repeats=self._repeats,
+      best_seconds=best_seconds,
+      ops_per_sec=operations / best_seconds if best_seconds > 0.0 else 0.0,
+      peak_bytes=peak_bytes,
+      retained_bytes=retained_bytes,
+      retained_blocks=retained_blocks,
+    )
+    self.results.append(result)
+    return result
+
+  def _allocations(self, func: Callable[[], Any]) -> tuple[int, int, int]:
+    # python has no allocation counter: report the high-water mark of one run,
+    # and what the run left behind (its return value included)
+    gc.collect()
+    blocks = sys.getallocatedblocks()
+    tracemalloc.start()
+    try:
+      start_bytes, _ = tracemalloc.get_traced_memory()
+      value = func()
+      current_bytes, peak_bytes = tracemalloc.get_traced_memory()
+    finally:
+      tracemalloc.stop()
+    retained_blocks = sys.getallocatedblocks() - blocks
+    del value
+    return peak_bytes - start_bytes, current_bytes - start_bytes, retained_blocks
+
+  def save(self, path: str, meta: dict[str, Any]):
+    with open(path, "w", encoding="utf8") as file:
+      json.dump({
+        "meta": { **environment(), **meta },
+        "results": [asdict(result) for result in self.results],
+      }, file, indent=2)
+
+def environment() -> dict[str, Any]:
+  return {
+    "python": platform.python_version(),
+    "implementation": platform.python_implementation(),
+    "platform": platform.platform(),
+    "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+  }
+
+def print_result(result: BenchmarkResult):
+  latency_ms = result.best_seconds * 1000.0 / result.operations
+  print(
+    f"{result.name:<16} {result.corpus:<12} {result.ops_per_sec:>14,.0f} ops/s {latency_ms:>10.4f} ms/op " +
+    f"{result.peak_bytes / result.operations:>10,.1f} peak B/op " +
+    f"{result.retained_bytes / result.operations:>10,.1f} retained B/op",
+  )
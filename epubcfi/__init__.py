@@ -1,2 +1,33 @@
+from typing import TYPE_CHECKING
+# kept private, the names of this module are the public API
+from importlib import import_module as _import_module
 from .cfi import *
-from .epub import *
\ No newline at end of file
+from .cfi import _EXPORTS as _CFI_EXPORTS
+from .epub import _EXPORTS as _EPUB_EXPORTS
+
+if TYPE_CHECKING:
+  from .cfi import (
+    union_ranges, intersect_ranges, subtract_ranges, locate_in_ranges,
+    PathColumns, path_key, PathStore, reconcile, Reconciliation, SpatialIndex, element_key,
+  )
+  from .epub import (
+    EpubNode, MemoryReport, BookMemory, EpubBatch, BatchItem, BatchProgress, Catalog, CatalogEntry, ScanProgress,
+  )
+
+# the modules of epubcfi.epub need XML parsers, they are only imported when one of their names is used.
+# the lazy names of epubcfi.cfi are forwarded the same way
+_EXPORTS = {
+  **{ name: ".cfi" for name in _CFI_EXPORTS },
+  **{ name: ".epub" for name in _EPUB_EXPORTS },
+}
+
+def __getattr__(name: str):
+  module_name = _EXPORTS.get(name, None)
+  if module_name is None:
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+  value = getattr(_import_module(module_name, __name__), name)
+  globals()[name] = value
+  return value
+
+def __dir__():
+  return [*globals().keys(), *_EXPORTS.keys()]
@@ -1,5 +1,51 @@
-from .handler import parse, split, to_absolute
-from .path import Path, PathRange, ParsedPath, Offset, Redirect
+from .handler import parse, split, parse_lines, to_absolute, dumps_many
+from .path import Path, PathRange, ParsedPath, Offset, Redirect, from_absolute
 from .token import Offset as BaseOffset
 from .tokenizer import Step, CharacterOffset, TemporalOffset, SpatialOffset, TemporalSpatialOffset
+from .prefix import spine_steps, group_by_spine, pick_spine_steps, SpineGroups
 from .error import ParserException, TokenizerException, EpubCFIException
+from typing import TYPE_CHECKING
+from importlib import import_module
+
+if TYPE_CHECKING:
+  from .ranges import union_ranges, intersect_ranges, subtract_ranges, locate_in_ranges
+  from .columnar import PathColumns, path_key
+  from .store import PathStore
+  from .reconcile import reconcile, Reconciliation
+  from .spatial import SpatialIndex, element_key
+
+# collections of many paths are loaded on first use, parsing a path does not need them
+_EXPORTS = {
+  "union_ranges": ".ranges",
+  "intersect_ranges": ".ranges",
+  "subtract_ranges": ".ranges",
+  "locate_in_ranges": ".ranges",
+  "PathColumns": ".columnar",
+  "path_key": ".columnar",
+  "PathStore": ".store",
+  "reconcile": ".reconcile",
+  "Reconciliation": ".reconcile",
+  "SpatialIndex": ".spatial",
+  "element_key": ".spatial",
+}
+
+# star imports take the names loaded here, the lazy ones are forwarded by the importing package
+__all__ = [
+  "parse", "split", "parse_lines", "to_absolute", "dumps_many",
+  "Path", "PathRange", "ParsedPath", "Offset", "Redirect", "from_absolute",
+  "BaseOffset",
+  "Step", "CharacterOffset", "TemporalOffset", "SpatialOffset", "TemporalSpatialOffset",
+  "spine_steps", "group_by_spine", "pick_spine_steps", "SpineGroups",
+  "ParserException", "TokenizerException", "EpubCFIException",
+]
+
+def __getattr__(name: str):
+  module_name = _EXPORTS.get(name, None)
+  if module_name is None:
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+  value = getattr(import_module(module_name, __name__), name)
+  globals()[name] = value
+  return value
+
+def __dir__():
+  return [*globals().keys(), *_EXPORTS.keys()]
@@ -1,12 +1,15 @@
 from io import StringIO
+from typing import Any
 from .error import TokenizerException
 
 
 _escaped_chars = ("^", "[", "]", "(", ")", ",", ";", "=")
+_escape_table = str.maketrans({ char: f"^{char}" for char in _escaped_chars })
 
 class _AssertionReader:
-  def __init__(self, source: StringIO):
-    self._source: StringIO = source
+  def __init__(self, source: Any):
+    # anything with a read(1) method, such as StringIO
+    self._source: Any = source
     self._buffer: StringIO = StringIO()
     self._escaped: bool = False
 
@@ -36,17 +39,10 @@ class _AssertionReader:
       self._buffer.write(char)
     return None
 
-def read_assertion(source: StringIO) -> str:
+def read_assertion(source: Any) -> str:
   return _AssertionReader(source).read()
 
 def str_assertion(assertion: str | None) -> str:
   if assertion is None:
     return ""
-  buffer = StringIO()
-  buffer.write("[")
-  for char in assertion:
-    if char in _escaped_chars:
-      buffer.write("^")
-    buffer.write(char)
-  buffer.write("]")
-  return buffer.getvalue()
+  return f"[{assertion.translate(_escape_table)}]"
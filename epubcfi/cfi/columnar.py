@@ -0,0 +1,159 @@
+import struct
+
+from bisect import bisect_left, bisect_right
+from functools import cache, lru_cache
+from typing import Any, Iterable, Literal
+from .path import Path, Redirect, offset_type_id
+from .tokenizer import Step, CharacterOffset, TemporalOffset, SpatialOffset, TemporalSpatialOffset
+
+# a path is written as a row of fixed width tokens: one byte for the type id, then three big-endian
+# unsigned values. the path ends with its offset, or with an all-zero token when it has none.
+# comparing two rows byte by byte walks the steps the same way Path.__lt__ does, so sorting the rows
+# sorts the paths. NumPy compares its fixed width bytes arrays as if shorter rows were padded with
+# zeros, which keeps that order.
+_TOKEN = struct.Struct(">BQQQ")
+_END = bytes(_TOKEN.size)
+
+Side = Literal["left", "right"]
+
+def path_key(path: Path) -> bytes:
+  if not isinstance(path, Path):
+    raise TypeError(f"Expected a Path: {path}")
+  return steps_key(path.steps) + offset_key(path.offset)
+
+# the key of a path is the key of its steps followed by the key of its offset, so a parent shared by
+# many paths can be turned into bytes once
+def steps_key(steps: list[Redirect | Step]) -> bytes:
+  step_token = index_key
+  return b"".join([
+    step_token(step.index) if step.__class__ is Step else _tail_token(step)
+    for step in steps
+  ])
+
+def offset_key(offset: Any | None) -> bytes:
+  if offset is None:
+    return _END
+  if offset.__class__ is CharacterOffset:
+    return _character_token(offset.value)
+  return _token(offset)
+
+class PathColumns:
+  def __init__(self, paths: Iterable[Path], use_numpy: bool | None = None):
+    np = _numpy() if use_numpy is not False else None
+    if use_numpy and np is None:
+      raise ImportError("NumPy is not installed (pip install epubcfi[numpy])")
+
+    self._paths: list[Path] = list(paths)
+    self._np: Any = np
+    self._keys: Any = self._pack([path_key(path) for path in self._paths])
+
+  @property
+  def keys(self) -> Any:
+    # a NumPy bytes array, or a list of bytes without NumPy
+    return self._keys
+
+  @property
+  def paths(self) -> list[Path]:
+    return self._paths
+
+  def __len__(self) -> int:
+    return len(self._paths)
+
+  def __getitem__(self, index: int) -> Path:
+    return self._paths[index]
+
+  def argsort(self) -> Any:
+    if self._np is None:
+      return sorted(range(len(self._keys)), key=self._keys.__getitem__)
+    return self._np.argsort(self._keys, kind="stable")
+
+  def sorted(self) -> list[Path]:
+    return [self._paths[index] for index in self.argsort()]
+
+  # where the paths would be inserted into these columns, which must already be sorted
+  def searchsorted(self, paths: Path | Iterable[Path], side: Side = "left") -> Any:
+    if isinstance(paths, Path):
+      keys = [path_key(paths)]
+    else:
+      keys = [path_key(path) for path in paths]
+
+    if self._np is None:
+      search = bisect_left if side == "left" else bisect_right
+      indexes = [search(self._keys, key) for key in keys]
+    else:
+      indexes = self._np.searchsorted(self._keys, self._pack(keys), side=side)
+
+    if isinstance(paths, Path):
+      return int(indexes[0])
+    return indexes
+
+  # -1, 0 or 1 for every pair of paths, like comparing them one by one
+  def compare(self, other: "PathColumns") -> Any:
+    if len(self) != len(other):
+      raise ValueError(f"Cannot compare {len(self)} paths with {len(other)} paths")
+    if isinstance(self._keys, list) or isinstance(other.keys, list):
+      return [
+        (key1 > key2) - (key1 < key2)
+        for key1, key2 in zip(_bytes_keys(self), _bytes_keys(other))
+      ]
+    keys1, keys2 = self._keys, other.keys
+    return (keys1 > keys2).astype(self._np.int8) - (keys1 < keys2).astype(self._np.int8)
+
+  def _pack(self, keys: list[bytes]) -> Any:
+    if self._np is None:
+      return keys
+    width = max((len(key) for key in keys), default=_TOKEN.size)
+    return self._np.array(keys, dtype=f"S{width}")
+
+def _bytes_keys(columns: PathColumns) -> list[bytes]:
+  if isinstance(columns.keys, list):
+    return columns.keys
+  # NumPy drops the trailing zeros of its items, so the keys are built again
+  return [path_key(path) for path in columns.paths]
+
+def _token(tail: Redirect | Step | Any) -> bytes:
+  # the type id is doubled to make room for the temporal-spatial offset: it shares its id with the
+  # temporal offset, but being a subclass, its comparison methods win and put it after every temporal one
+  type_id = offset_type_id(tail) << 1
+  if isinstance(tail, Step):
+    values = (tail.index, 0, 0)
+  elif isinstance(tail, CharacterOffset):
+    values = (tail.value, 0, 0)
+  elif isinstance(tail, TemporalSpatialOffset):
+    type_id |= 1
+    values = (tail.seconds, tail.y, tail.x)
+  elif isinstance(tail, TemporalOffset):
+    values = (tail.seconds, 0, 0)
+  elif isinstance(tail, SpatialOffset):
+    values = (tail.y, tail.x, 0)
+  else:
+    values = (0, 0, 0)
+  return _TOKEN.pack(type_id, *values)
+
+# the key of a single step by its index, for keys built one step at a time.
+# steps make up most of the tokens and their indexes repeat a lot
+@lru_cache(maxsize=4096)
+def index_key(index: int) -> bytes:
+  return _token(Step(index, None))
+
+@cache
+def redirect_key() -> bytes:
+  return _token(Redirect())
+
+@lru_cache(maxsize=4096)
+def _character_token(value: int) -> bytes:
+  return _token(CharacterOffset(value=value, assertion=None))
+
+def _tail_token(tail: Redirect | Step) -> bytes:
+  if isinstance(tail, Redirect):
+    return redirect_key()
+  return index_key(tail.index)
+
+@cache
+def _numpy() -> Any:
+  try:
+    # pylint: disable=import-outside-toplevel
+    import numpy
+    return numpy
+  except ImportError:
+    return None
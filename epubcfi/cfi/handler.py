@@ -1,36 +1,73 @@
 import re
 
+from typing import Iterable, Iterator
 from .parser import parse as parse_cfi
 from .path import Path, PathRange, ParsedPath
+from .tokenizer import Content, decode_utf8, byte_view
 
+_CFI_PATTERN = re.compile(r"(#|^)epubcfi\((.*)\)$")
+# with pos and endpos around a single line, ^ and $ match at its ends
+_LINE_PATTERN = re.compile(r"(#|^)epubcfi\((.*)\)$", re.MULTILINE)
+_LINE_BYTES_PATTERN = re.compile(rb"(#|^)epubcfi\((.*)\)$", re.MULTILINE)
+_NEWLINE_PATTERN = re.compile(r"\n")
+_NEWLINE_BYTES_PATTERN = re.compile(rb"\n")
 
-def parse(path: str) -> ParsedPath | None:
+def parse(path: Content) -> ParsedPath | None:
+  if not isinstance(path, str):
+    # decoding once and parsing the str costs less than tokenizing the buffer in place
+    path = decode_utf8(path)
   _, cfi = _capture_cfi(path)
   if cfi is None:
-    return path, None
+    return None
   return parse_cfi(cfi)
 
-def split(path: str) -> tuple[str, ParsedPath | None]:
-  tail, cfi = _capture_cfi(path)
-  if cfi is None:
+def split(path: Content) -> tuple[str, ParsedPath | None]:
+  if not isinstance(path, str):
+    path = decode_utf8(path)
+  matched = _CFI_PATTERN.search(path)
+  if matched is None:
     return path, None
-  result = parse_cfi(cfi)
-  prefix = path[:len(path) - len(tail)]
-  return prefix, result
+  return path[:matched.start()], parse_cfi(matched.group(2))
+
+# one result for each line of content, None for the lines that hold no expression
+def parse_lines(content: Content) -> Iterator[ParsedPath | None]:
+  binary = not isinstance(content, str)
+  if binary:
+    content = byte_view(content)
+    pattern, newline, carriage_return = _LINE_BYTES_PATTERN, _NEWLINE_BYTES_PATTERN, ord("\r")
+  else:
+    pattern, newline, carriage_return = _LINE_PATTERN, _NEWLINE_PATTERN, "\r"
+
+  position: int = 0
+  length: int = len(content)
+  while position < length:
+    matched = newline.search(content, position)
+    end = length if matched is None else matched.start()
+    next_position = end + 1
+    if end > position and content[end - 1] == carriage_return:
+      end -= 1
+
+    matched = pattern.search(content, position, end)
+    if matched is None:
+      yield None
+    elif binary:
+      start, stop = matched.span(2)
+      yield parse_cfi(content, start, stop)
+    else:
+      yield parse_cfi(matched.group(2))
+    position = next_position
 
 def to_absolute(r: PathRange) -> tuple[Path, Path]:
-  start = Path(
-    steps=r.parent.steps + r.start.steps,
-    offset=r.start.offset,
-  )
-  end = Path(
-    steps=r.parent.steps + r.end.steps,
-    offset=r.end.offset,
-  )
-  return start, end
+  return r.absolute_start, r.absolute_end
+
+def dumps_many(paths: Iterable[ParsedPath], separator: str = "\n", wrap: bool = False) -> str:
+  # every string is cached on its path, so serializing the same paths again only joins them
+  if wrap:
+    return separator.join([f"epubcfi({path})" for path in paths])
+  return separator.join([str(path) for path in paths])
 
 def _capture_cfi(path: str):
-  matched = re.search(r"(#|^)epubcfi\((.*)\)$", path)
+  matched = _CFI_PATTERN.search(path)
   if matched:
     return matched.group(), matched.group(2)
   else:
@@ -1,5 +1,6 @@
 from __future__ import annotations
 from typing import Literal
+from ..metrics import default_metrics
 from .error import ParserException
 from .path import Path, PathRange, ParsedPath, Redirect, Offset
 from .token import Offset as TokenOffset
@@ -9,13 +10,14 @@ from .tokenizer import (
   Symbol,
   Token,
   Tokenizer,
+  Content,
 )
 
 
 class _Parser:
-  def __init__(self, content: str):
+  def __init__(self, content: Content, start: int, end: int | None):
     self._cache_token: Token | None = None
-    self._tokenizer: Tokenizer = Tokenizer(content)
+    self._tokenizer: Tokenizer = Tokenizer(content, start, end)
 
   def parse(self) -> ParsedPath:
     paths = list(self._search_path())
@@ -97,5 +99,8 @@ class _Parser:
       if self._cache_token is not None:
         break
 
-def parse(content: str) -> ParsedPath:
-  return _Parser(content).parse()
+def parse(content: Content, start: int = 0, end: int | None = None) -> ParsedPath:
+  started_at = default_metrics.start()
+  path = _Parser(content, start, end).parse()
+  default_metrics.stop("cfi.parse", started_at)
+  return path
@@ -1,7 +1,6 @@
 # https://idpf.org/epub/linking/cfi/epub-cfi.html#sec-sorting
 
 from __future__ import annotations
-from io import StringIO
 from dataclasses import dataclass
 from functools import total_ordering
 from typing import Any
@@ -15,6 +14,8 @@ from .tokenizer import (
 
 Offset = CharacterOffset | TemporalOffset | SpatialOffset | TemporalSpatialOffset
 
+_set = object.__setattr__
+
 @dataclass
 @total_ordering
 class Redirect:
@@ -42,16 +43,38 @@ class Path:
   steps: list[Redirect | Step]
   offset: Offset | None
 
+  # the canonical string is kept after the first str(), until steps or offset are assigned again.
+  # steps lists are replaced, not edited in place. the version counts those assignments, for the
+  # ranges caching what they built from this path. set on every instance too, its reads stay fast
+  _text = None
+  _version = 0
+
+  def __init__(self, steps: list[Redirect | Step], offset: Offset | None):
+    # set around __setattr__, a new path has no cache to drop
+    _set(self, "steps", steps)
+    _set(self, "offset", offset)
+    _set(self, "_version", 0)
+
+  def __setattr__(self, name: str, value: Any):
+    _set(self, name, value)
+    if name in ("steps", "offset"):
+      _set(self, "_text", None)
+      _set(self, "_version", self._version + 1)
+
   def start_with_redirect(self) -> bool:
     return isinstance(self.steps[0], Redirect)
 
+  def within(self, r: PathRange) -> bool:
+    return r.contains(self)
+
   def __str__(self):
-    buffer = StringIO()
-    for step in self.steps:
-      buffer.write(str(step))
-    if self.offset is not None:
-      buffer.write(str(self.offset))
-    return buffer.getvalue()
+    text = self._text
+    if text is None:
+      text = "".join([str(step) for step in self.steps])
+      if self.offset is not None:
+        text += str(self.offset)
+      _set(self, "_text", text)
+    return text
 
   def __lt__(self, obj: Any) -> bool:
     if not isinstance(obj, ParsedPath):
@@ -112,37 +135,18 @@ class Path:
     else:
       tail2 = obj_offset
 
-    type1 = self._offset_type_id(tail1)
-    type2 = self._offset_type_id(tail2)
+    type1 = offset_type_id(tail1)
+    type2 = offset_type_id(tail2)
 
-    if type1 < type2:
+    if tail1 is None and tail2 is None:
+      return (0, 0)
+    elif type1 < type2:
       return (0, 1)
     elif type1 > type2:
       return (1, 0)
     else:
       return (tail1, tail2)
 
-  def _offset_type_id(self, tail: Redirect | Step | Offset | None):
-    # https://idpf.org/epub/linking/cfi/epub-cfi.html#sec-sorting
-    # different step types come in the following order from least important to most important:
-    # character offset (:), child (/), temporal-spatial (~ or @), reference/indirect (!).
-    if tail is None:
-      return 0
-    elif isinstance(tail, Redirect):
-      return 1
-    elif isinstance(tail, SpatialOffset):
-      return 2
-    elif isinstance(tail, TemporalOffset):
-      return 3
-    elif isinstance(tail, TemporalSpatialOffset):
-      return 4
-    elif isinstance(tail, Step):
-      return 5
-    elif isinstance(tail, CharacterOffset):
-      return 6
-    else:
-      raise ValueError(f"Unknown offset type: {tail}")
-
 @dataclass
 @total_ordering
 class PathRange:
@@ -150,8 +154,89 @@ class PathRange:
   start: Path
   end: Path
 
+  # cached like the string of a path, and dropped when one of its paths changed since. versions
+  # only grow, so their sum moves with any of them
+  _text = None
+  _absolute = None
+  _versions = -1
+
+  def __init__(self, parent: Path, start: Path, end: Path):
+    _set(self, "parent", parent)
+    _set(self, "start", start)
+    _set(self, "end", end)
+
+  def __setattr__(self, name: str, value: Any):
+    _set(self, name, value)
+    if name in ("parent", "start", "end"):
+      _set(self, "_versions", -1)
+
   def __str__(self):
-    return f"{self.parent},{self.start},{self.end}"
+    # pylint: disable=protected-access
+    versions = self.parent._version + self.start._version + self.end._version
+    if versions != self._versions:
+      self._drop_caches(versions)
+    text = self._text
+    if text is None:
+      text = f"{self.parent},{self.start},{self.end}"
+      _set(self, "_text", text)
+    return text
+
+  def _drop_caches(self, versions: int):
+    _set(self, "_text", None)
+    _set(self, "_absolute", None)
+    _set(self, "_versions", versions)
+
+  @property
+  def absolute_start(self) -> Path:
+    return self._absolute_paths()[0]
+
+  @property
+  def absolute_end(self) -> Path:
+    return self._absolute_paths()[1]
+
+  # ranges cover [start, end): a point at the end of a range is outside of it, like a character offset
+  def contains(self, obj: ParsedPath) -> bool:
+    start, end = self._absolute_paths()
+    if isinstance(obj, PathRange):
+      return start <= obj.absolute_start and obj.absolute_end <= end
+    return start <= obj < end
+
+  def intersect(self, other: PathRange) -> PathRange | None:
+    start = max(self.absolute_start, other.absolute_start)
+    end = min(self.absolute_end, other.absolute_end)
+    if not start < end:
+      return None
+    return from_absolute(start, end)
+
+  # None when the ranges neither overlap nor touch
+  def union(self, other: PathRange) -> PathRange | None:
+    start1, end1 = self._absolute_paths()
+    start2, end2 = other.absolute_start, other.absolute_end
+    if max(start1, start2) > min(end1, end2):
+      return None
+    return from_absolute(min(start1, start2), max(end1, end2))
+
+  def subtract(self, other: PathRange) -> list[PathRange]:
+    start, end = self._absolute_paths()
+    ranges: list[PathRange] = []
+    left_end = min(end, other.absolute_start)
+    if start < left_end:
+      ranges.append(from_absolute(start, left_end))
+    right_start = max(start, other.absolute_end)
+    if right_start < end:
+      ranges.append(from_absolute(right_start, end))
+    return ranges
+
+  def _absolute_paths(self) -> tuple[Path, Path]:
+    # pylint: disable=protected-access
+    versions = self.parent._version + self.start._version + self.end._version
+    if versions != self._versions:
+      self._drop_caches(versions)
+    absolute = self._absolute
+    if absolute is None:
+      absolute = (join_paths(self.parent, self.start), join_paths(self.parent, self.end))
+      _set(self, "_absolute", absolute)
+    return absolute
 
   def __lt__(self, obj: Any) -> bool:
     if not isinstance(obj, ParsedPath):
@@ -197,4 +282,63 @@ class PathRange:
     else:
       return obj, obj, obj
 
+def join_paths(parent: Path, child: Path) -> Path:
+  path = Path(
+    steps=parent.steps + child.steps,
+    offset=child.offset,
+  )
+  # once both halves were written, the joined string costs one concatenation
+  # pylint: disable=protected-access
+  if parent.offset is None and parent._text is not None and child._text is not None:
+    _set(path, "_text", parent._text + child._text)
+  return path
+
+# the range between two absolute paths, under the deepest parent they share
+def from_absolute(start: Path, end: Path) -> PathRange:
+  size: int = 0
+  limit = min(len(start.steps), len(end.steps))
+  while size < limit and start.steps[size] == end.steps[size]:
+    size += 1
+
+  # both ends keep a step or an offset, and the parent never ends with a redirect
+  while size > 0 and (
+    (size == len(start.steps) and start.offset is None) or
+    (size == len(end.steps) and end.offset is None) or
+    isinstance(start.steps[size - 1], Redirect)
+  ):
+    size -= 1
+
+  if size == 0 and limit > 0 and start.steps[0] == end.steps[0]:
+    # one end is the spine element itself, it stays the parent and that end keeps no local step
+    size = 1
+  # paths of different top-level elements share no parent at all. the range algebra still works
+  # on them, under an empty parent
+
+  return PathRange(
+    parent=Path(steps=start.steps[:size], offset=None),
+    start=Path(steps=start.steps[size:], offset=start.offset),
+    end=Path(steps=end.steps[size:], offset=end.offset),
+  )
+
+def offset_type_id(tail: Redirect | Step | Offset | None) -> int:
+  # https://idpf.org/epub/linking/cfi/epub-cfi.html#sec-sorting
+  # different step types come in the following order from least important to most important:
+  # character offset (:), child (/), temporal-spatial (~ or @), reference/indirect (!).
+  if tail is None:
+    return 0
+  elif isinstance(tail, Redirect):
+    return 1
+  elif isinstance(tail, SpatialOffset):
+    return 2
+  elif isinstance(tail, TemporalOffset):
+    return 3
+  elif isinstance(tail, TemporalSpatialOffset):
+    return 4
+  elif isinstance(tail, Step):
+    return 5
+  elif isinstance(tail, CharacterOffset):
+    return 6
+  else:
+    raise ValueError(f"Unknown offset type: {tail}")
+
 ParsedPath = Path | PathRange
@@ -0,0 +1,136 @@
+import re
+
+from functools import cache
+from dataclasses import dataclass, field
+from typing import Iterable
+from .error import ParserException, TokenizerException, EpubCFIException
+from .handler import parse, _capture_cfi
+from .path import Path, PathRange, ParsedPath, Redirect
+from .tokenizer import Step
+
+# the steps before the first "!" select an item of the package document (the spine item of a book).
+# most expressions match the pattern below and give their prefix without being parsed, anything else
+# goes through the parser, so both ways always agree.
+_N = r"(?:0|[1-9][0-9]*)"
+_ASSERTION = r"\[(?:[^\]^]|\^[\^\[\](),;=])+\]"
+_STEP = rf"/{_N}(?:{_ASSERTION})?"
+_OFFSET = rf"(?::{_N}|~{_N}(?:@{_N}:{_N})?|@{_N}:{_N})(?:{_ASSERTION})?"
+_STEPS = rf"(?:{_STEP}|!(?!!))*"
+_PATH = rf"(?=[/!:~@]){_STEPS}(?:{_OFFSET})?"
+
+_FAST_PATTERN = (
+  rf"(?P<spine>(?:{_STEP})*)!(?!!){_STEPS}(?:{_OFFSET})?" +
+  rf"|(?P<parent>(?:{_STEP})+)(?P<redirect>!(?!!){_STEPS})?(?:{_OFFSET})?,(?P<start>{_PATH}),{_PATH}" +
+  rf"|(?=[/:~@])(?:{_STEP})*(?:{_OFFSET})?"
+)
+
+@dataclass
+class SpineGroups:
+  # indexes of the input expressions, grouped by the steps of their spine item
+  groups: dict[tuple[int, ...], list[int]] = field(default_factory=dict)
+  # valid expressions that never leave the package document
+  no_redirect: list[int] = field(default_factory=list)
+  invalid: list[int] = field(default_factory=list)
+
+def pick_spine_steps(path: ParsedPath) -> list[int] | None:
+  steps: list[int] = []
+  found_redirect: bool = False
+
+  if isinstance(path, Path):
+    for step in path.steps:
+      if isinstance(step, Step):
+        steps.append(step.index)
+      else:
+        found_redirect = True
+        break
+  elif isinstance(path, PathRange):
+    for step in path.parent.steps:
+      if isinstance(step, Step):
+        steps.append(step.index)
+      else:
+        found_redirect = True
+        break
+    if not found_redirect and len(path.start.steps) > 0:
+      found_redirect = isinstance(path.start.steps[0], Redirect)
+
+  if not found_redirect:
+    return None
+  return steps
+
+def spine_steps(cfi: str) -> tuple[int, ...] | None:
+  spine = _match_spine(cfi)
+  if spine is False:
+    spine = _slow_spine(cfi)
+  if spine is None:
+    return None
+  return _spine_key(spine)
+
+def group_by_spine(cfis: Iterable[str]) -> SpineGroups:
+  # events pile up on few chapters, so they are grouped by the text of their prefix first,
+  # and every distinct prefix is turned into integers once
+  by_text: dict[str, list[int]] = {}
+  result = SpineGroups()
+  match_spine = _match_spine
+
+  for index, cfi in enumerate(cfis):
+    spine = match_spine(cfi)
+    if spine is False:
+      try:
+        spine = _slow_spine(cfi)
+      except (EpubCFIException, TokenizerException, ValueError):
+        result.invalid.append(index)
+        continue
+    if spine is None:
+      result.no_redirect.append(index)
+      continue
+    indexes = by_text.get(spine, None)
+    if indexes is None:
+      by_text[spine] = [index]
+    else:
+      indexes.append(index)
+
+  for spine, indexes in by_text.items():
+    key = _spine_key(spine)
+    group = result.groups.get(key, None)
+    if group is None:
+      result.groups[key] = indexes
+    else:
+      # the same steps written with other assertions
+      group.extend(indexes)
+      group.sort()
+  return result
+
+# the prefix as text, None if the expression never redirects, False if the pattern cannot tell
+def _match_spine(cfi: str) -> str | None | bool:
+  _, body = _capture_cfi(cfi)
+  if body is None:
+    return False
+  matched = _patterns()[0].fullmatch(body)
+  if matched is None:
+    return False
+  spine = matched.group("spine")
+  if spine is not None:
+    return spine
+  parent = matched.group("parent")
+  if parent is not None and (matched.group("redirect") is not None or matched.group("start").startswith("!")):
+    return parent
+  return None
+
+def _slow_spine(cfi: str) -> str | None:
+  path = parse(cfi)
+  if path is None:
+    raise ParserException(f"Not an epubcfi expression: {cfi}")
+  steps = pick_spine_steps(path)
+  if steps is None:
+    return None
+  return "".join(f"/{step}" for step in steps)
+
+def _spine_key(spine: str) -> tuple[int, ...]:
+  if "[" in spine:
+    spine = _patterns()[1].sub("", spine)
+  return tuple(int(step) for step in spine.split("/")[1:])
+
+@cache
+def _patterns() -> tuple[re.Pattern, re.Pattern]:
+  # compiling takes longer than importing the rest of the package, so it waits for the first use
+  return re.compile(_FAST_PATTERN), re.compile(_ASSERTION)
@@ -0,0 +1,79 @@
+from typing import Iterable
+from .path import Path, PathRange, ParsedPath, from_absolute
+
+# every function here walks its inputs once. ranges must be sorted by absolute_start, and the ones
+# passed to intersect_ranges, subtract_ranges and locate_in_ranges must not overlap each other,
+# which is what union_ranges returns.
+
+def union_ranges(ranges: Iterable[PathRange]) -> list[PathRange]:
+  merged: list[tuple[Path, Path]] = []
+  for r in ranges:
+    start, end = r.absolute_start, r.absolute_end
+    if len(merged) == 0:
+      merged.append((start, end))
+      continue
+    last_start, last_end = merged[-1]
+    if start < last_start:
+      raise ValueError(f"Ranges are not sorted: {r}")
+    if start <= last_end:
+      if end > last_end:
+        merged[-1] = (last_start, end)
+    else:
+      merged.append((start, end))
+  return [from_absolute(start, end) for start, end in merged]
+
+def intersect_ranges(ranges1: list[PathRange], ranges2: list[PathRange]) -> list[PathRange]:
+  result: list[PathRange] = []
+  index1: int = 0
+  index2: int = 0
+  while index1 < len(ranges1) and index2 < len(ranges2):
+    r1 = ranges1[index1]
+    r2 = ranges2[index2]
+    start = max(r1.absolute_start, r2.absolute_start)
+    end = min(r1.absolute_end, r2.absolute_end)
+    if start < end:
+      result.append(from_absolute(start, end))
+    if r1.absolute_end < r2.absolute_end:
+      index1 += 1
+    else:
+      index2 += 1
+  return result
+
+# the parts of ranges1 that no range of ranges2 covers
+def subtract_ranges(ranges1: list[PathRange], ranges2: list[PathRange]) -> list[PathRange]:
+  result: list[PathRange] = []
+  first: int = 0
+  for r in ranges1:
+    start, end = r.absolute_start, r.absolute_end
+    while first < len(ranges2) and ranges2[first].absolute_end <= start:
+      first += 1
+    cursor = start
+    index = first
+    while index < len(ranges2) and ranges2[index].absolute_start < end:
+      hole = ranges2[index]
+      if cursor < hole.absolute_start:
+        result.append(from_absolute(cursor, hole.absolute_start))
+      cursor = max(cursor, hole.absolute_end)
+      index += 1
+    if cursor < end:
+      result.append(from_absolute(cursor, end))
+  return result
+
+# for every target (sorted by its start), the index of the range that contains it, or -1
+def locate_in_ranges(ranges: list[PathRange], targets: Iterable[ParsedPath]) -> list[int]:
+  result: list[int] = []
+  index: int = 0
+  for target in targets:
+    if isinstance(target, PathRange):
+      start, end = target.absolute_start, target.absolute_end
+    else:
+      start, end = target, None
+    while index < len(ranges) and ranges[index].absolute_end <= start:
+      index += 1
+    if index < len(ranges) and ranges[index].absolute_start <= start and (
+      end is None or end <= ranges[index].absolute_end
+    ):
+      result.append(index)
+    else:
+      result.append(-1)
+  return result
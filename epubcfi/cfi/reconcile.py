@@ -0,0 +1,107 @@
+import heapq
+
+from dataclasses import dataclass, field
+from typing import Sequence
+from .columnar import path_key, steps_key, offset_key
+from .path import Path, PathRange, ParsedPath
+
+@dataclass
+class Reconciliation:
+  # indexes of theirs missing from ours, and of ours missing from theirs
+  added: list[int] = field(default_factory=list)
+  removed: list[int] = field(default_factory=list)
+  # (ours, theirs) pairs of equal paths, assertions aside
+  duplicates: list[tuple[int, int]] = field(default_factory=list)
+  # (ours, theirs) pairs of ranges that are not equal but share some content
+  overlaps: list[tuple[int, int]] = field(default_factory=list)
+
+# both sides are sorted once by their columnar keys and walked side by side, so the cost is the
+# sorting plus the number of overlapping pairs, instead of every pair being compared
+def reconcile(ours: Sequence[ParsedPath], theirs: Sequence[ParsedPath]) -> Reconciliation:
+  result = Reconciliation()
+  keys1, bounds1 = _reconcile_keys(ours)
+  keys2, bounds2 = _reconcile_keys(theirs)
+  order1 = sorted(range(len(keys1)), key=keys1.__getitem__)
+  order2 = sorted(range(len(keys2)), key=keys2.__getitem__)
+
+  # ranges of each side that found no equal, in order of their start
+  ranges1: list[int] = []
+  ranges2: list[int] = []
+  i: int = 0
+  j: int = 0
+  while i < len(order1) or j < len(order2):
+    if j >= len(order2) or (i < len(order1) and keys1[order1[i]] < keys2[order2[j]]):
+      index = order1[i]
+      result.removed.append(index)
+      if index in bounds1:
+        ranges1.append(index)
+      i += 1
+    elif i >= len(order1) or keys2[order2[j]] < keys1[order1[i]]:
+      index = order2[j]
+      result.added.append(index)
+      if index in bounds2:
+        ranges2.append(index)
+      j += 1
+    else:
+      result.duplicates.append((order1[i], order2[j]))
+      i += 1
+      j += 1
+
+  result.added.sort()
+  result.removed.sort()
+  result.overlaps = _find_overlaps(ranges1, bounds1, ranges2, bounds2)
+  return result
+
+def _reconcile_keys(paths: Sequence[ParsedPath]) -> tuple[list[bytes], dict[int, tuple[bytes, bytes]]]:
+  # points sort first, then ranges by their start and their end
+  keys: list[bytes] = []
+  bounds: dict[int, tuple[bytes, bytes]] = {}
+  for index, path in enumerate(paths):
+    if isinstance(path, Path):
+      keys.append(b"\x00" + path_key(path))
+    elif isinstance(path, PathRange):
+      parent = steps_key(path.parent.steps)
+      start = parent + steps_key(path.start.steps) + offset_key(path.start.offset)
+      end = parent + steps_key(path.end.steps) + offset_key(path.end.offset)
+      bounds[index] = (start, end)
+      keys.append(b"\x01" + start + end)
+    else:
+      raise TypeError(f"Expected a Path or a PathRange: {path}")
+  return keys, bounds
+
+def _find_overlaps(
+    ranges1: list[int],
+    bounds1: dict[int, tuple[bytes, bytes]],
+    ranges2: list[int],
+    bounds2: dict[int, tuple[bytes, bytes]],
+  ) -> list[tuple[int, int]]:
+  # a range overlaps every range of the other side that started before it and has not ended yet
+  overlaps: list[tuple[int, int]] = []
+  active1: list[tuple[bytes, int]] = []
+  active2: list[tuple[bytes, int]] = []
+  i: int = 0
+  j: int = 0
+  while i < len(ranges1) or j < len(ranges2):
+    if j >= len(ranges2) or (i < len(ranges1) and bounds1[ranges1[i]][0] <= bounds2[ranges2[j]][0]):
+      index = ranges1[i]
+      start, end = bounds1[index]
+      _drop_finished(active2, start)
+      if start < end:
+        overlaps.extend((index, other) for _, other in active2)
+        heapq.heappush(active1, (end, index))
+      i += 1
+    else:
+      index = ranges2[j]
+      start, end = bounds2[index]
+      _drop_finished(active1, start)
+      if start < end:
+        overlaps.extend((other, index) for _, other in active1)
+        heapq.heappush(active2, (end, index))
+      j += 1
+  overlaps.sort()
+  return overlaps
+
+def _drop_finished(active: list[tuple[bytes, int]], start: bytes):
+  # ranges are half-open, one that ends where another starts does not overlap it
+  while len(active) > 0 and active[0][0] <= start:
+    heapq.heappop(active)
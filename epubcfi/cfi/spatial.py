@@ -0,0 +1,151 @@
+import heapq
+
+from typing import Iterable
+from .path import Path, ParsedPath
+from .tokenizer import Step, SpatialOffset, TemporalSpatialOffset
+
+# the steps of a path without its offset, a redirect is written as -1
+ElementKey = tuple[int, ...]
+
+def element_key(path: Path) -> ElementKey:
+  return tuple(step.index if isinstance(step, Step) else -1 for step in path.steps)
+
+class _Grid:
+  def __init__(self):
+    self.cells: dict[tuple[int, int], list[int]] = {}
+    self.min_cell: tuple[int, int] = (0, 0)
+    self.max_cell: tuple[int, int] = (0, 0)
+
+  def add(self, cell: tuple[int, int], id: int):
+    if len(self.cells) == 0:
+      self.min_cell = cell
+      self.max_cell = cell
+    else:
+      self.min_cell = (min(self.min_cell[0], cell[0]), min(self.min_cell[1], cell[1]))
+      self.max_cell = (max(self.max_cell[0], cell[0]), max(self.max_cell[1], cell[1]))
+    ids = self.cells.get(cell, None)
+    if ids is None:
+      self.cells[cell] = [id]
+    else:
+      ids.append(id)
+
+# https://idpf.org/epub/linking/cfi/epub-cfi.html#sec-path-terminating-spatial
+# points of the @x:y offsets of many paths, bucketed into a square grid for every element.
+# ids are the positions of the paths in the order they were added, paths without a spatial
+# offset take an id but are not indexed.
+class SpatialIndex:
+  def __init__(self, paths: Iterable[ParsedPath] = (), cell_size: int = 10):
+    if cell_size <= 0:
+      raise ValueError(f"Cell size must be positive: {cell_size}")
+    self._cell_size: int = cell_size
+    self._paths: list[ParsedPath] = []
+    self._xs: list[int] = []
+    self._ys: list[int] = []
+    self._grids: dict[ElementKey, _Grid] = {}
+    self.extend(paths)
+
+  @property
+  def paths(self) -> list[ParsedPath]:
+    return self._paths
+
+  def __len__(self) -> int:
+    return len(self._paths)
+
+  def add(self, path: ParsedPath) -> int:
+    id = len(self._paths)
+    self._paths.append(path)
+    offset = path.offset if isinstance(path, Path) else None
+    if isinstance(offset, (SpatialOffset, TemporalSpatialOffset)):
+      x, y = offset.x, offset.y
+      grid = self._grids.get(element_key(path), None)
+      if grid is None:
+        grid = _Grid()
+        self._grids[element_key(path)] = grid
+      grid.add(self._cell(x, y), id)
+    else:
+      x, y = -1, -1
+    self._xs.append(x)
+    self._ys.append(y)
+    return id
+
+  def extend(self, paths: Iterable[ParsedPath]):
+    for path in paths:
+      self.add(path)
+
+  # ids of the points of the element inside the rectangle, borders included, in the order they were added
+  def within(self, element: Path, left: int, top: int, right: int, bottom: int) -> list[int]:
+    grid = self._grids.get(element_key(element), None)
+    if grid is None:
+      return []
+    min_cx, min_cy = self._cell(left, top)
+    max_cx, max_cy = self._cell(right, bottom)
+    min_cx, min_cy = max(min_cx, grid.min_cell[0]), max(min_cy, grid.min_cell[1])
+    max_cx, max_cy = min(max_cx, grid.max_cell[0]), min(max_cy, grid.max_cell[1])
+
+    ids: list[int] = []
+    xs, ys = self._xs, self._ys
+    for cx in range(min_cx, max_cx + 1):
+      for cy in range(min_cy, max_cy + 1):
+        for id in grid.cells.get((cx, cy), ()):
+          if left <= xs[id] <= right and top <= ys[id] <= bottom:
+            ids.append(id)
+    ids.sort()
+    return ids
+
+  # ids of the k points of the element closest to (x, y), the closest first
+  def nearest(
+      self,
+      element: Path,
+      x: int,
+      y: int,
+      k: int = 1,
+      max_distance: float | None = None,
+    ) -> list[int]:
+    grid = self._grids.get(element_key(element), None)
+    if grid is None or k <= 0:
+      return []
+
+    limit = float("inf") if max_distance is None else max_distance * max_distance
+    # a max-heap of (-distance, -id) holding the best k points so far
+    best: list[tuple[float, int]] = []
+    cx, cy = self._cell(x, y)
+    max_ring = max(
+      abs(cx - grid.min_cell[0]), abs(cx - grid.max_cell[0]),
+      abs(cy - grid.min_cell[1]), abs(cy - grid.max_cell[1]),
+    )
+    xs, ys = self._xs, self._ys
+    for ring in range(max_ring + 1):
+      # points of this ring and the next ones are at least this far away
+      bound = max(ring - 1, 0) * self._cell_size
+      bound *= bound
+      if bound > limit or (len(best) == k and bound > -best[0][0]):
+        break
+      for cell in _ring_cells(cx, cy, ring):
+        for id in grid.cells.get(cell, ()):
+          dx = xs[id] - x
+          dy = ys[id] - y
+          distance = dx * dx + dy * dy
+          if distance > limit:
+            continue
+          item = (-distance, -id)
+          if len(best) < k:
+            heapq.heappush(best, item)
+          elif item > best[0]:
+            heapq.heapreplace(best, item)
+
+    best.sort(reverse=True)
+    return [-id for _, id in best]
+
+  def _cell(self, x: int, y: int) -> tuple[int, int]:
+    return x // self._cell_size, y // self._cell_size
+
+def _ring_cells(cx: int, cy: int, ring: int) -> Iterable[tuple[int, int]]:
+  if ring == 0:
+    yield cx, cy
+    return
+  for dx in range(-ring, ring + 1):
+    yield cx + dx, cy - ring
+    yield cx + dx, cy + ring
+  for dy in range(-ring + 1, ring):
+    yield cx - ring, cy + dy
+    yield cx + ring, cy + dy
@@ -0,0 +1,218 @@
+import sys
+
+from array import array
+from typing import Iterable, Iterator
+from .columnar import index_key, redirect_key, offset_key
+from .path import Path, Redirect, Offset
+from .tokenizer import Step, CharacterOffset, TemporalOffset, SpatialOffset, TemporalSpatialOffset
+
+_NO_OFFSET = 0
+_CHARACTER = 1
+_TEMPORAL = 2
+_SPATIAL = 3
+_TEMPORAL_SPATIAL = 4
+_REDIRECT = -1
+_EMPTY = -1
+
+# paths of one book share most of their steps, so steps are kept once in a trie of parallel arrays
+# (node 0 is the empty path) and a stored path is only the id of its last node and its offset.
+# Path objects are built again when they are read.
+#
+# the children of every node are found through one open addressing table of node ids, hashed by
+# (parent, index, assertion) and compared against the node arrays, so a node costs a few array
+# slots and no Python object.
+class PathStore:
+  def __init__(self, paths: Iterable[Path] = ()):
+    self._parents: array = array("i", [-1])
+    # step index, -1 for a redirect
+    self._indexes: array = array("q", [0])
+    self._assertions: array = array("i", [-1])
+    # node ids, _EMPTY for a free slot, never more than half full
+    self._slots: array = array("i", [_EMPTY]) * 16
+    self._texts: list[str] = []
+    self._text_ids: dict[str, int] = {}
+
+    self._nodes: array = array("i")
+    self._offset_kinds: array = array("b")
+    # the first value of each offset, the other ones of spatial offsets are kept aside
+    self._offset_values: array = array("q")
+    self._offset_extras: dict[int, tuple[int, int]] = {}
+    self._offset_assertions: array = array("i")
+    self.extend(paths)
+
+  def __len__(self) -> int:
+    return len(self._nodes)
+
+  @property
+  def nodes(self) -> int:
+    return len(self._parents)
+
+  def add(self, path: Path) -> int:
+    if not isinstance(path, Path):
+      raise TypeError(f"Expected a Path: {path}")
+    node = 0
+    for step in path.steps:
+      if isinstance(step, Step):
+        index, assertion = step.index, self._text_id(step.assertion)
+      else:
+        index, assertion = _REDIRECT, -1
+      node = self._child(node, index, assertion)
+
+    id = len(self._nodes)
+    self._nodes.append(node)
+    self._add_offset(path.offset)
+    return id
+
+  def extend(self, paths: Iterable[Path]):
+    for path in paths:
+      self.add(path)
+
+  def __getitem__(self, id: int) -> Path:
+    if id < 0:
+      id += len(self._nodes)
+    return Path(steps=self._steps(self._nodes[id]), offset=self._offset(id))
+
+  def __iter__(self) -> Iterator[Path]:
+    for id in range(len(self._nodes)):
+      yield self[id]
+
+  # ids in CFI order, the same order sorting the Path objects gives
+  def sorted_ids(self) -> list[int]:
+    prefixes: dict[int, bytes] = {0: b""}
+    keys: list[bytes] = []
+    for id, node in enumerate(self._nodes):
+      kind = self._offset_kinds[id]
+      tail = offset_key(None if kind == _NO_OFFSET else self._offset(id))
+      keys.append(self._prefix(node, prefixes) + tail)
+    return sorted(range(len(keys)), key=keys.__getitem__)
+
+  def iter_sorted(self) -> Iterator[Path]:
+    for id in self.sorted_ids():
+      yield self[id]
+
+  def memory_usage(self) -> int:
+    size = sys.getsizeof(self._texts) + sys.getsizeof(self._text_ids)
+    size += sum(sys.getsizeof(text) for text in self._texts)
+    size += _ints_size(self._text_ids.values())
+    size += sys.getsizeof(self._offset_extras) + _ints_size(self._offset_extras.keys())
+    for values in self._offset_extras.values():
+      size += sys.getsizeof(values) + _ints_size(values)
+    for values in (
+      self._parents, self._indexes, self._assertions, self._slots,
+      self._nodes, self._offset_kinds, self._offset_values, self._offset_assertions,
+    ):
+      size += sys.getsizeof(values)
+    return size
+
+  def bytes_per_path(self) -> float:
+    if len(self._nodes) == 0:
+      return 0.0
+    return self.memory_usage() / len(self._nodes)
+
+  def _child(self, node: int, index: int, assertion: int) -> int:
+    slots, parents, indexes, assertions = self._slots, self._parents, self._indexes, self._assertions
+    mask = len(slots) - 1
+    slot = hash((node, index, assertion)) & mask
+    while True:
+      child = slots[slot]
+      if child == _EMPTY:
+        break
+      if parents[child] == node and indexes[child] == index and assertions[child] == assertion:
+        return child
+      slot = (slot + 1) & mask
+
+    child = len(parents)
+    slots[slot] = child
+    parents.append(node)
+    indexes.append(index)
+    assertions.append(assertion)
+    if len(parents) * 2 > len(slots):
+      self._grow()
+    return child
+
+  def _grow(self):
+    slots = array("i", [_EMPTY]) * (len(self._slots) * 2)
+    mask = len(slots) - 1
+    for child in range(1, len(self._parents)):
+      slot = hash((self._parents[child], self._indexes[child], self._assertions[child])) & mask
+      while slots[slot] != _EMPTY:
+        slot = (slot + 1) & mask
+      slots[slot] = child
+    self._slots = slots
+
+  def _prefix(self, node: int, prefixes: dict[int, bytes]) -> bytes:
+    # walks up to the nearest node whose prefix is known, then fills in the way back down
+    path: list[int] = []
+    while node not in prefixes:
+      path.append(node)
+      node = self._parents[node]
+    prefix = prefixes[node]
+    for node in reversed(path):
+      index = self._indexes[node]
+      prefix += redirect_key() if index == _REDIRECT else index_key(index)
+      prefixes[node] = prefix
+    return prefix
+
+  def _steps(self, node: int) -> list[Redirect | Step]:
+    steps: list[Redirect | Step] = []
+    while node != 0:
+      index = self._indexes[node]
+      if index == _REDIRECT:
+        steps.append(Redirect())
+      else:
+        steps.append(Step(index, self._text(self._assertions[node])))
+      node = self._parents[node]
+    steps.reverse()
+    return steps
+
+  def _add_offset(self, offset: Offset | None):
+    values = (0, 0, 0)
+    if offset is None:
+      kind = _NO_OFFSET
+    elif isinstance(offset, CharacterOffset):
+      kind, values = _CHARACTER, (offset.value, 0, 0)
+    elif isinstance(offset, TemporalSpatialOffset):
+      kind, values = _TEMPORAL_SPATIAL, (offset.seconds, offset.x, offset.y)
+    elif isinstance(offset, TemporalOffset):
+      kind, values = _TEMPORAL, (offset.seconds, 0, 0)
+    elif isinstance(offset, SpatialOffset):
+      kind, values = _SPATIAL, (offset.x, offset.y, 0)
+    else:
+      raise TypeError(f"Unknown offset: {offset}")
+    if values[1] != 0 or values[2] != 0:
+      self._offset_extras[len(self._offset_kinds)] = (values[1], values[2])
+    self._offset_kinds.append(kind)
+    self._offset_values.append(values[0])
+    self._offset_assertions.append(-1 if offset is None else self._text_id(offset.assertion))
+
+  def _offset(self, id: int) -> Offset | None:
+    kind = self._offset_kinds[id]
+    if kind == _NO_OFFSET:
+      return None
+    value1 = self._offset_values[id]
+    value2, value3 = self._offset_extras.get(id, (0, 0))
+    assertion = self._text(self._offset_assertions[id])
+    if kind == _CHARACTER:
+      return CharacterOffset(value=value1, assertion=assertion)
+    if kind == _TEMPORAL:
+      return TemporalOffset(seconds=value1, assertion=assertion)
+    if kind == _SPATIAL:
+      return SpatialOffset(x=value1, y=value2, assertion=assertion)
+    return TemporalSpatialOffset(seconds=value1, x=value2, y=value3, assertion=assertion)
+
+  def _text_id(self, text: str | None) -> int:
+    if text is None:
+      return -1
+    text_id = self._text_ids.get(text, None)
+    if text_id is None:
+      text_id = len(self._texts)
+      self._texts.append(text)
+      self._text_ids[text] = text_id
+    return text_id
+
+  def _text(self, text_id: int) -> str | None:
+    return None if text_id < 0 else self._texts[text_id]
+
+def _ints_size(values: Iterable[int]) -> int:
+  # the ints from -5 to 256 are shared by the whole interpreter
+  return sum(sys.getsizeof(value) for value in values if not -5 <= value <= 256)
@@ -5,16 +5,23 @@ from .assertion import read_assertion
 from .token import Token, EOF, Symbol, Step, CharacterOffset, TemporalOffset, SpatialOffset, TemporalSpatialOffset
 from .error import TokenizerException
 
+Content = str | bytes | bytearray | memoryview
+
 class Phase(Enum):
   READY = 1
   STEP = 2
   OFFSET = 3
 
 class Tokenizer:
-  def __init__(self, content: str):
+  def __init__(self, content: Content, start: int = 0, end: int | None = None):
     self._phase: Phase = Phase.READY
     self._inject_char: str = ""
     self._buffer: StringIO = StringIO()
+    if not isinstance(content, str):
+      # decoding the expression once and reading the str is faster than reading the buffer byte by byte
+      content = decode_utf8(content, start, end)
+    elif start != 0 or end is not None:
+      content = content[start:end]
     self._source: StringIO = StringIO(content)
     self._offset_symbol: Literal[":", "@", "~"] = ":"
     self._offset_chain: list[tuple[Literal[":", "@", "~"], int]] = []
@@ -141,3 +148,16 @@ class Tokenizer:
       buffer.write(symbol)
       buffer.write(str(value))
     return buffer.getvalue()
+
+def decode_utf8(buffer: bytes | bytearray | memoryview, start: int = 0, end: int | None = None) -> str:
+  try:
+    return str(byte_view(buffer)[start:end], "utf8")
+  except UnicodeDecodeError as e:
+    raise TokenizerException(f"Not UTF-8: {e}") from e
+
+# the bytes of any buffer, one per item, whatever its format and shape
+def byte_view(buffer: bytes | bytearray | memoryview) -> memoryview:
+  view = memoryview(buffer)
+  if view.format != "B" or view.ndim != 1:
+    view = view.cast("B")
+  return view
@@ -0,0 +1,272 @@
+import sys
+import json
+import time
+import argparse
+
+from dataclasses import dataclass
+from multiprocessing import Pool
+from typing import Any, Callable, Iterable, Iterator, TextIO
+from .cfi import parse, split, ParsedPath
+from .epub import EpubBatch, Catalog
+
+
+@dataclass
+class _Record:
+  index: int
+  line: str
+  data: dict[str, Any] | None = None
+  error: str | None = None
+
+  @property
+  def cfi(self) -> str:
+    if self.data is None:
+      return self.line
+    return self.data.get("cfi", "")
+
+@dataclass
+class _Stats:
+  records: int = 0
+  failed: int = 0
+  started_at: float = 0.0
+
+  def report(self, command: str, output: TextIO):
+    elapsed = time.perf_counter() - self.started_at
+    rate = self.records / elapsed if elapsed > 0.0 else 0.0
+    output.write(
+      f"{command}: {self.records} records, {self.failed} failed " +
+      f"in {elapsed:.3f}s ({rate:.0f} records/s)\n"
+    )
+
+class _Command:
+  def __init__(self, args: argparse.Namespace, output: TextIO, errors: TextIO):
+    self._args: argparse.Namespace = args
+    self._output: TextIO = output
+    self._errors: TextIO = errors
+    self._stats: _Stats = _Stats(started_at=time.perf_counter())
+
+  def run(self) -> int:
+    records = self._read_records()
+    command = self._args.command
+    if command == "validate":
+      self._write_results(_map(_validate, records, self._args.workers), "valid")
+    elif command == "canonicalize":
+      self._write_results(_map(_canonicalize, records, self._args.workers), "cfi")
+    elif command == "sort":
+      self._sort(records)
+    elif command == "label":
+      self._write_results(self._batch(records, EpubBatch.ncx_labels), "label")
+    elif command == "extract-text":
+      self._write_results(self._batch(records, EpubBatch.texts), "text")
+    else:
+      raise ValueError(f"Unknown command: {command}")
+
+    if self._args.stats:
+      self._stats.report(command, self._errors)
+    return 0 if self._stats.failed == 0 else 1
+
+  def _read_records(self) -> Iterator[_Record]:
+    index: int = 0
+    for line in _read_lines(self._args.inputs):
+      if line.strip() == "":
+        continue
+      record = _Record(index, line)
+      index += 1
+      if self._args.jsonl:
+        try:
+          record.data = json.loads(line)
+          if not isinstance(record.data, dict):
+            raise ValueError("JSONL record must be an object")
+        except ValueError as e:
+          record.data = {}
+          record.error = f"{type(e).__name__}: {e}"
+      yield record
+
+  def _sort(self, records: Iterable[_Record]):
+    parsed: list[tuple[ParsedPath, _Record]] = []
+    for record, value, error in _map(_parse, records, self._args.workers):
+      if error is None:
+        parsed.append((value, record))
+      else:
+        self._write_result(record, None, error, "cfi")
+    parsed.sort(key=lambda e: e[0])
+    for _, record in parsed:
+      self._write_result(record, record.cfi, None, "cfi")
+
+  def _batch(self, records: Iterable[_Record], method: Callable) -> Iterator[tuple[_Record, Any, str | None]]:
+    # the batch driver answers out of order, results are buffered until their turn comes
+    waiting: dict[int, _Record] = {}
+    finished: dict[int, tuple[_Record, Any, str | None]] = {}
+    next_index: int = 0
+
+    def pairs():
+      for record in records:
+        waiting[record.index] = record
+        epub_path = self._args.epub
+        if record.data is not None:
+          epub_path = record.data.get("epub", epub_path)
+        if record.error is None and epub_path is None:
+          record.error = "ValueError: EPUB path is missing (use --epub or an \"epub\" field)"
+        yield epub_path or "", record.cfi
+
+    batch = EpubBatch(workers=self._args.workers)
+    for item in method(batch, pairs()):
+      record = waiting.pop(item.index)
+      error = record.error or item.error
+      finished[item.index] = (record, item.value, error)
+      while next_index in finished:
+        yield finished.pop(next_index)
+        next_index += 1
+
+  def _write_results(self, results: Iterable[tuple[_Record, Any, str | None]], field: str):
+    for record, value, error in results:
+      self._write_result(record, value, error, field)
+
+  def _write_result(self, record: _Record, value: Any, error: str | None, field: str):
+    self._stats.records += 1
+    error = record.error or error
+    if error is not None:
+      self._stats.failed += 1
+
+    if record.data is not None:
+      data = dict(record.data)
+      if error is None:
+        data[field] = value
+      else:
+        data["error"] = error
+      self._output.write(json.dumps(data, ensure_ascii=False))
+      self._output.write("\n")
+    elif error is not None:
+      self._errors.write(f"{record.line}\t{error}\n")
+    elif field == "valid":
+      self._output.write(f"{record.line}\n")
+    elif field == "cfi":
+      self._output.write(f"{value}\n")
+    else:
+      self._output.write(f"{record.line}\t{_one_line(value)}\n")
+
+def _read_lines(inputs: list[str]) -> Iterator[str]:
+  for input_path in inputs:
+    if input_path == "-":
+      for line in sys.stdin:
+        yield line.rstrip("\r\n")
+    else:
+      with open(input_path, "r", encoding="utf8") as file:
+        for line in file:
+          yield line.rstrip("\r\n")
+
+def _map(
+    func: Callable[[str], Any],
+    records: Iterable[_Record],
+    workers: int,
+  ) -> Iterator[tuple[_Record, Any, str | None]]:
+  if workers <= 0:
+    for record in records:
+      yield _invoke(func, record)
+  else:
+    with Pool(processes=workers) as pool:
+      tasks = ((func, record) for record in records)
+      yield from pool.imap(_invoke_task, tasks, chunksize=256)
+
+def _invoke_task(task: tuple[Callable[[str], Any], _Record]) -> tuple[_Record, Any, str | None]:
+  func, record = task
+  return _invoke(func, record)
+
+def _invoke(func: Callable[[str], Any], record: _Record) -> tuple[_Record, Any, str | None]:
+  if record.error is not None:
+    return record, None, record.error
+  try:
+    return record, func(record.cfi), None
+  # pylint: disable=broad-exception-caught
+  except Exception as e:
+    return record, None, f"{type(e).__name__}: {e}"
+
+def _parse(cfi: str) -> ParsedPath:
+  path = parse(cfi)
+  if path is None:
+    raise ValueError(f"Not an epubcfi expression: {cfi}")
+  return path
+
+def _validate(cfi: str) -> bool:
+  _parse(cfi)
+  return True
+
+def _canonicalize(cfi: str) -> str:
+  prefix, path = split(cfi)
+  if path is None:
+    raise ValueError(f"Not an epubcfi expression: {cfi}")
+  if prefix == "":
+    return f"epubcfi({path})"
+  return f"{prefix}#epubcfi({path})"
+
+def _one_line(value: Any) -> str:
+  if value is None:
+    return ""
+  return " ".join(str(value).split())
+
+def _create_parser() -> argparse.ArgumentParser:
+  parser = argparse.ArgumentParser(prog="epubcfi", description="bulk operations on EPUB CFI expressions")
+  subparsers = parser.add_subparsers(dest="command", required=True)
+  commands = {
+    "validate": "print the expressions that parse, report the others on stderr",
+    "canonicalize": "rewrite every expression into its canonical form",
+    "sort": "sort the expressions in CFI order",
+    "label": "print the NCX label of the chapter each expression points to",
+    "extract-text": "print the text each expression selects",
+  }
+  serve_parser = subparsers.add_parser("serve", help="answer requests over a unix domain socket")
+  serve_parser.add_argument("--socket", required=True, help="path of the unix domain socket")
+  serve_parser.add_argument("--cache", default=None, help="directory for extracted books")
+  serve_parser.add_argument("--concurrency", type=int, default=64, help="maximum number of requests in flight")
+  serve_parser.add_argument("--memory-budget", type=int, default=None, help="estimated bytes the cached books may take")
+  serve_parser.add_argument(
+    "--shared-indexes",
+    action="store_true",
+    help="map the book indexes other servers on the same cache wrote instead of building them",
+  )
+  scan_parser = subparsers.add_parser("scan", help="record the metadata of every EPUB of a directory in a catalog")
+  scan_parser.add_argument("root", help="directory to walk")
+  scan_parser.add_argument("--catalog", required=True, help="path of the SQLite catalog")
+  scan_parser.add_argument("--workers", type=int, default=None, help="number of worker processes (0 runs in-process)")
+  scan_parser.add_argument("--stats", action="store_true", help="report timing on stderr")
+
+  for command, help_text in commands.items():
+    subparser = subparsers.add_parser(command, help=help_text)
+    subparser.add_argument("inputs", nargs="*", default=["-"], help="input files, \"-\" for stdin")
+    subparser.add_argument("--jsonl", action="store_true", help="records are JSON objects with a \"cfi\" field")
+    subparser.add_argument("--workers", type=int, default=0, help="number of worker processes (0 runs in-process)")
+    subparser.add_argument("--stats", action="store_true", help="report timing on stderr")
+    if command in ("label", "extract-text"):
+      subparser.add_argument("--epub", default=None, help="EPUB file used when a record names none")
+  return parser
+
+def main(argv: list[str] | None = None) -> int:
+  args = _create_parser().parse_args(argv)
+  if args.command == "serve":
+    # pylint: disable=import-outside-toplevel
+    from .server import EpubServer, run_server
+    run_server(EpubServer(
+      socket_path=args.socket,
+      cache_path=args.cache,
+      max_concurrency=args.concurrency,
+      memory_budget=args.memory_budget,
+      shared_indexes=args.shared_indexes,
+    ))
+    return 0
+  if args.command == "scan":
+    return _scan(args, sys.stderr)
+  return _Command(args, sys.stdout, sys.stderr).run()
+
+def _scan(args: argparse.Namespace, errors: TextIO) -> int:
+  with Catalog(args.catalog, workers=args.workers) as catalog:
+    progress = catalog.scan(args.root)
+    # errors of the books this scan skipped are reported again until their files change
+    failed = catalog.errors(args.root)
+  for epub_path, error in failed:
+    errors.write(f"{epub_path}\t{error}\n")
+  if args.stats:
+    errors.write(
+      f"scan: {progress.found} books, {progress.scanned} scanned, {progress.skipped} skipped, " +
+      f"{progress.failed} failed, {progress.removed} removed in {progress.elapsed:.3f}s " +
+      f"({progress.throughput:.0f} books/s, {progress.bytes_throughput / 1e6:.1f} MB/s)\n"
+    )
+  return 0 if len(failed) == 0 else 1
@@ -1 +1,30 @@
-from .handler import EpubNode
\ No newline at end of file
+from typing import TYPE_CHECKING
+from importlib import import_module
+
+if TYPE_CHECKING:
+  from .handler import EpubNode, MemoryReport, BookMemory
+  from .batch import EpubBatch, BatchItem, BatchProgress
+  from .catalog import Catalog, CatalogEntry, ScanProgress
+
+_EXPORTS = {
+  "EpubNode": ".handler",
+  "MemoryReport": ".handler",
+  "BookMemory": ".handler",
+  "EpubBatch": ".batch",
+  "BatchItem": ".batch",
+  "BatchProgress": ".batch",
+  "Catalog": ".catalog",
+  "CatalogEntry": ".catalog",
+  "ScanProgress": ".catalog",
+}
+
+def __getattr__(name: str):
+  module_name = _EXPORTS.get(name, None)
+  if module_name is None:
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+  value = getattr(import_module(module_name, __name__), name)
+  globals()[name] = value
+  return value
+
+def __dir__():
+  return [*globals().keys(), *_EXPORTS.keys()]
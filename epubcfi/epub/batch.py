@@ -0,0 +1,275 @@
+import os
+import time
+import shutil
+import tempfile
+
+from functools import partial
+from dataclasses import dataclass
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Generator, Iterable, Iterator
+from ..cfi import parse, ParsedPath
+from .handler import EpubNode
+
+
+@dataclass
+class BatchItem:
+  index: int
+  epub_path: str
+  cfi: str | ParsedPath
+  value: Any = None
+  error: str | None = None
+
+  @property
+  def ok(self) -> bool:
+    return self.error is None
+
+@dataclass
+class BatchProgress:
+  submitted: int = 0
+  completed: int = 0
+  failed: int = 0
+  books: int = 0
+  started_at: float | None = None
+  finished_at: float | None = None
+
+  @property
+  def pending(self) -> int:
+    return self.submitted - self.completed
+
+  @property
+  def elapsed(self) -> float:
+    if self.started_at is None:
+      return 0.0
+    if self.finished_at is None:
+      return time.perf_counter() - self.started_at
+    return self.finished_at - self.started_at
+
+  @property
+  def throughput(self) -> float:
+    elapsed = self.elapsed
+    if elapsed <= 0.0:
+      return 0.0
+    return self.completed / elapsed
+
+class EpubBatch:
+  def __init__(
+      self,
+      workers: int | None = None,
+      cache_path: str | None = None,
+      chunk_size: int = 4096,
+      max_pending: int | None = None,
+    ):
+    if workers is None:
+      workers = os.cpu_count() or 1
+    if chunk_size <= 0:
+      raise ValueError(f"chunk_size must be positive: {chunk_size}")
+
+    self._workers: int = workers
+    self._cache_path: str | None = cache_path
+    self._chunk_size: int = chunk_size
+    self._max_pending: int = max_pending or max(workers, 1) * 4
+    self._progress: BatchProgress = BatchProgress()
+
+  @property
+  def progress(self) -> BatchProgress:
+    return self._progress
+
+  def ncx_labels(self, pairs: Iterable[tuple[str, str | ParsedPath]]) -> Generator[BatchItem, None, None]:
+    yield from self._run("ncx_label", pairs)
+
+  def texts(self, pairs: Iterable[tuple[str, str | ParsedPath]]) -> Generator[BatchItem, None, None]:
+    yield from self._run("extract_text", pairs)
+
+  def _run(self, method: str, pairs: Iterable[tuple[str, str | ParsedPath]]) -> Generator[BatchItem, None, None]:
+    self._progress = BatchProgress(started_at=time.perf_counter())
+    cache_root = tempfile.mkdtemp(dir=self._cache_path)
+    try:
+      if self._workers <= 0:
+        _init_worker(cache_root)
+        for group in self._groups(pairs):
+          yield from self._collect(_run_group(method, group))
+      else:
+        results = dispatch_groups(
+          create_executor=lambda: ProcessPoolExecutor(
+            max_workers=self._workers,
+            initializer=_init_worker,
+            initargs=(cache_root,),
+          ),
+          task=partial(_run_group, method),
+          groups=self._groups(pairs),
+          max_pending=self._max_pending,
+          fail=_fail_group,
+        )
+        for items in results:
+          yield from self._collect(items)
+    finally:
+      _close_worker()
+      self._progress.finished_at = time.perf_counter()
+      shutil.rmtree(cache_root, ignore_errors=True)
+
+  def _groups(self, pairs: Iterable[tuple[str, str | ParsedPath]]) -> Iterator[list[BatchItem]]:
+    # books are grouped inside a bounded window so the input can be an endless stream
+    window: dict[str, list[BatchItem]] = {}
+    size: int = 0
+
+    for index, (epub_path, cfi) in enumerate(pairs):
+      items = window.get(epub_path, None)
+      if items is None:
+        items = []
+        window[epub_path] = items
+      items.append(BatchItem(index, epub_path, cfi))
+      size += 1
+      if size >= self._chunk_size:
+        yield from self._flush(window)
+        window = {}
+        size = 0
+
+    yield from self._flush(window)
+
+  def _flush(self, window: dict[str, list[BatchItem]]) -> Iterator[list[BatchItem]]:
+    for items in window.values():
+      self._progress.submitted += len(items)
+      self._progress.books += 1
+      yield items
+
+  def _collect(self, items: list[BatchItem]) -> Iterator[BatchItem]:
+    for item in items:
+      self._progress.completed += 1
+      if not item.ok:
+        self._progress.failed += 1
+      yield item
+
+# runs every group through the task in a process pool, with at most max_pending groups in flight,
+# and yields the result of each group as it completes. a group whose result cannot be sent back
+# fails alone. a worker that dies breaks the whole pool: it is replaced, and the groups that did
+# not finish run again one at a time, so that the crash falls on the group that caused it. a group
+# that still crashes is split when split gives its parts, and fails otherwise
+def dispatch_groups(
+    create_executor: Callable[[], Executor],
+    task: Callable[[Any], Any],
+    groups: Iterable[Any],
+    max_pending: int,
+    fail: Callable[[Any, Exception], Any],
+    split: Callable[[Any], list[Any]] | None = None,
+  ) -> Iterator[Any]:
+  dispatch = _Dispatch(create_executor, task, fail, split)
+  try:
+    yield from dispatch.run(groups, max_pending)
+  finally:
+    dispatch.close()
+
+class _Dispatch:
+  def __init__(
+      self,
+      create_executor: Callable[[], Executor],
+      task: Callable[[Any], Any],
+      fail: Callable[[Any, Exception], Any],
+      split: Callable[[Any], list[Any]] | None,
+    ):
+    self._create_executor: Callable[[], Executor] = create_executor
+    self._task: Callable[[Any], Any] = task
+    self._fail: Callable[[Any, Exception], Any] = fail
+    self._split: Callable[[Any], list[Any]] | None = split
+    self._executor: Executor = create_executor()
+
+  def run(self, groups: Iterable[Any], max_pending: int) -> Iterator[Any]:
+    pending: dict[Future, Any] = {}
+    for group in groups:
+      if len(pending) >= max_pending:
+        yield from self._complete(pending)
+      try:
+        pending[self._executor.submit(self._task, group)] = group
+      except BrokenProcessPool:
+        # broken by a group still pending
+        yield from self._recover(pending, [group])
+    while len(pending) > 0:
+      yield from self._complete(pending)
+
+  def close(self):
+    self._executor.shutdown(cancel_futures=True)
+
+  def _complete(self, pending: dict[Future, Any]) -> Iterator[Any]:
+    done, _ = wait(pending.keys(), return_when=FIRST_COMPLETED)
+    unfinished: list[Any] = []
+    yield from self._collect(done, pending, unfinished)
+    if len(unfinished) > 0:
+      yield from self._recover(pending, unfinished)
+
+  def _recover(self, pending: dict[Future, Any], unfinished: list[Any]) -> Iterator[Any]:
+    # every future still pending fails with the broken pool, those done before keep their result
+    done, _ = wait(pending.keys())
+    yield from self._collect(done, pending, unfinished)
+    self._replace()
+    for group in unfinished:
+      yield from self._run_alone(group)
+
+  def _collect(self, done: set[Future], pending: dict[Future, Any], unfinished: list[Any]) -> Iterator[Any]:
+    for future in done:
+      group = pending.pop(future)
+      try:
+        yield future.result()
+      except BrokenProcessPool:
+        unfinished.append(group)
+      # pylint: disable=broad-exception-caught
+      except Exception as e:
+        yield self._fail(group, e)
+
+  def _run_alone(self, group: Any) -> Iterator[Any]:
+    try:
+      yield self._executor.submit(self._task, group).result()
+    except BrokenProcessPool as e:
+      self._replace()
+      parts = [] if self._split is None else self._split(group)
+      if len(parts) <= 1:
+        yield self._fail(group, e)
+      else:
+        for part in parts:
+          yield from self._run_alone(part)
+    # pylint: disable=broad-exception-caught
+    except Exception as e:
+      yield self._fail(group, e)
+
+  def _replace(self):
+    self._executor.shutdown(cancel_futures=True)
+    self._executor = self._create_executor()
+
+_worker_node: EpubNode | None = None
+
+def _init_worker(cache_root: str):
+  # pylint: disable=global-statement
+  global _worker_node
+  _worker_node = EpubNode(
+    cache_path=tempfile.mkdtemp(dir=cache_root),
+    remove_cache_path=True,
+  )
+
+def _close_worker():
+  # pylint: disable=global-statement
+  global _worker_node
+  if _worker_node is not None:
+    _worker_node.__exit__(None, None, None)
+    _worker_node = None
+
+def _fail_group(items: list[BatchItem], error: Exception) -> list[BatchItem]:
+  for item in items:
+    item.value = None
+    item.error = f"{type(error).__name__}: {error}"
+  return items
+
+def _run_group(method: str, items: list[BatchItem]) -> list[BatchItem]:
+  assert _worker_node is not None
+  invoke = getattr(_worker_node, method)
+  for item in items:
+    try:
+      cfi = item.cfi
+      if isinstance(cfi, str):
+        cfi = parse(cfi)
+        if cfi is None:
+          raise ValueError(f"Not an epubcfi expression: {item.cfi}")
+      item.value = invoke(item.epub_path, cfi)
+
+    # pylint: disable=broad-exception-caught
+    except Exception as e:
+      item.error = f"{type(e).__name__}: {e}"
+  return items
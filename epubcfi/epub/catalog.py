@@ -0,0 +1,300 @@
+import os
+import json
+import time
+import sqlite3
+import zipfile
+
+from dataclasses import dataclass, field
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator
+from .batch import dispatch_groups
+from .picker import EpubBook, pick_members
+from .unzip import file_fingerprint
+from .utils import member_path
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS books (
+  path TEXT PRIMARY KEY,
+  size INTEGER NOT NULL,
+  mtime_ns INTEGER NOT NULL,
+  fingerprint TEXT,
+  title TEXT,
+  authors TEXT,
+  content_path TEXT,
+  toc_path TEXT,
+  toc TEXT,
+  spine TEXT,
+  error TEXT,
+  scanned_at REAL NOT NULL
+)
+"""
+_COLUMNS = "path, size, mtime_ns, fingerprint, title, authors, content_path, toc_path, toc, spine, error"
+
+@dataclass
+class CatalogEntry:
+  epub_path: str
+  size: int
+  mtime_ns: int
+  # the content fingerprint extracted books are cached under
+  fingerprint: str | None = None
+  title: str | None = None
+  authors: list[str] = field(default_factory=list)
+  # member names inside the EPUB
+  content_path: str | None = None
+  toc_path: str | None = None
+  # (label, member, fragment, depth) of every TOC entry
+  toc: list[tuple[str, str | None, str | None, int]] = field(default_factory=list)
+  spine: list[str] = field(default_factory=list)
+  error: str | None = None
+
+  @property
+  def ok(self) -> bool:
+    return self.error is None
+
+@dataclass
+class ScanProgress:
+  found: int = 0
+  skipped: int = 0
+  scanned: int = 0
+  failed: int = 0
+  removed: int = 0
+  bytes_scanned: int = 0
+  started_at: float | None = None
+  finished_at: float | None = None
+
+  @property
+  def elapsed(self) -> float:
+    if self.started_at is None:
+      return 0.0
+    if self.finished_at is None:
+      return time.perf_counter() - self.started_at
+    return self.finished_at - self.started_at
+
+  @property
+  def throughput(self) -> float:
+    elapsed = self.elapsed
+    if elapsed <= 0.0:
+      return 0.0
+    return self.scanned / elapsed
+
+  @property
+  def bytes_throughput(self) -> float:
+    elapsed = self.elapsed
+    if elapsed <= 0.0:
+      return 0.0
+    return self.bytes_scanned / elapsed
+
+# a SQLite catalog of the EPUB files of a directory tree. every scan only picks the files whose
+# size or mtime changed since the last one, and commits its results in batches, so an
+# interrupted scan resumes where it stopped.
+class Catalog:
+  def __init__(
+      self,
+      db_path: str,
+      workers: int | None = None,
+      chunk_size: int = 16,
+      batch_size: int = 256,
+      max_pending: int | None = None,
+    ):
+    if workers is None:
+      workers = os.cpu_count() or 1
+    if chunk_size <= 0:
+      raise ValueError(f"chunk_size must be positive: {chunk_size}")
+    if batch_size <= 0:
+      raise ValueError(f"batch_size must be positive: {batch_size}")
+
+    self._workers: int = workers
+    self._chunk_size: int = chunk_size
+    self._batch_size: int = batch_size
+    self._max_pending: int = max_pending or max(workers, 1) * 4
+    self._progress: ScanProgress = ScanProgress()
+    self._db: sqlite3.Connection = sqlite3.connect(db_path)
+    self._db.execute(_SCHEMA)
+    self._db.commit()
+
+  def __enter__(self) -> "Catalog":
+    return self
+
+  def __exit__(self, exc_type, exc_val, exc_tb):
+    self.close()
+
+  def close(self):
+    self._db.close()
+
+  @property
+  def progress(self) -> ScanProgress:
+    return self._progress
+
+  def __len__(self) -> int:
+    return self._db.execute("SELECT COUNT(*) FROM books").fetchone()[0]
+
+  def entry(self, epub_path: str) -> CatalogEntry | None:
+    row = self._db.execute(
+      f"SELECT {_COLUMNS} FROM books WHERE path = ?",
+      (os.path.abspath(epub_path),),
+    ).fetchone()
+    return None if row is None else _from_row(row)
+
+  def entries(self) -> Iterator[CatalogEntry]:
+    for row in self._db.execute(f"SELECT {_COLUMNS} FROM books ORDER BY path"):
+      yield _from_row(row)
+
+  def errors(self, root_path: str | None = None) -> list[tuple[str, str]]:
+    rows = self._db.execute("SELECT path, error FROM books WHERE error IS NOT NULL ORDER BY path")
+    if root_path is None:
+      return list(rows)
+    prefix = os.path.join(os.path.abspath(root_path), "")
+    return [(path, error) for path, error in rows if path.startswith(prefix)]
+
+  def scan(self, root_path: str) -> ScanProgress:
+    self._progress = ScanProgress(started_at=time.perf_counter())
+    try:
+      files = self._changed_files(os.path.abspath(root_path))
+      if self._workers <= 0:
+        entries = (entry for group in self._groups(files) for entry in _scan_group(group))
+        self._write(entries)
+      else:
+        # a book that kills its worker is scanned alone and recorded with the error
+        results = dispatch_groups(
+          create_executor=lambda: ProcessPoolExecutor(max_workers=self._workers),
+          task=_scan_group,
+          groups=self._groups(files),
+          max_pending=self._max_pending,
+          fail=_fail_group,
+          split=lambda group: [[file] for file in group],
+        )
+        self._write(entry for entries in results for entry in entries)
+    finally:
+      self._progress.finished_at = time.perf_counter()
+    return self._progress
+
+  def _changed_files(self, root_path: str) -> list[tuple[str, int, int]]:
+    known: dict[str, tuple[int, int]] = {}
+    prefix = os.path.join(root_path, "")
+    for path, size, mtime_ns in self._db.execute("SELECT path, size, mtime_ns FROM books"):
+      if path.startswith(prefix):
+        known[path] = (size, mtime_ns)
+
+    files: list[tuple[str, int, int]] = []
+    for epub_path in _walk_epubs(root_path):
+      try:
+        stat = os.stat(epub_path)
+      except OSError:
+        continue
+      self._progress.found += 1
+      if known.pop(epub_path, None) == (stat.st_size, stat.st_mtime_ns):
+        self._progress.skipped += 1
+      else:
+        files.append((epub_path, stat.st_size, stat.st_mtime_ns))
+
+    # what is left was removed from the tree since the last scan
+    if len(known) > 0:
+      with self._db:
+        self._db.executemany("DELETE FROM books WHERE path = ?", ((path,) for path in known))
+      self._progress.removed += len(known)
+    return files
+
+  def _groups(self, files: list[tuple[str, int, int]]) -> Iterator[list[tuple[str, int, int]]]:
+    for i in range(0, len(files), self._chunk_size):
+      yield files[i:i + self._chunk_size]
+
+  def _write(self, entries: Iterable[CatalogEntry]):
+    rows: list[tuple] = []
+    for entry in entries:
+      self._progress.scanned += 1
+      self._progress.bytes_scanned += entry.size
+      if not entry.ok:
+        self._progress.failed += 1
+      rows.append(_to_row(entry))
+      if len(rows) >= self._batch_size:
+        self._insert(rows)
+        rows = []
+    if len(rows) > 0:
+      self._insert(rows)
+
+  def _insert(self, rows: list[tuple]):
+    with self._db:
+      self._db.executemany(
+        f"INSERT OR REPLACE INTO books ({_COLUMNS}, scanned_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        rows,
+      )
+
+def _walk_epubs(root_path: str) -> Iterator[str]:
+  for dir_path, dir_names, file_names in os.walk(root_path):
+    dir_names.sort()
+    for file_name in sorted(file_names):
+      if file_name.lower().endswith(".epub"):
+        yield os.path.join(dir_path, file_name)
+
+def _scan_group(files: list[tuple[str, int, int]]) -> list[CatalogEntry]:
+  entries: list[CatalogEntry] = []
+  for epub_path, size, mtime_ns in files:
+    entry = CatalogEntry(epub_path, size, mtime_ns)
+    try:
+      _scan_book(entry)
+    # pylint: disable=broad-exception-caught
+    except Exception as e:
+      entry.error = f"{type(e).__name__}: {e}"
+    entries.append(entry)
+  return entries
+
+def _fail_group(files: list[tuple[str, int, int]], error: Exception) -> list[CatalogEntry]:
+  return [
+    CatalogEntry(epub_path, size, mtime_ns, error=f"{type(error).__name__}: {error}")
+    for epub_path, size, mtime_ns in files
+  ]
+
+def _scan_book(entry: CatalogEntry):
+  # read in place: only the container, the package document and the TOC are decompressed
+  with zipfile.ZipFile(entry.epub_path, "r") as zip_ref:
+    names = set(zip_ref.namelist())
+    book = pick_members(entry.epub_path, zip_ref.open, names.__contains__)
+
+  entry.fingerprint = file_fingerprint(entry.epub_path)
+  _fill_entry(entry, book, os.path.abspath(entry.epub_path))
+
+def _fill_entry(entry: CatalogEntry, book: EpubBook, root_path: str):
+  def member(path: str) -> str:
+    return member_path(root_path, os.path.join(root_path, path))
+
+  entry.title = book.title
+  entry.authors = book.authors
+  entry.content_path = member(book.content_path)
+  entry.toc_path = None if book.toc_path is None else member(book.toc_path)
+  entry.toc = [
+    (toc_entry.label, None if toc_entry.path is None else member(toc_entry.path), toc_entry.fragment, toc_entry.depth)
+    for toc_entry in book.toc.entries
+  ]
+  entry.spine = [member(path) for path in book.spine]
+
+def _to_row(entry: CatalogEntry) -> tuple:
+  return (
+    entry.epub_path,
+    entry.size,
+    entry.mtime_ns,
+    entry.fingerprint,
+    entry.title,
+    json.dumps(entry.authors, ensure_ascii=False),
+    entry.content_path,
+    entry.toc_path,
+    json.dumps(entry.toc, ensure_ascii=False),
+    json.dumps(entry.spine, ensure_ascii=False),
+    entry.error,
+    time.time(),
+  )
+
+def _from_row(row: tuple) -> CatalogEntry:
+  path, size, mtime_ns, fingerprint, title, authors, content_path, toc_path, toc, spine, error = row
+  return CatalogEntry(
+    epub_path=path,
+    size=size,
+    mtime_ns=mtime_ns,
+    fingerprint=fingerprint,
+    title=title,
+    authors=json.loads(authors),
+    content_path=content_path,
+    toc_path=toc_path,
+    toc=[tuple(toc_entry) for toc_entry in json.loads(toc)],
+    spine=json.loads(spine),
+    error=error,
+  )
@@ -2,36 +2,193 @@ import os
 import tempfile
 import shutil
 
-from io import TextIOWrapper
-from ..cfi import ParsedPath
+from dataclasses import dataclass, field
+from typing import Iterable
+from ..cfi import ParsedPath, PathRange
+from ..metrics import Metrics, default_metrics
 from .unzip import Unzip
 from .picker import pick, EpubBook
-from .ncx_finder import find_ncx_label
-from .utils import SizeLimitMap
+from .ncx_finder import find_ncx_label, find_content_path
+from .text_finder import find_text
+from .progress import find_progress, spine_lengths, SpineLengths
+from .overlay import read_overlay, find_clip, find_time, Clip, MediaOverlay
+from .search import search_book, remove_indexes
+from .source import DocumentSources, DocumentReader, FileReader
+from .shared import publish_book, attach_book, publish_spine, attach_spine
+from .utils import SizeLimitMap, DocumentCache, member_path, estimate_size
 
 
+@dataclass
+class _BookEntry:
+  book: EpubBook
+  mtime: float | None
+  documents: DocumentCache
+  sources: DocumentSources
+  # built on the first progress() call, dropped whenever a document of the book changes
+  spine: SpineLengths | None = None
+  # read from the SMIL documents on first use, they reload the whole book when they change
+  overlay: MediaOverlay | None = None
+  # estimated bytes of the book, the spine lengths and the overlay, measured once when they are built
+  sizes: dict[str, int] = field(default_factory=dict)
+  # prefix of the index files shared with other processes, None when the book does not share them
+  shared_path: str | None = None
+
+  @property
+  def size(self) -> int:
+    return sum(self.sizes.values()) + self.documents.size
+
+  def parts(self) -> dict[str, int]:
+    return { **self.sizes, **self.documents.sizes() }
+
+  # a new position over the package document, opened on first use
+  @property
+  def reader(self) -> DocumentReader | FileReader:
+    return self.sources.reader(self.book.content_path)
+
+  def close(self):
+    self.sources.close()
+
+@dataclass
+class BookMemory:
+  epub_path: str
+  size: int
+  # estimated bytes of the book and of every kind of value derived from it
+  parts: dict[str, int]
+
+@dataclass
+class MemoryReport:
+  size: int
+  budget: int | None
+  books: list[BookMemory]
+
 class EpubNode:
   def __init__(
       self,
       cache_path: str | None = None,
       remove_cache_path: bool = False,
+      metrics: Metrics | None = None,
+      incremental: bool = False,
+      memory_budget: int | None = None,
+      shared_indexes: bool = False,
     ):
     self._is_created_path: bool = False
     unzip_path = self._norm_cache_path(cache_path)
     if remove_cache_path or unzip_path != cache_path:
       self._is_created_path = True
 
-    self._unzip: Unzip = Unzip(unzip_path)
-    self._books: SizeLimitMap[tuple[EpubBook, TextIOWrapper]] = SizeLimitMap(
+    self._metrics: Metrics = metrics or default_metrics
+    self._search_path: str = os.path.join(unzip_path, "search")
+    self._unzip: Unzip = Unzip(
+      unzip_path, self._metrics, incremental,
+      on_remove=lambda root_path: remove_indexes(self._search_path, root_path),
+    )
+    # only incremental nodes stat the book on every access to pick up its changes,
+    # the others keep serving what they loaded until the book leaves the cache
+    self._incremental: bool = incremental
+    # processes sharing the cache path map the book and spine indexes the first one wrote, instead of
+    # each building its own copy
+    self._shared_indexes: bool = shared_indexes
+    # memory_budget bounds the estimated bytes of the cached books on top of their number
+    self._books: SizeLimitMap[_BookEntry] = SizeLimitMap(
       limit=7,
-      on_close=lambda e: e[1].close(),
+      on_close=lambda e: e.close(),
+      byte_limit=memory_budget,
+      size_of=lambda e: e.size,
     )
 
   def ncx_label(self, epub_path: str, cfi_path: ParsedPath) -> str | None:
-    book, reader = self._book_pair(epub_path)
-    reader.seek(0)
-    label = find_ncx_label(book, reader, cfi_path)
-    return label
+    entry = self._book_entry(epub_path)
+    with entry.reader as reader:
+      return find_ncx_label(
+        entry.book, reader, cfi_path, self._metrics, self._content_paths(entry), entry.documents, entry.sources,
+      )
+
+  def resolve(self, epub_path: str, cfi_path: ParsedPath) -> str | None:
+    entry = self._book_entry(epub_path)
+    with entry.reader as reader:
+      return find_content_path(entry.book, reader, cfi_path, self._metrics, self._content_paths(entry))
+
+  def extract_text(self, epub_path: str, cfi_path: ParsedPath) -> str | None:
+    entry = self._book_entry(epub_path)
+    with entry.reader as reader:
+      return find_text(entry.book, reader, cfi_path, self._content_paths(entry), entry.sources)
+
+  def progress(self, epub_path: str, cfi_path: ParsedPath) -> float | None:
+    entry = self._book_entry(epub_path)
+    if entry.spine is None:
+      entry.spine = self._spine_lengths(entry)
+      entry.sizes["spine"] = estimate_size(entry.spine)
+    with entry.reader as reader:
+      return find_progress(entry.book, reader, cfi_path, entry.spine, self._content_paths(entry))
+
+  # ranges of the places where the words of the query follow each other, in reading order.
+  # the index of every document is kept in the cache path and built again when the document changes
+  def search(self, epub_path: str, query: str, limit: int | None = None) -> list[PathRange]:
+    entry = self._book_entry(epub_path)
+    started_at = self._metrics.start()
+    hits = search_book(entry.book, query, entry.documents, self._search_path, limit, entry.sources)
+    self._metrics.stop("epub.search", started_at)
+    return hits
+
+  def overlay_clip(self, epub_path: str, cfi_path: ParsedPath) -> Clip | None:
+    entry = self._book_entry(epub_path)
+    overlay = self._overlay(entry)
+    with entry.reader as reader:
+      index = find_clip(
+        entry.book, reader, cfi_path, overlay, self._content_paths(entry), entry.documents, entry.sources,
+      )
+    return None if index is None else overlay.clips[index]
+
+  # the audio file and the time at which the media overlay reads the CFI
+  def overlay_time(self, epub_path: str, cfi_path: ParsedPath) -> tuple[str, float] | None:
+    entry = self._book_entry(epub_path)
+    overlay = self._overlay(entry)
+    with entry.reader as reader:
+      return find_time(
+        entry.book, reader, cfi_path, overlay, self._content_paths(entry), entry.documents, entry.sources,
+      )
+
+  # the clips read at each time of an audio file, audio_path is relative to the book like content paths
+  def overlay_clips(self, epub_path: str, audio_path: str, times: Iterable[float]) -> list[Clip | None]:
+    overlay = self._overlay(self._book_entry(epub_path))
+    return [
+      None if index < 0 else overlay.clips[index]
+      for index in overlay.clips_at(audio_path, times)
+    ]
+
+  def _spine_lengths(self, entry: _BookEntry) -> SpineLengths:
+    if entry.shared_path is not None:
+      spine = attach_spine(f"{entry.shared_path}.spine")
+      self._metrics.cache("epub.shared_spine", spine is not None)
+      if spine is not None:
+        return spine
+
+    started_at = self._metrics.start()
+    spine = spine_lengths(entry.book, entry.documents, entry.sources)
+    self._metrics.stop("epub.spine_lengths", started_at)
+    if entry.shared_path is not None:
+      publish_spine(f"{entry.shared_path}.spine", spine)
+    return spine
+
+  def _overlay(self, entry: _BookEntry) -> MediaOverlay:
+    if entry.overlay is None:
+      started_at = self._metrics.start()
+      entry.overlay = read_overlay(entry.book.root_path, entry.book.overlay_paths, entry.sources)
+      entry.sizes["overlay"] = estimate_size(entry.overlay)
+      self._metrics.stop("epub.overlay", started_at)
+    return entry.overlay
+
+  # estimated bytes of the cached books, the most recently used last
+  def memory_report(self) -> MemoryReport:
+    books: list[BookMemory] = []
+    for path in self._books.keys():
+      entry = self._books.get(path)
+      books.append(BookMemory(epub_path=path, size=entry.size, parts=entry.parts()))
+    return MemoryReport(
+      size=sum(book.size for book in books),
+      budget=self._books.byte_limit,
+      books=books,
+    )
 
   def _norm_cache_path(self, cache_path: str | None) -> None:
     if cache_path is None:
@@ -42,20 +199,98 @@ class EpubNode:
       raise NotADirectoryError(f"Path is not a directory: {cache_path}")
     return cache_path
 
+  # removes the extracted versions of books no path uses any more, but those of the loaded books.
+  # other processes sharing the cache path must not be reading the removed versions
+  def prune(self) -> list[str]:
+    return self._unzip.prune(keep=[entry.book.root_path for entry in self._books.values()])
+
   def __enter__(self) -> "EpubNode":
     return self
 
   def __exit__(self, exc_type, exc_val, exc_tb):
-    for _, reader in self._books.values():
-      reader.close()
+    for entry in self._books.values():
+      entry.close()
     if self._is_created_path:
       shutil.rmtree(self._unzip._unzip_path)
 
-  def _book_pair(self, path: str) -> tuple[EpubBook, TextIOWrapper]:
+  def _content_paths(self, entry: _BookEntry) -> dict[tuple[int, ...], str | None]:
+    # the package document decides which content document a CFI points to
+    opf_member = member_path(entry.book.root_path, entry.book.content_path)
+    return entry.documents.table(opf_member, "content_paths")
+
+  def _book_entry(self, path: str) -> _BookEntry:
     path = os.path.abspath(path)
     if path not in self._books:
-      dir_path = self._unzip.unzip_file(path)
+      self._metrics.cache("epub.books", False)
+      dir_path, _ = self._unzip.unzip_file_changes(path)
+      entry = self._load_entry(path, dir_path)
+      self._books[path] = entry
+      return entry
+
+    self._metrics.cache("epub.books", True)
+    # take the entry out and put it back, so that it becomes the most recently used one
+    entry = self._books[path]
+    if self._incremental and entry.mtime is not None and entry.mtime != os.path.getmtime(path):
+      entry = self._refresh_entry(path, entry)
+    self._books[path] = entry
+    return entry
+
+  def _refresh_entry(self, path: str, entry: _BookEntry) -> _BookEntry:
+    dir_path, changes = self._unzip.unzip_file_changes(path)
+    book = entry.book
+    book_members = {
+      "META-INF/container.xml",
+      member_path(book.root_path, book.content_path),
+    }
+    if book.toc_path is not None:
+      book_members.add(member_path(book.root_path, book.toc_path))
+    for overlay_path in book.overlay_paths:
+      book_members.add(member_path(book.root_path, overlay_path))
+
+    if changes is None or not changes.isdisjoint(book_members):
+      entry.close()
+      return self._load_entry(path, dir_path)
+
+    entry.mtime = os.path.getmtime(path)
+    entry.documents.invalidate(changes)
+    entry.spine = None
+    entry.sizes.pop("spine", None)
+    if dir_path != book.root_path:
+      # every version of a book has its own directory, the values derived from the documents that
+      # did not change still hold there, but not the paths the package document resolved
+      documents = entry.documents
+      documents.invalidate((member_path(book.root_path, book.content_path),))
+      entry.close()
+      entry = self._load_entry(path, dir_path)
+      entry.documents = documents
+    return entry
+
+  def _load_entry(self, path: str, dir_path: str) -> _BookEntry:
+    mtime: float | None = None
+    if os.path.isfile(path):
+      mtime = os.path.getmtime(path)
+
+    # only extracted books are shared, their directory never changes once written
+    shared_path: str | None = None
+    book: EpubBook | None = None
+    if self._shared_indexes and dir_path != path:
+      shared_path = dir_path
+      book = attach_book(f"{shared_path}.book")
+      self._metrics.cache("epub.shared_book", book is not None)
+
+    if book is None:
+      started_at = self._metrics.start()
       book = pick(dir_path)
-      reader = open(book.content_path, "rb")
-      self._books[path] = (book, reader)
-    return self._books[path]
\ No newline at end of file
+      self._metrics.stop("epub.pick", started_at)
+      if shared_path is not None:
+        publish_book(f"{shared_path}.book", book)
+
+    return _BookEntry(
+      book=book,
+      mtime=mtime,
+      documents=DocumentCache(),
+      # only the files of an extracted book are safe to map, they are replaced but never edited in place
+      sources=DocumentSources(mapped=dir_path != path),
+      sizes={ "book": estimate_size(book) },
+      shared_path=shared_path,
+    )
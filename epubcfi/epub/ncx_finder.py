@@ -1,17 +1,100 @@
 import os
 
-from ..cfi import Step, Redirect, Path, PathRange, ParsedPath
+from ..cfi import Step, Redirect, Path, PathRange, ParsedPath, CharacterOffset, pick_spine_steps
+from ..metrics import Metrics
 from .picker import EpubBook
 from .stepper import forward_steps
-from .utils import relative_root_path
+from .source import DocumentSources
+from .toc import document_anchors
+from .utils import relative_root_path, DocumentCache
 
-def find_ncx_label(book: EpubBook, reader: any, path: ParsedPath):
-  steps = _pick_steps(path)
+def find_ncx_label(
+    book: EpubBook,
+    reader: any,
+    path: ParsedPath,
+    metrics: Metrics | None = None,
+    cache: dict[tuple[int, ...], str | None] | None = None,
+    documents: DocumentCache | None = None,
+    sources: DocumentSources | None = None,
+  ):
+  content_path = find_content_path(book, reader, path, metrics, cache)
+  if content_path is None:
+    return None
+
+  started_at = metrics.start() if metrics is not None else 0.0
+  label = book.toc.label(content_path)
+  if label is not None and book.toc.has_fragments(content_path):
+    # entries pointing into the document: take the last one before the path
+    label = _find_anchor_label(book, path, content_path, documents, sources) or label
+  if metrics is not None:
+    metrics.stop("epub.ncx_scan", started_at)
+
+  return label
+
+def find_content_path(
+    book: EpubBook,
+    reader: any,
+    path: ParsedPath,
+    metrics: Metrics | None = None,
+    cache: dict[tuple[int, ...], str | None] | None = None,
+  ) -> str | None:
+  steps = pick_spine_steps(path)
   if steps is None:
     # never redirect. it means it's not a article file.
     return None
 
-  tags_stack = forward_steps(reader, steps)
+  if cache is None:
+    return _find_content_path(book, reader, steps, metrics)
+
+  key = tuple(steps)
+  if key in cache:
+    return cache[key]
+  content_path = _find_content_path(book, reader, steps, metrics)
+  cache[key] = content_path
+  return content_path
+
+def pick_document_steps(path: Path) -> tuple[list[int] | None, int | None]:
+  steps: list[int] = []
+  found_redirect: bool = False
+
+  for step in path.steps:
+    if isinstance(step, Redirect):
+      if found_redirect:
+        # redirect into another document from a content document is not supported
+        return None, None
+      found_redirect = True
+    elif isinstance(step, Step) and found_redirect:
+      steps.append(step.index)
+
+  if not found_redirect:
+    return None, None
+
+  offset: int | None = None
+  if isinstance(path.offset, CharacterOffset):
+    offset = path.offset.value
+  return steps, offset
+
+def _find_anchor_label(
+    book: EpubBook,
+    path: ParsedPath,
+    content_path: str,
+    documents: DocumentCache | None,
+    sources: DocumentSources | None,
+  ) -> str | None:
+  if isinstance(path, PathRange):
+    path = path.absolute_start
+  steps, _ = pick_document_steps(path)
+  if steps is None:
+    return None
+
+  anchors = document_anchors(book.root_path, book.toc, documents, content_path, sources)
+  index = anchors.find(steps)
+  if index is None:
+    return None
+  return book.toc.entries[index].label
+
+def _find_content_path(book: EpubBook, reader: any, steps: list[int], metrics: Metrics | None) -> str | None:
+  tags_stack = forward_steps(reader, steps, metrics)
   if len(tags_stack) == 0:
     # match failed
     return None
@@ -22,41 +105,11 @@ def find_ncx_label(book: EpubBook, reader: any, path: ParsedPath):
     return None
 
   href = href.strip()
-  path = relative_root_path(
+  return relative_root_path(
     root_path=book.root_path,
     base_path=os.path.dirname(book.content_path),
     href=href,
   )
-  for label, ncx_path in book.ncx:
-    if path == ncx_path:
-      return label
-
-  return None
-
-def _pick_steps(path: ParsedPath) -> list[int] | None:
-  steps: list[int] = []
-  found_redirect: bool = False
-
-  if isinstance(path, Path):
-    for step in path.steps:
-      if isinstance(step, Step):
-        steps.append(step.index)
-      else:
-        found_redirect = True
-        break
-  elif isinstance(path, PathRange):
-    for step in path.parent.steps:
-      if isinstance(step, Step):
-        steps.append(step.index)
-      else:
-        found_redirect = True
-        break
-    if not found_redirect:
-      found_redirect = isinstance(path.start.steps[0], Redirect)
-
-  if not found_redirect:
-    return None
-  return steps
 
 def _pick_href(book: EpubBook, attrs: dict[str, str]) -> str | None:
   href = attrs.get("href", None)
@@ -0,0 +1,215 @@
+import os
+
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from typing import Iterable
+from ..cfi import PathRange, ParsedPath, TemporalOffset
+from .picker import EpubBook
+from .ncx_finder import find_content_path, pick_document_steps
+from .source import DocumentSources, document_reader
+from .toc import DocumentAnchors, fragment_anchors
+from .utils import relative_root_path, DocumentCache
+
+# https://www.w3.org/publishing/epub3/epub-mediaoverlays.html
+@dataclass
+class Clip:
+  text_path: str
+  fragment: str | None
+  audio_path: str
+  begin: float
+  # None for the last clip of an audio file without clipEnd, it plays until the audio ends
+  end: float | None
+
+@dataclass
+class AudioClips:
+  # clips of one audio file sorted by their beginning, clips[i] indexes MediaOverlay.clips
+  begins: list[float]
+  ends: list[float]
+  clips: list[int]
+
+@dataclass
+class MediaOverlay:
+  clips: list[Clip] = field(default_factory=list)
+  audio: dict[str, AudioClips] = field(default_factory=dict)
+  # content path -> indexes of the clips that play it
+  texts: dict[str, list[int]] = field(default_factory=dict)
+
+  def clip_at(self, audio_path: str, seconds: float) -> int | None:
+    index = self.clips_at(audio_path, (seconds,))[0]
+    return None if index < 0 else index
+
+  # index of the clip playing at each time, -1 between clips. times that only move forward, like
+  # the positions of a listening session, are searched from the last clip found
+  def clips_at(self, audio_path: str, times: Iterable[float]) -> list[int]:
+    audio = self.audio.get(audio_path, None)
+    if audio is None:
+      return [-1 for _ in times]
+
+    result: list[int] = []
+    begins, ends, clips = audio.begins, audio.ends, audio.clips
+    low: int = 0
+    last_seconds: float = float("-inf")
+    for seconds in times:
+      if seconds < last_seconds:
+        low = 0
+      last_seconds = seconds
+      index = bisect_right(begins, seconds, low) - 1
+      if index < 0 or seconds >= ends[index]:
+        result.append(-1)
+      else:
+        result.append(clips[index])
+      low = max(index, 0)
+    return result
+
+def read_overlay(root_path: str, smil_paths: Iterable[str], sources: DocumentSources | None = None) -> MediaOverlay:
+  overlay = MediaOverlay()
+  for smil_path in smil_paths:
+    if os.path.isfile(smil_path):
+      _SmilReader(root_path, os.path.dirname(smil_path), overlay.clips).read(smil_path, sources)
+
+  by_audio: dict[str, list[int]] = {}
+  for index, clip in enumerate(overlay.clips):
+    by_audio.setdefault(clip.audio_path, []).append(index)
+    overlay.texts.setdefault(clip.text_path, []).append(index)
+
+  for audio_path, indexes in by_audio.items():
+    indexes.sort(key=lambda i: overlay.clips[i].begin)
+    begins = [overlay.clips[i].begin for i in indexes]
+    # a clip without clipEnd lasts until the next one begins
+    for i, index in enumerate(indexes[:-1]):
+      if overlay.clips[index].end is None:
+        overlay.clips[index].end = begins[i + 1]
+    ends = [_end_of(overlay.clips[i]) for i in indexes]
+    overlay.audio[audio_path] = AudioClips(begins, ends, indexes)
+  return overlay
+
+def find_clip(
+    book: EpubBook,
+    reader: any,
+    path: ParsedPath,
+    overlay: MediaOverlay,
+    cache: dict[tuple[int, ...], str | None] | None = None,
+    documents: DocumentCache | None = None,
+    sources: DocumentSources | None = None,
+  ) -> int | None:
+  content_path = find_content_path(book, reader, path, cache=cache)
+  if content_path is None or content_path not in overlay.texts:
+    return None
+
+  if isinstance(path, PathRange):
+    path = path.absolute_start
+  steps, _ = pick_document_steps(path)
+  if steps is None:
+    return None
+
+  # the last fragment with a clip before the path, or the first clip of the document
+  index = clip_anchors(book.root_path, overlay, documents, content_path, sources).find(steps)
+  if index is None:
+    index = overlay.texts[content_path][0]
+  return index
+
+def find_time(
+    book: EpubBook,
+    reader: any,
+    path: ParsedPath,
+    overlay: MediaOverlay,
+    cache: dict[tuple[int, ...], str | None] | None = None,
+    documents: DocumentCache | None = None,
+    sources: DocumentSources | None = None,
+  ) -> tuple[str, float] | None:
+  index = find_clip(book, reader, path, overlay, cache, documents, sources)
+  if index is None:
+    return None
+
+  clip = overlay.clips[index]
+  seconds = clip.begin
+  if isinstance(path, PathRange):
+    path = path.absolute_start
+  # a temporal offset counts from the beginning of the clip
+  if isinstance(path.offset, TemporalOffset):
+    seconds = min(clip.begin + path.offset.seconds, _end_of(clip))
+  return clip.audio_path, seconds
+
+def clip_anchors(
+    root_path: str,
+    overlay: MediaOverlay,
+    documents: DocumentCache | None,
+    content_path: str,
+    sources: DocumentSources | None = None,
+  ) -> DocumentAnchors:
+  return fragment_anchors(
+    root_path, documents, content_path, "clip_anchors",
+    lambda: [(index, overlay.clips[index].fragment) for index in overlay.texts.get(content_path, [])],
+    sources,
+  )
+
+def _end_of(clip: Clip) -> float:
+  return float("inf") if clip.end is None else clip.end
+
+# https://www.w3.org/TR/SMIL3/smil-timing.html#q22
+def parse_clock(value: str) -> float:
+  value = value.strip()
+  if ":" in value:
+    parts = value.split(":")
+    if len(parts) > 3:
+      raise ValueError(f"Invalid clock value: {value}")
+    seconds = 0.0
+    for part in parts:
+      seconds = seconds * 60.0 + float(part)
+    return seconds
+
+  for suffix, scale in (("ms", 0.001), ("min", 60.0), ("h", 3600.0), ("s", 1.0)):
+    if value.endswith(suffix):
+      return float(value[:-len(suffix)]) * scale
+  return float(value)
+
+# <par><text src="chapter.xhtml#id"/><audio src="chapter.mp3" clipBegin="0:00:01.5" clipEnd="3.2s"/></par>
+class _SmilReader:
+  def __init__(self, root_path: str, base_path: str, clips: list[Clip]):
+    self._root_path: str = root_path
+    self._base_path: str = base_path
+    self._clips: list[Clip] = clips
+    self._text: tuple[str, str | None] | None = None
+    self._audio: tuple[str, float, float | None] | None = None
+
+  def read(self, smil_path: str, sources: DocumentSources | None = None):
+    # pylint: disable=import-outside-toplevel
+    from xml.parsers.expat import ParserCreate
+    parser = ParserCreate(namespace_separator="}")
+    parser.StartElementHandler = self._start_element
+    parser.EndElementHandler = self._end_element
+    with document_reader(smil_path, sources) as reader:
+      parser.ParseFile(reader)
+
+  def _start_element(self, name: str, attrs: dict[str, str]):
+    local_name = name.rpartition("}")[2]
+    if local_name == "par":
+      self._text = None
+      self._audio = None
+    elif local_name == "text":
+      src = attrs.get("src", None)
+      if src is not None:
+        href, _, fragment = src.strip().partition("#")
+        self._text = (self._resolve(href), fragment if fragment != "" else None)
+    elif local_name == "audio":
+      src = attrs.get("src", None)
+      try:
+        begin = parse_clock(attrs.get("clipBegin", "0"))
+        end = parse_clock(attrs["clipEnd"]) if "clipEnd" in attrs else None
+      except ValueError:
+        return
+      if src is not None:
+        self._audio = (self._resolve(src.strip()), begin, end)
+
+  def _end_element(self, name: str):
+    if name.rpartition("}")[2] != "par":
+      return
+    if self._text is not None and self._audio is not None:
+      text_path, fragment = self._text
+      audio_path, begin, end = self._audio
+      self._clips.append(Clip(text_path, fragment, audio_path, begin, end))
+    self._text = None
+    self._audio = None
+
+  def _resolve(self, href: str) -> str:
+    return relative_root_path(self._root_path, self._base_path, href)
@@ -1,9 +1,9 @@
 import os
-import io
 
-from dataclasses import dataclass
-from lxml import etree
-from .utils import relative_root_path
+from dataclasses import dataclass, field
+from typing import BinaryIO, Callable
+from .toc import TocIndex, TocFormat, read_toc
+from .utils import relative_root_path, DiskFiles, MemberFiles
 
 
 @dataclass
@@ -14,23 +14,48 @@ class EpubBook:
   content_path: str
   ncx: list[tuple[str, str]]
   ref2path: dict[str, str]
+  ncx_path: str | None = None
+  # content paths in reading order
+  spine: list[str] = field(default_factory=list)
+  # read from the NCX when the book has one, otherwise from the EPUB 3 navigation document
+  toc: TocIndex = field(default_factory=TocIndex)
+  toc_path: str | None = None
+  # media overlay (SMIL) documents of the manifest
+  overlay_paths: list[str] = field(default_factory=list)
 
 def pick(root_path: str) -> EpubBook:
-  content_path = _find_content_path(root_path)
-  content_tree = etree.parse(content_path)
+  return _pick(root_path, DiskFiles())
+
+# picks a book straight from its archive: open_member and has_member take member names, such as
+# ZipFile.open and a set made of ZipFile.namelist(). the paths of the book are under root_path,
+# as if the archive had been extracted there, and only the members pick reads are decompressed
+def pick_members(
+    root_path: str,
+    open_member: Callable[[str], BinaryIO],
+    has_member: Callable[[str], bool],
+  ) -> EpubBook:
+  root_path = os.path.abspath(root_path)
+  return _pick(root_path, MemberFiles(root_path, open_member, has_member))
+
+def _pick(root_path: str, files: DiskFiles | MemberFiles) -> EpubBook:
+  content_path = _find_content_path(root_path, files)
+  with files.open(content_path) as file:
+    content_tree = _etree().parse(file)
   base_path = os.path.dirname(content_path)
   title, authors = _find_metadata(content_tree)
-  ncx_path = _find_ncx_path(content_tree, root_path, content_path)
+  toc_path, toc_format = _find_toc_path(content_tree, root_path, content_path, files)
+  idrefs = _find_spine_idrefs(content_tree)
   ref2path: dict[str, str] = {}
-  ncx: list[tuple[str, str]] = []
 
-  for id, href in _find_refs(content_tree):
-    path = relative_root_path(root_path, base_path, href)
+  for id, href in _find_refs(content_tree, idrefs):
+    path = relative_root_path(root_path, base_path, href, files.exists)
     ref2path[id] = path
 
-  for label, href in _find_ncx(ncx_path):
-    path = relative_root_path(root_path, base_path, href)
-    ncx.append((label, path))
+  spine = [ref2path[idref] for idref in idrefs if idref in ref2path]
+
+  toc = TocIndex()
+  if toc_path is not None:
+    toc = read_toc(root_path, toc_path, toc_format, files)
 
   return EpubBook(
     title=title,
@@ -38,11 +63,17 @@ def pick(root_path: str) -> EpubBook:
     root_path=root_path,
     content_path=content_path,
     ref2path=ref2path,
-    ncx=ncx,
+    ncx=toc.as_ncx(),
+    ncx_path=toc_path if toc_format == "ncx" else None,
+    spine=spine,
+    toc=toc,
+    toc_path=toc_path,
+    overlay_paths=_find_overlay_paths(content_tree, root_path, content_path, files),
   )
 
-def _find_content_path(root_path: str) -> str:
-  root = etree.parse(os.path.join(root_path, "META-INF", "container.xml")).getroot()
+def _find_content_path(root_path: str, files: DiskFiles | MemberFiles) -> str:
+  with files.open(os.path.join(root_path, "META-INF", "container.xml")) as file:
+    root = _etree().parse(file).getroot()
   rootfile = root.xpath(
     "//ns:container/ns:rootfiles/ns:rootfile",
     namespaces={ "ns": root.nsmap.get(None) },
@@ -52,26 +83,76 @@ def _find_content_path(root_path: str) -> str:
 
   return os.path.abspath(joined_path)
 
-def _find_ncx_path(tree: any, root_path: str, content_path: str):
-  manifest = tree.xpath(
-    "//ns:manifest",
-    namespaces=_namespaces(tree),
-  )[0]
-  ncx_dom = manifest.find(".//*[@id=\"ncx\"]")
+def _find_toc_path(
+    tree: any,
+    root_path: str,
+    content_path: str,
+    files: DiskFiles | MemberFiles,
+  ) -> tuple[str | None, TocFormat | None]:
+  namespaces = _namespaces(tree)
+  manifest = tree.xpath("//ns:manifest", namespaces=namespaces)[0]
+  spines = tree.xpath("//ns:spine", namespaces=namespaces)
+  ncx_ids = ["ncx"]
+  if len(spines) > 0 and spines[0].get("toc", None) is not None:
+    ncx_ids.insert(0, spines[0].get("toc").strip())
+
+  ncx_dom = None
+  for ncx_id in ncx_ids:
+    ncx_dom = manifest.find(f".//*[@id=\"{ncx_id}\"]")
+    if ncx_dom is not None:
+      break
   if ncx_dom is None:
+    ncx_dom = manifest.find(".//*[@media-type=\"application/x-dtbncx+xml\"]")
+  path = _manifest_path(ncx_dom, root_path, content_path, files)
+  if path is not None:
+    return path, "ncx"
+
+  for item_dom in manifest.xpath(".//ns:item[@properties]", namespaces=namespaces):
+    if "nav" in item_dom.get("properties").split():
+      path = _manifest_path(item_dom, root_path, content_path, files)
+      if path is not None:
+        return path, "nav"
+
+  return None, None
+
+def _find_overlay_paths(
+    tree: any,
+    root_path: str,
+    content_path: str,
+    files: DiskFiles | MemberFiles,
+  ) -> list[str]:
+  paths: list[str] = []
+  for item_dom in tree.xpath(
+    "//ns:manifest/ns:item[@media-type=\"application/smil+xml\"]",
+    namespaces=_namespaces(tree),
+  ):
+    path = _manifest_path(item_dom, root_path, content_path, files)
+    if path is not None:
+      paths.append(path)
+  return paths
+
+def _manifest_path(
+    item_dom: any,
+    root_path: str,
+    content_path: str,
+    files: DiskFiles | MemberFiles,
+  ) -> str | None:
+  if item_dom is None or item_dom.get("href", None) is None:
     return None
 
-  href_path = ncx_dom.get("href")
+  href_path = item_dom.get("href").strip()
   base_path = os.path.dirname(content_path)
   path = os.path.join(base_path, href_path)
   path = os.path.abspath(path)
 
-  if os.path.exists(path):
+  if files.exists(path):
     return path
 
-  path = os.path.join(root_path, path)
+  path = os.path.join(root_path, href_path)
   path = os.path.abspath(path)
-  return path
+  if files.exists(path):
+    return path
+  return None
 
 def _find_metadata(tree: any):
   metadata = tree.xpath("//ns:metadata", namespaces=_namespaces(tree))[0]
@@ -95,16 +176,22 @@ def _find_metadata(tree: any):
 
   return title, authors
 
-def _find_refs(tree: any):
+def _find_spine_idrefs(tree: any) -> list[str]:
   namespaces = _namespaces(tree)
   spine = tree.xpath("//ns:spine", namespaces=namespaces)[0]
-  manifest = tree.xpath("//ns:manifest", namespaces=namespaces)[0]
-  idrefs: set[str] = set()
+  idrefs: list[str] = []
 
   for child in spine.xpath(".//ns:itemref", namespaces=namespaces):
     idref = child.get("idref", None)
     if idref is not None:
-      idrefs.add(idref.strip())
+      idrefs.append(idref.strip())
+
+  return idrefs
+
+def _find_refs(tree: any, spine_idrefs: list[str]):
+  namespaces = _namespaces(tree)
+  manifest = tree.xpath("//ns:manifest", namespaces=namespaces)[0]
+  idrefs: set[str] = set(spine_idrefs)
 
   for child in manifest.xpath(".//ns:item", namespaces=namespaces):
     id = child.get("id", None)
@@ -117,22 +204,11 @@ def _find_refs(tree: any):
     if id in idrefs:
       yield id, href.strip()
 
-def _find_ncx(ncx_path: str):
-  tree = etree.parse(ncx_path)
-  namespaces = _namespaces(tree)
-  for nav_point in tree.xpath("//ns:navPoint", namespaces=namespaces):
-    label_dom = nav_point.xpath(".//ns:navLabel", namespaces=namespaces)[0]
-    content_dom = nav_point.xpath(".//ns:content", namespaces=namespaces)[0]
-    label_buffer = io.StringIO()
-
-    for text_dom in label_dom.xpath(".//ns:text", namespaces=namespaces):
-      label_buffer.write(text_dom.text)
-
-    label = label_buffer.getvalue().strip()
-    href = content_dom.get("src", None)
-
-    if href is not None:
-      yield label, href.strip()
+def _etree():
+  # lxml is heavy to import, only pay for it when a book is really picked
+  # pylint: disable=import-outside-toplevel
+  from lxml import etree
+  return etree
 
 def _namespaces(tree: any):
   return { "ns": tree.getroot().nsmap.get(None) }
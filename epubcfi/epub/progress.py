@@ -0,0 +1,100 @@
+import os
+
+from bisect import bisect_right
+from dataclasses import dataclass
+from ..cfi import PathRange, ParsedPath, to_absolute
+from .picker import EpubBook
+from .ncx_finder import find_content_path, pick_document_steps
+from .source import DocumentSources, document_reader
+from .stepper import collect_lengths
+from .utils import DocumentCache, member_path
+
+
+@dataclass
+class DocumentLengths:
+  # keys[i] is the step path of a node and starts[i] the number of characters before it
+  keys: list[tuple[int, ...]]
+  starts: list[int]
+  length: int
+
+  def position(self, steps: list[int], offset: int | None) -> int:
+    key = tuple(steps)
+    index = bisect_right(self.keys, key) - 1
+    if index < 0:
+      return 0
+    position = self.starts[index]
+    # only text nodes (odd indices) can be entered by a character offset
+    if offset is not None and len(key) > 0 and key[-1] % 2 == 1 and self.keys[index] == key:
+      limit = self.length
+      if index + 1 < len(self.starts):
+        limit = self.starts[index + 1]
+      position = min(position + offset, limit)
+    return position
+
+@dataclass
+class SpineLengths:
+  indexes: dict[str, int]
+  documents: list[DocumentLengths]
+  # starts[i] is the number of characters before the i-th spine item, the last one is the book length
+  starts: list[int]
+
+  @property
+  def length(self) -> int:
+    return self.starts[-1]
+
+def spine_lengths(book: EpubBook, documents: DocumentCache, sources: DocumentSources | None = None) -> SpineLengths:
+  indexes: dict[str, int] = {}
+  lengths_list: list[DocumentLengths] = []
+  starts: list[int] = [0]
+  for index, content_path in enumerate(book.spine):
+    indexes.setdefault(content_path, index)
+    lengths = document_lengths(book, documents, content_path, sources)
+    lengths_list.append(lengths)
+    starts.append(starts[-1] + lengths.length)
+  return SpineLengths(indexes, lengths_list, starts)
+
+def document_lengths(
+    book: EpubBook,
+    documents: DocumentCache,
+    content_path: str,
+    sources: DocumentSources | None = None,
+  ) -> DocumentLengths:
+  file_path = os.path.join(book.root_path, content_path)
+  member = member_path(book.root_path, file_path)
+  lengths = documents.get(member, "lengths")
+  if lengths is not None:
+    return lengths
+
+  if os.path.isfile(file_path):
+    with document_reader(file_path, sources) as reader:
+      lengths = DocumentLengths(*collect_lengths(reader))
+  else:
+    lengths = DocumentLengths([], [], 0)
+  documents.set(member, "lengths", lengths)
+  return lengths
+
+def find_progress(
+    book: EpubBook,
+    reader: any,
+    path: ParsedPath,
+    spine: SpineLengths,
+    cache: dict[tuple[int, ...], str | None] | None = None,
+  ) -> float | None:
+  content_path = find_content_path(book, reader, path, cache=cache)
+  if content_path is None:
+    return None
+  spine_index = spine.indexes.get(content_path, None)
+  if spine_index is None:
+    return None
+
+  if isinstance(path, PathRange):
+    # a range is as far as its start
+    path, _ = to_absolute(path)
+  steps, offset = pick_document_steps(path)
+  if steps is None:
+    return None
+  if spine.length == 0:
+    return 0.0
+
+  position = spine.starts[spine_index] + spine.documents[spine_index].position(steps, offset)
+  return position / spine.length
@@ -0,0 +1,197 @@
+import os
+import json
+import shutil
+import hashlib
+
+from dataclasses import dataclass
+from ..cfi import Path, PathRange, Redirect, Step, CharacterOffset, from_absolute
+from .picker import EpubBook
+from .source import DocumentSources, document_reader
+from .stepper import collect_words, collect_itemrefs, word_pattern
+from .utils import DocumentCache, member_path
+
+_INDEX_VERSION = 1
+
+@dataclass
+class DocumentIndex:
+  # size and mtime of the content document the index was built from
+  signature: list[int]
+  # step paths of the text nodes, relative to the root element
+  nodes: list[tuple[int, ...]]
+  # term -> flat (ordinal, text node, start, end) groups, in document order
+  terms: dict[str, list[int]]
+
+def search_book(
+    book: EpubBook,
+    query: str,
+    documents: DocumentCache | None = None,
+    index_path: str | None = None,
+    limit: int | None = None,
+    sources: DocumentSources | None = None,
+  ) -> list[PathRange]:
+  # the words of the query must follow each other in the document, whatever lies between them
+  terms = [matched.group().casefold() for matched in word_pattern().finditer(query)]
+  hits: list[PathRange] = []
+  if len(terms) == 0:
+    return hits
+
+  for steps, content_path in zip(spine_steps(book, documents, sources), book.spine):
+    if steps is None:
+      continue
+    index = document_index(book.root_path, documents, content_path, index_path, sources)
+    for start, end in _find_phrase(index, terms):
+      hits.append(_to_range(steps, index, start, end))
+      if limit is not None and len(hits) >= limit:
+        return hits
+  return hits
+
+# steps from the package document to the itemref of every spine item, None when it cannot be found
+def spine_steps(
+    book: EpubBook,
+    documents: DocumentCache | None = None,
+    sources: DocumentSources | None = None,
+  ) -> list[list[int] | None]:
+  member = member_path(book.root_path, book.content_path)
+  if documents is not None:
+    steps_list = documents.get(member, "spine_steps")
+    if steps_list is not None:
+      return steps_list
+
+  with document_reader(book.content_path, sources) as reader:
+    itemrefs = collect_itemrefs(reader)
+  # book.spine skips the itemrefs missing from the manifest in the same way
+  steps_list: list[list[int] | None] = [
+    list(path) for path, idref in itemrefs
+    if idref in book.ref2path
+  ]
+  steps_list.extend([None] * (len(book.spine) - len(steps_list)))
+
+  if documents is not None:
+    documents.set(member, "spine_steps", steps_list)
+  return steps_list
+
+def document_index(
+    root_path: str,
+    documents: DocumentCache | None,
+    content_path: str,
+    index_path: str | None = None,
+    sources: DocumentSources | None = None,
+  ) -> DocumentIndex:
+  file_path = os.path.join(root_path, content_path)
+  member = member_path(root_path, file_path)
+  if documents is not None:
+    index = documents.get(member, "search")
+    if index is not None:
+      return index
+
+  signature: list[int] = []
+  if os.path.isfile(file_path):
+    stat = os.stat(file_path)
+    signature = [stat.st_size, stat.st_mtime_ns]
+
+  saved_path: str | None = None
+  index: DocumentIndex | None = None
+  if index_path is not None:
+    saved_path = _saved_path(index_path, root_path, member)
+    index = _load_index(saved_path, signature)
+
+  if index is None:
+    nodes: list[tuple[int, ...]] = []
+    terms: dict[str, list[int]] = {}
+    if len(signature) > 0:
+      with document_reader(file_path, sources) as reader:
+        nodes, terms = collect_words(reader)
+    index = DocumentIndex(signature, nodes, terms)
+    if saved_path is not None:
+      _save_index(saved_path, index)
+
+  if documents is not None:
+    documents.set(member, "search", index)
+  return index
+
+def _find_phrase(index: DocumentIndex, terms: list[str]) -> list[tuple[tuple[int, int], tuple[int, int]]]:
+  postings_list: list[list[int]] = []
+  for term in terms:
+    postings = index.terms.get(term, None)
+    if postings is None:
+      return []
+    postings_list.append(postings)
+
+  # ordinal -> (text node, end) of the last word, and the ordinals of the words in between
+  last_postings = postings_list[-1]
+  last_words = {
+    last_postings[i]: (last_postings[i + 1], last_postings[i + 3])
+    for i in range(0, len(last_postings), 4)
+  }
+  middle_words = [set(postings[::4]) for postings in postings_list[1:-1]]
+
+  found: list[tuple[tuple[int, int], tuple[int, int]]] = []
+  first_postings = postings_list[0]
+  size = len(terms) - 1
+  for i in range(0, len(first_postings), 4):
+    ordinal = first_postings[i]
+    last = last_words.get(ordinal + size, None)
+    if last is None:
+      continue
+    if all(ordinal + j + 1 in words for j, words in enumerate(middle_words)):
+      found.append(((first_postings[i + 1], first_postings[i + 2]), last))
+  return found
+
+def _to_range(spine: list[int], index: DocumentIndex, start: tuple[int, int], end: tuple[int, int]) -> PathRange:
+  prefix: list[Redirect | Step] = [Step(step, None) for step in spine]
+  prefix.append(Redirect())
+  start_node, start_offset = start
+  end_node, end_offset = end
+  return from_absolute(
+    Path(
+      steps=[*prefix, *(Step(step, None) for step in index.nodes[start_node])],
+      offset=CharacterOffset(value=start_offset, assertion=None),
+    ),
+    Path(
+      steps=[*prefix, *(Step(step, None) for step in index.nodes[end_node])],
+      offset=CharacterOffset(value=end_offset, assertion=None),
+    ),
+  )
+
+# drops the saved indexes of a book whose extraction was removed
+def remove_indexes(index_path: str, root_path: str):
+  shutil.rmtree(os.path.join(index_path, _book_hash(root_path)), ignore_errors=True)
+
+def _saved_path(index_path: str, root_path: str, member: str) -> str:
+  member_hash = hashlib.sha1(member.encode()).hexdigest()
+  return os.path.join(index_path, _book_hash(root_path), f"{member_hash}.json")
+
+def _book_hash(root_path: str) -> str:
+  return hashlib.sha1(os.path.abspath(root_path).encode()).hexdigest()
+
+def _load_index(saved_path: str, signature: list[int]) -> DocumentIndex | None:
+  if not os.path.isfile(saved_path):
+    return None
+  try:
+    with open(saved_path, "r", encoding="utf8") as file:
+      saved = json.load(file)
+  except ValueError:
+    return None
+  if not isinstance(saved, dict) or saved.get("version", None) != _INDEX_VERSION:
+    return None
+  if saved.get("signature", None) != signature:
+    # the document changed since it was indexed
+    return None
+  return DocumentIndex(
+    signature=signature,
+    nodes=[tuple(node) for node in saved["nodes"]],
+    terms=saved["terms"],
+  )
+
+def _save_index(saved_path: str, index: DocumentIndex):
+  os.makedirs(os.path.dirname(saved_path), exist_ok=True)
+  # one temp file per process, another one may be saving the same index
+  temp_path = f"{saved_path}.{os.getpid()}.part"
+  with open(temp_path, "w", encoding="utf8") as file:
+    json.dump({
+      "version": _INDEX_VERSION,
+      "signature": index.signature,
+      "nodes": index.nodes,
+      "terms": index.terms,
+    }, file, ensure_ascii=False, separators=(",", ":"))
+  os.replace(temp_path, saved_path)
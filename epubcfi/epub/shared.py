@@ -0,0 +1,279 @@
+import os
+import mmap
+import struct
+
+from array import array
+from bisect import bisect_left
+from typing import Callable, Generic, Iterator, Mapping, Sequence, TypeVar
+from .picker import EpubBook
+from .progress import SpineLengths, DocumentLengths
+from .toc import TocEntry, TocIndex
+
+# indexes of a book written once into a flat file and mapped read-only by every process that
+# needs them. the file holds no pointers: strings are numbered in a table and every structure
+# is an int64 array of string numbers, counts and offsets, read in place through the mapping.
+#
+#   magic | section count | (name, typecode, offset, length) per section | sections, 8 bytes aligned
+_MAGIC = b"EPUBIDX\x01"
+_HEADER = struct.Struct("<8sI")
+_SECTION = struct.Struct("<16scxxxQQ")
+_TOC_FIELDS = 6
+_NONE = -1
+
+T = TypeVar("T")
+
+def publish_book(index_path: str, book: EpubBook):
+  writer = _FlatWriter()
+  writer.ints("book", [
+    writer.string(book.title),
+    writer.string(book.root_path),
+    writer.string(book.content_path),
+    writer.string(book.ncx_path),
+    writer.string(book.toc_path),
+  ])
+  writer.ints("authors", [writer.string(author) for author in book.authors])
+  writer.ints("spine", [writer.string(path) for path in book.spine])
+  writer.ints("overlays", [writer.string(path) for path in book.overlay_paths])
+  writer.mapping("refs", {id: writer.string(path) for id, path in book.ref2path.items()})
+  writer.ints("ncx", [writer.string(text) for pair in book.ncx for text in pair])
+
+  toc_fields: list[int] = []
+  for entry in book.toc.entries:
+    toc_fields.extend((
+      writer.string(entry.label),
+      writer.string(entry.path),
+      writer.string(entry.fragment),
+      entry.play_order,
+      entry.depth,
+      entry.parent,
+    ))
+  writer.ints("toc", toc_fields)
+  writer.lists("toc_paths", book.toc.paths)
+  writer.write(index_path)
+
+def publish_spine(index_path: str, spine: SpineLengths):
+  writer = _FlatWriter()
+  writer.mapping("indexes", spine.indexes)
+  writer.ints("starts", spine.starts)
+  documents: list[int] = []
+  key_offsets: list[int] = [0]
+  key_steps: list[int] = []
+  key_starts: list[int] = []
+  for lengths in spine.documents:
+    documents.extend((len(key_starts), len(lengths.keys), lengths.length))
+    for key, start in zip(lengths.keys, lengths.starts):
+      key_steps.extend(key)
+      key_offsets.append(len(key_steps))
+      key_starts.append(start)
+  writer.ints("documents", documents)
+  writer.ints("key_offsets", key_offsets)
+  writer.ints("key_steps", key_steps)
+  writer.ints("key_starts", key_starts)
+  writer.write(index_path)
+
+# None when nothing was published at index_path yet
+def attach_book(index_path: str) -> EpubBook | None:
+  flat = _FlatFile.open(index_path)
+  if flat is None:
+    return None
+  title, root_path, content_path, ncx_path, toc_path = flat.ints("book")
+  strings = flat.strings
+  ncx = flat.ints("ncx")
+  toc = flat.ints("toc")
+  return EpubBook(
+    title=strings.get(title),
+    authors=_Strings(flat, flat.ints("authors")),
+    root_path=strings.get(root_path),
+    content_path=strings.get(content_path),
+    ncx=_Items(len(ncx) // 2, lambda i: (strings.get(ncx[i * 2]), strings.get(ncx[i * 2 + 1]))),
+    ref2path=_Mapping(flat, "refs", lambda values, i: strings.get(values[i])),
+    ncx_path=strings.get(ncx_path),
+    spine=_Strings(flat, flat.ints("spine")),
+    toc=TocIndex(
+      entries=_Items(len(toc) // _TOC_FIELDS, lambda i: _toc_entry(strings, toc, i)),
+      paths=_Mapping(flat, "toc_paths", _list_value(flat, "toc_paths")),
+    ),
+    toc_path=strings.get(toc_path),
+    overlay_paths=_Strings(flat, flat.ints("overlays")),
+  )
+
+def attach_spine(index_path: str) -> SpineLengths | None:
+  flat = _FlatFile.open(index_path)
+  if flat is None:
+    return None
+  documents = flat.ints("documents")
+  key_offsets = flat.ints("key_offsets")
+  key_steps = flat.ints("key_steps")
+  key_starts = flat.ints("key_starts")
+
+  def document(i: int) -> DocumentLengths:
+    first, count, length = documents[i * 3:i * 3 + 3]
+    return DocumentLengths(
+      keys=_Items(count, lambda j: tuple(key_steps[key_offsets[first + j]:key_offsets[first + j + 1]])),
+      starts=key_starts[first:first + count],
+      length=length,
+    )
+
+  return SpineLengths(
+    indexes=_Mapping(flat, "indexes", lambda values, i: values[i]),
+    documents=_Items(len(documents) // 3, document),
+    starts=flat.ints("starts"),
+  )
+
+def _toc_entry(strings: "_StringTable", toc: memoryview, i: int) -> TocEntry:
+  label, path, fragment, play_order, depth, parent = toc[i * _TOC_FIELDS:(i + 1) * _TOC_FIELDS]
+  return TocEntry(
+    label=strings.get(label),
+    path=strings.get(path),
+    fragment=strings.get(fragment),
+    play_order=play_order,
+    depth=depth,
+    parent=parent,
+  )
+
+def _list_value(flat: "_FlatFile", name: str) -> Callable[[memoryview, int], memoryview]:
+  items = flat.ints(f"{name}.items")
+  def value(offsets: memoryview, i: int) -> memoryview:
+    return items[offsets[i]:offsets[i + 1]]
+  return value
+
+class _Items(Sequence[T], Generic[T]):
+  def __init__(self, size: int, item: Callable[[int], T]):
+    self._size: int = size
+    self._item: Callable[[int], T] = item
+
+  def __len__(self) -> int:
+    return self._size
+
+  def __getitem__(self, index: int) -> T:
+    if isinstance(index, slice):
+      return [self[i] for i in range(*index.indices(self._size))]
+    if index < 0:
+      index += self._size
+    if index < 0 or index >= self._size:
+      raise IndexError(index)
+    return self._item(index)
+
+class _Strings(_Items[str]):
+  def __init__(self, flat: "_FlatFile", ids: memoryview):
+    super().__init__(len(ids), lambda i: flat.strings.get(ids[i]))
+
+# keys are sorted when written, a lookup decodes the few keys its binary search goes through
+class _Mapping(Mapping[str, T], Generic[T]):
+  def __init__(self, flat: "_FlatFile", name: str, value: Callable[[memoryview, int], T]):
+    self._keys: _Strings = _Strings(flat, flat.ints(f"{name}.keys"))
+    self._values: memoryview = flat.ints(f"{name}.values")
+    self._value: Callable[[memoryview, int], T] = value
+
+  def __getitem__(self, key: str) -> T:
+    index = bisect_left(self._keys, key)
+    if index >= len(self._keys) or self._keys[index] != key:
+      raise KeyError(key)
+    return self._value(self._values, index)
+
+  def __iter__(self) -> Iterator[str]:
+    return iter(self._keys)
+
+  def __len__(self) -> int:
+    return len(self._keys)
+
+class _StringTable:
+  def __init__(self, offsets: memoryview, blob: memoryview):
+    self._offsets: memoryview = offsets
+    self._blob: memoryview = blob
+
+  def get(self, id: int) -> str | None:
+    if id == _NONE:
+      return None
+    return str(self._blob[self._offsets[id]:self._offsets[id + 1]], "utf8")
+
+class _FlatFile:
+  def __init__(self, buffer: mmap.mmap):
+    self._buffer: mmap.mmap = buffer
+    self._view: memoryview = memoryview(buffer)
+    self._sections: dict[str, tuple[str, int, int]] = {}
+    magic, count = _HEADER.unpack_from(buffer, 0)
+    if magic != _MAGIC:
+      raise ValueError("Not a book index")
+    for i in range(count):
+      name, typecode, offset, length = _SECTION.unpack_from(buffer, _HEADER.size + i * _SECTION.size)
+      self._sections[name.rstrip(b"\x00").decode("ascii")] = (typecode.decode("ascii"), offset, length)
+    self.strings: _StringTable = _StringTable(self.ints("string_offsets"), self._section("strings"))
+
+  @classmethod
+  def open(cls, index_path: str) -> "_FlatFile | None":
+    if not os.path.isfile(index_path):
+      return None
+    with open(index_path, "rb") as file:
+      # the mapping stays valid after the file is closed, and is only released with its last view
+      return cls(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ))
+
+  def ints(self, name: str) -> memoryview:
+    return self._section(name).cast("q")
+
+  def _section(self, name: str) -> memoryview:
+    _, offset, length = self._sections[name]
+    return self._view[offset:offset + length]
+
+class _FlatWriter:
+  def __init__(self):
+    self._strings: dict[str, int] = {}
+    self._sections: dict[str, tuple[str, bytes]] = {}
+
+  def string(self, text: str | None) -> int:
+    if text is None:
+      return _NONE
+    id = self._strings.get(text, None)
+    if id is None:
+      id = len(self._strings)
+      self._strings[text] = id
+    return id
+
+  def ints(self, name: str, values: Sequence[int]):
+    if len(name) > 16:
+      raise ValueError(f"Section name is too long: {name}")
+    self._sections[name] = ("q", array("q", values).tobytes())
+
+  def mapping(self, name: str, values: Mapping[str, int]):
+    keys = sorted(values.keys())
+    self.ints(f"{name}.keys", [self.string(key) for key in keys])
+    self.ints(f"{name}.values", [values[key] for key in keys])
+
+  def lists(self, name: str, values: Mapping[str, Sequence[int]]):
+    # offsets into one array holding every list, in the order of the sorted keys
+    offsets: list[int] = [0]
+    items: list[int] = []
+    for key in sorted(values.keys()):
+      items.extend(values[key])
+      offsets.append(len(items))
+    self.ints(f"{name}.keys", [self.string(key) for key in sorted(values.keys())])
+    self.ints(f"{name}.values", offsets)
+    self.ints(f"{name}.items", items)
+
+  def write(self, index_path: str):
+    offsets: list[int] = [0]
+    blob = bytearray()
+    for text in self._strings:
+      blob.extend(text.encode("utf8"))
+      offsets.append(len(blob))
+    self.ints("string_offsets", offsets)
+    self._sections["strings"] = ("B", bytes(blob))
+
+    header_size = _HEADER.size + len(self._sections) * _SECTION.size
+    position = _align(header_size)
+    table = bytearray(_HEADER.pack(_MAGIC, len(self._sections)))
+    for name, (typecode, data) in self._sections.items():
+      table.extend(_SECTION.pack(name.encode("ascii"), typecode.encode("ascii"), position, len(data)))
+      position = _align(position + len(data))
+
+    # written aside and moved in place, processes attach to complete files only
+    temp_path = f"{index_path}.{os.getpid()}.part"
+    with open(temp_path, "wb") as file:
+      file.write(table)
+      for _, data in self._sections.values():
+        file.write(b"\x00" * (_align(file.tell()) - file.tell()))
+        file.write(data)
+    os.replace(temp_path, index_path)
+
+def _align(position: int) -> int:
+  return (position + 7) & ~7
@@ -0,0 +1,165 @@
+import os
+import mmap
+
+from threading import Lock
+from typing import BinaryIO, Callable, Iterator
+
+_CHUNK_SIZE = 64 * 1024
+
+# a document mapped read-only into memory. the page cache backs the mapping, so reading a hot
+# document again allocates no buffer, and threads share one mapping with a reader each
+class MappedDocument:
+  def __init__(self, file_path: str):
+    self._buffer: mmap.mmap | None = None
+    with open(file_path, "rb") as file:
+      stat = os.fstat(file.fileno())
+      self.stat_key: tuple[int, int, int] = (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+      # empty files cannot be mapped
+      if stat.st_size > 0:
+        self._buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    self._view: memoryview = memoryview(self._buffer if self._buffer is not None else b"")
+
+  def __len__(self) -> int:
+    return len(self._view)
+
+  # the bytes between two offsets without copying them, for indexes that know where an element starts
+  def view(self, start: int = 0, end: int | None = None) -> memoryview:
+    return self._view[start:end]
+
+  def reader(self) -> "DocumentReader":
+    return DocumentReader(lambda: self)
+
+  def close(self):
+    try:
+      self._view.release()
+      if self._buffer is not None:
+        self._buffer.close()
+    except BufferError:
+      # a view is still in use, the mapping goes away with it
+      pass
+
+# a file-like position over a mapped document. the parsers of stepper take its chunks directly.
+# the document is only looked up on first use, most requests find their answer in a cache first
+class DocumentReader:
+  def __init__(self, open_document: Callable[[], MappedDocument]):
+    self._open_document: Callable[[], MappedDocument] = open_document
+    self._mapped: MappedDocument | None = None
+    self._position: int = 0
+
+  @property
+  def _document(self) -> MappedDocument:
+    if self._mapped is None:
+      self._mapped = self._open_document()
+    return self._mapped
+
+  def read(self, size: int = -1) -> bytes:
+    end = len(self._document) if size < 0 else min(self._position + size, len(self._document))
+    data = bytes(self._document.view(self._position, end))
+    self._position = max(end, self._position)
+    return data
+
+  def chunks(self, size: int = _CHUNK_SIZE) -> Iterator[memoryview]:
+    while self._position < len(self._document):
+      end = min(self._position + size, len(self._document))
+      chunk = self._document.view(self._position, end)
+      self._position = end
+      yield chunk
+
+  def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+    if whence == os.SEEK_CUR:
+      offset += self._position
+    elif whence == os.SEEK_END:
+      offset += len(self._document)
+    self._position = max(offset, 0)
+    return self._position
+
+  def tell(self) -> int:
+    return self._position
+
+  def close(self):
+    pass
+
+  def __enter__(self) -> "DocumentReader":
+    return self
+
+  def __exit__(self, exc_type, exc_val, exc_tb):
+    self.close()
+
+# a document read through a plain file, opened on first use like a mapped one.
+# truncating a mapped file under its reader kills the process with SIGBUS, a file only reads less
+class FileReader:
+  def __init__(self, file_path: str):
+    self._file_path: str = file_path
+    self._opened: BinaryIO | None = None
+
+  @property
+  def _file(self) -> BinaryIO:
+    if self._opened is None:
+      self._opened = open(self._file_path, "rb")
+    return self._opened
+
+  def read(self, size: int = -1) -> bytes:
+    return self._file.read(size)
+
+  def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+    return self._file.seek(offset, whence)
+
+  def tell(self) -> int:
+    return self._file.tell()
+
+  def close(self):
+    if self._opened is not None:
+      self._opened.close()
+      self._opened = None
+
+  def __enter__(self) -> "FileReader":
+    return self
+
+  def __exit__(self, exc_type, exc_val, exc_tb):
+    self.close()
+
+# the documents of one book, mapped on first use and released with the book. only extracted books
+# are mapped: their files are written once and replaced as a whole, while the documents of a
+# directory book may be edited in place and are read through plain files.
+# threads share the mappings, the lock keeps them from mapping one file twice
+class DocumentSources:
+  def __init__(self, mapped: bool = True):
+    self._mapped: bool = mapped
+    self._lock: Lock = Lock()
+    self._documents: dict[str, MappedDocument] = {}
+    # replaced files whose mapping may still be read by another thread, closed with the book
+    self._replaced: list[MappedDocument] = []
+
+  def reader(self, file_path: str) -> DocumentReader | FileReader:
+    if not self._mapped:
+      return FileReader(file_path)
+    return DocumentReader(lambda: self._document(file_path))
+
+  def _document(self, file_path: str) -> MappedDocument:
+    stat_key = _stat_key(file_path)
+    with self._lock:
+      document = self._documents.get(file_path, None)
+      if document is not None and document.stat_key != stat_key:
+        self._replaced.append(document)
+        document = None
+      if document is None:
+        document = MappedDocument(file_path)
+        self._documents[file_path] = document
+      return document
+
+  def close(self):
+    with self._lock:
+      for document in (*self._documents.values(), *self._replaced):
+        document.close()
+      self._documents.clear()
+      self._replaced.clear()
+
+# a reader through the sources of the book, or a plain file for callers without them
+def document_reader(file_path: str, sources: DocumentSources | None = None) -> BinaryIO | DocumentReader | FileReader:
+  if sources is None:
+    return open(file_path, "rb")
+  return sources.reader(file_path)
+
+def _stat_key(file_path: str) -> tuple[int, int, int]:
+  stat = os.stat(file_path)
+  return (stat.st_size, stat.st_mtime_ns, stat.st_ino)
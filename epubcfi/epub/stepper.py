@@ -1,5 +1,8 @@
+import re
+
+from functools import cache
 from dataclasses import dataclass
-from xml.parsers.expat import ParserCreate
+from ..metrics import Metrics
 
 @dataclass
 class _State:
@@ -17,7 +20,8 @@ class _Cursor:
     self._matched: bool = False
     self._last_is_text: bool = False
     self._index: int = 0
-    self._parser = ParserCreate()
+    self.events: int = 0
+    self._parser = _create_parser()
     self._parser.StartElementHandler = self._start_element
     self._parser.EndElementHandler = self._end_element
     self._parser.CharacterDataHandler = self._char_data
@@ -28,7 +32,7 @@ class _Cursor:
 
   def parse(self):
     try:
-      self._parser.ParseFile(self._reader)
+      _parse(self._parser, self._reader)
     except StopIteration:
       pass
     if not self._matched:
@@ -40,6 +44,7 @@ class _Cursor:
 
   def _start_element(self, name: str, attrs: dict[str, str]):
     # Child [XML] elements are assigned even indices
+    self.events += 1
     self._index += 1
     if self._index % 2 != 0:
       self._index += 1
@@ -58,6 +63,7 @@ class _Cursor:
         self._step_deep += 1
 
   def _end_element(self, name: str):
+    self.events += 1
     state = self._stack.pop()
     assert state is not None
     assert state.name == name
@@ -70,6 +76,7 @@ class _Cursor:
   def _char_data(self, _: str):
     # Consecutive (potentially-empty) chunks of character
     # data are each assigned odd indices (i.e., starting at 1, followed by 3, etc.).
+    self.events += 1
     if self._last_is_text:
       return
     self._index += 1
@@ -77,5 +84,255 @@ class _Cursor:
     if self._index % 2 == 0:
       self._index += 1
 
-def forward_steps(reader: any, steps: list[int]) -> list[tuple[str, dict[str, str]]]:
-  return _Cursor(reader, steps).parse()
\ No newline at end of file
+def _create_parser():
+  # pylint: disable=import-outside-toplevel
+  from xml.parsers.expat import ParserCreate
+  return ParserCreate()
+
+def _parse(parser: any, reader: any):
+  # mapped documents hand their bytes to expat without copying them through a file buffer
+  chunks = getattr(reader, "chunks", None)
+  if chunks is None:
+    parser.ParseFile(reader)
+    return
+  for chunk in chunks():
+    parser.Parse(chunk, False)
+  parser.Parse(b"", True)
+
+def forward_steps(
+    reader: any,
+    steps: list[int],
+    metrics: Metrics | None = None,
+  ) -> list[tuple[str, dict[str, str]]]:
+  if metrics is None or not metrics.enabled:
+    return _Cursor(reader, steps).parse()
+
+  started_at = metrics.start()
+  offset = reader.tell()
+  cursor = _Cursor(reader, steps)
+  tags_stack = cursor.parse()
+  metrics.stop("epub.forward_steps", started_at)
+  metrics.count("epub.xml_events", cursor.events)
+  metrics.count("epub.bytes_read", reader.tell() - offset)
+  return tags_stack
+
+# walks a content document and tells subclasses the step path of every element and text chunk,
+# following the same index rules as _Cursor. paths are relative to the root element.
+class _Walker:
+  def __init__(self):
+    self._path: list[int] = []
+    self._indexes: list[int] = []
+    self._index: int = 0
+    self._last_is_text: bool = False
+    self._text_offset: int = 0
+    self._parser = _create_parser()
+    self._parser.StartElementHandler = self._start_element
+    self._parser.EndElementHandler = self._end_element
+    self._parser.CharacterDataHandler = self._char_data
+
+  def walk(self, reader: any):
+    try:
+      _parse(self._parser, reader)
+    except StopIteration:
+      pass
+
+  def _on_element(self, path: tuple[int, ...], name: str, attrs: dict[str, str]):
+    pass
+
+  def _on_text(self, path: tuple[int, ...], offset: int, text: str):
+    pass
+
+  def _start_element(self, name: str, attrs: dict[str, str]):
+    self._index += 1
+    if self._index % 2 != 0:
+      self._index += 1
+    if len(self._indexes) > 0:
+      self._path.append(self._index)
+    self._indexes.append(self._index)
+    self._index = 0
+    self._last_is_text = False
+    self._on_element(tuple(self._path), name, attrs)
+
+  def _end_element(self, _: str):
+    self._index = self._indexes.pop()
+    if len(self._indexes) > 0:
+      self._path.pop()
+    self._last_is_text = False
+
+  def _char_data(self, text: str):
+    if len(self._indexes) == 0:
+      return
+    if not self._last_is_text:
+      self._index += 1
+      self._last_is_text = True
+      self._text_offset = 0
+      if self._index % 2 == 0:
+        self._index += 1
+    self._on_text((*self._path, self._index), self._text_offset, text)
+    self._text_offset += len(text)
+
+class _TextCollector(_Walker):
+  def __init__(self, start: tuple[float, ...], end: tuple[float, ...]):
+    super().__init__()
+    self._start: tuple[float, ...] = start
+    self._end: tuple[float, ...] = end
+    self._chunks: list[str] = []
+
+  def collect(self, reader: any) -> str:
+    self.walk(reader)
+    return "".join(self._chunks)
+
+  def _on_element(self, path: tuple[int, ...], name: str, attrs: dict[str, str]):
+    if path > self._end:
+      raise StopIteration()
+
+  def _on_text(self, path: tuple[int, ...], offset: int, text: str):
+    begin = offset
+    end = offset + len(text)
+
+    if path == self._start[:-1]:
+      begin = max(begin, self._start[-1])
+    elif (*path, begin) < self._start:
+      return
+
+    if path == self._end[:-1]:
+      end = min(end, self._end[-1])
+    elif (*path, begin) >= self._end:
+      raise StopIteration()
+
+    if begin < end:
+      self._chunks.append(text[begin - offset:end - offset])
+
+def collect_text(
+    reader: any,
+    start: list[int], start_offset: int | None,
+    end: list[int], end_offset: int | None,
+  ) -> str:
+  # no offset means the whole node: start before its first character and end after its last one
+  start_key = (*start, -1 if start_offset is None else start_offset)
+  end_key = (*end, float("inf") if end_offset is None else end_offset)
+  return _TextCollector(start_key, end_key).collect(reader)
+
+class _LengthCollector(_Walker):
+  def __init__(self):
+    super().__init__()
+    self._keys: list[tuple[int, ...]] = []
+    self._starts: list[int] = []
+    self._length: int = 0
+
+  def collect(self, reader: any) -> tuple[list[tuple[int, ...]], list[int], int]:
+    self.walk(reader)
+    return self._keys, self._starts, self._length
+
+  def _on_element(self, path: tuple[int, ...], name: str, attrs: dict[str, str]):
+    self._keys.append(path)
+    self._starts.append(self._length)
+
+  def _on_text(self, path: tuple[int, ...], offset: int, text: str):
+    if offset == 0:
+      self._keys.append(path)
+      self._starts.append(self._length)
+    self._length += len(text)
+
+def collect_lengths(reader: any) -> tuple[list[tuple[int, ...]], list[int], int]:
+  # nodes come in document order, which is also the order of their step tuples,
+  # so the keys are sorted and can be searched with bisect
+  return _LengthCollector().collect(reader)
+
+class _AnchorCollector(_Walker):
+  def __init__(self, ids: set[str]):
+    super().__init__()
+    self._ids: set[str] = set(ids)
+    self._anchors: dict[str, tuple[int, ...]] = {}
+
+  def collect(self, reader: any) -> dict[str, tuple[int, ...]]:
+    if len(self._ids) > 0:
+      self.walk(reader)
+    return self._anchors
+
+  def _on_element(self, path: tuple[int, ...], name: str, attrs: dict[str, str]):
+    id = attrs.get("id", None)
+    if id is None or id not in self._ids:
+      return
+    self._ids.remove(id)
+    self._anchors[id] = path
+    if len(self._ids) == 0:
+      raise StopIteration()
+
+def collect_anchors(reader: any, ids: set[str]) -> dict[str, tuple[int, ...]]:
+  # the step path of the element carrying each of the ids, the missing ones are left out
+  return _AnchorCollector(ids).collect(reader)
+
+class _WordCollector(_Walker):
+  def __init__(self):
+    super().__init__()
+    self._nodes: list[tuple[int, ...]] = []
+    self._terms: dict[str, list[int]] = {}
+    self._ordinal: int = 0
+    self._text_path: tuple[int, ...] | None = None
+    self._chunks: list[str] = []
+
+  def collect(self, reader: any) -> tuple[list[tuple[int, ...]], dict[str, list[int]]]:
+    self.walk(reader)
+    self._flush()
+    return self._nodes, self._terms
+
+  def _on_element(self, path: tuple[int, ...], name: str, attrs: dict[str, str]):
+    self._flush()
+
+  def _end_element(self, name: str):
+    self._flush()
+    super()._end_element(name)
+
+  def _on_text(self, path: tuple[int, ...], offset: int, text: str):
+    # expat may cut a text node into several chunks, words are only split once it is complete
+    if path != self._text_path:
+      self._flush()
+      self._text_path = path
+    self._chunks.append(text)
+
+  def _flush(self):
+    if self._text_path is None:
+      return
+    text = "".join(self._chunks)
+    node = len(self._nodes)
+    self._nodes.append(self._text_path)
+    self._text_path = None
+    self._chunks.clear()
+
+    terms = self._terms
+    for matched in word_pattern().finditer(text):
+      term = matched.group().casefold()
+      postings = terms.get(term, None)
+      if postings is None:
+        postings = []
+        terms[term] = postings
+      postings.extend((self._ordinal, node, matched.start(), matched.end()))
+      self._ordinal += 1
+
+def collect_words(reader: any) -> tuple[list[tuple[int, ...]], dict[str, list[int]]]:
+  # the step paths of the text nodes, and for every term its postings as flat
+  # (ordinal, text node, start, end) groups. ordinals number the words of the document in order.
+  return _WordCollector().collect(reader)
+
+class _ItemrefCollector(_Walker):
+  def __init__(self):
+    super().__init__()
+    self._itemrefs: list[tuple[tuple[int, ...], str]] = []
+
+  def collect(self, reader: any) -> list[tuple[tuple[int, ...], str]]:
+    self.walk(reader)
+    return self._itemrefs
+
+  def _on_element(self, path: tuple[int, ...], name: str, attrs: dict[str, str]):
+    idref = attrs.get("idref", None)
+    if name.rpartition(":")[2] == "itemref" and idref is not None:
+      self._itemrefs.append((path, idref.strip()))
+
+def collect_itemrefs(reader: any) -> list[tuple[tuple[int, ...], str]]:
+  # step paths of the itemref elements of a package document, with their idref
+  return _ItemrefCollector().collect(reader)
+
+@cache
+def word_pattern() -> re.Pattern:
+  return re.compile(r"\w+")
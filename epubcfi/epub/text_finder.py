@@ -0,0 +1,34 @@
+import os
+
+from ..cfi import PathRange, ParsedPath, to_absolute
+from .picker import EpubBook
+from .ncx_finder import find_content_path, pick_document_steps
+from .stepper import collect_text
+from .source import DocumentSources, document_reader
+
+def find_text(
+    book: EpubBook,
+    reader: any,
+    path: ParsedPath,
+    cache: dict[tuple[int, ...], str | None] | None = None,
+    sources: DocumentSources | None = None,
+  ) -> str | None:
+  content_path = find_content_path(book, reader, path, cache=cache)
+  if content_path is None:
+    return None
+
+  if isinstance(path, PathRange):
+    start, end = to_absolute(path)
+    start_steps, start_offset = pick_document_steps(start)
+    end_steps, end_offset = pick_document_steps(end)
+  else:
+    # a single path selects the whole node, its offset only marks a point inside it
+    start_steps, _ = pick_document_steps(path)
+    end_steps, start_offset, end_offset = start_steps, None, None
+
+  if start_steps is None or end_steps is None:
+    return None
+
+  file_path = os.path.join(book.root_path, content_path)
+  with document_reader(file_path, sources) as reader:
+    return collect_text(reader, start_steps, start_offset, end_steps, end_offset)
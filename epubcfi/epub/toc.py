@@ -0,0 +1,261 @@
+import os
+
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from typing import Callable, Literal
+from .source import DocumentSources, document_reader
+from .stepper import collect_anchors
+from .utils import relative_root_path, member_path, DocumentCache, DiskFiles, MemberFiles
+
+TocFormat = Literal["ncx", "nav"]
+
+@dataclass
+class TocEntry:
+  label: str
+  # content path of the document, None for headings that link to nothing
+  path: str | None
+  fragment: str | None
+  play_order: int
+  depth: int
+  # index of the parent entry, -1 at the top level
+  parent: int
+
+@dataclass
+class TocIndex:
+  # entries in the order of the TOC document
+  entries: list[TocEntry] = field(default_factory=list)
+  # content path -> indexes of the entries that link into it
+  paths: dict[str, list[int]] = field(default_factory=dict)
+
+  def label(self, path: str) -> str | None:
+    indexes = self.paths.get(path, None)
+    if indexes is None:
+      return None
+    return self.entries[indexes[0]].label
+
+  def has_fragments(self, path: str) -> bool:
+    return any(
+      self.entries[index].fragment is not None
+      for index in self.paths.get(path, ())
+    )
+
+  def as_ncx(self) -> list[tuple[str, str]]:
+    ncx: list[tuple[str, str]] = []
+    for entry in self.entries:
+      if entry.path is None:
+        continue
+      if entry.fragment is None:
+        ncx.append((entry.label, entry.path))
+      else:
+        ncx.append((entry.label, f"{entry.path}#{entry.fragment}"))
+    return ncx
+
+@dataclass
+class DocumentAnchors:
+  # step paths of the elements TOC entries link to, in document order, and the entry of each one
+  keys: list[tuple[int, ...]]
+  entries: list[int]
+
+  def find(self, steps: list[int]) -> int | None:
+    index = bisect_right(self.keys, tuple(steps)) - 1
+    if index < 0:
+      return None
+    return self.entries[index]
+
+def read_toc(
+    root_path: str,
+    toc_path: str,
+    toc_format: TocFormat,
+    files: DiskFiles | MemberFiles | None = None,
+  ) -> TocIndex:
+  files = files or DiskFiles()
+  builder = _TocBuilder(root_path, os.path.dirname(toc_path), toc_format, files.exists)
+  with files.open(toc_path) as reader:
+    return builder.build(reader)
+
+def document_anchors(
+    root_path: str,
+    toc: TocIndex,
+    documents: DocumentCache | None,
+    content_path: str,
+    sources: DocumentSources | None = None,
+  ) -> DocumentAnchors:
+  return fragment_anchors(
+    root_path, documents, content_path, "anchors",
+    lambda: [(index, toc.entries[index].fragment) for index in toc.paths.get(content_path, [])],
+    sources,
+  )
+
+# the steps of the element every fragment names, found in one pass over the content document and
+# cached under kind. an index without a fragment points at the whole document, before every element
+def fragment_anchors(
+    root_path: str,
+    documents: DocumentCache | None,
+    content_path: str,
+    kind: str,
+    fragments: Callable[[], list[tuple[int, str | None]]],
+    sources: DocumentSources | None = None,
+  ) -> DocumentAnchors:
+  file_path = os.path.join(root_path, content_path)
+  member = member_path(root_path, file_path)
+  if documents is not None:
+    anchors = documents.get(member, kind)
+    if anchors is not None:
+      return anchors
+
+  indexed = fragments()
+  ids = {fragment for _, fragment in indexed} - {None}
+  found: dict[str, tuple[int, ...]] = {}
+  if os.path.isfile(file_path):
+    with document_reader(file_path, sources) as reader:
+      found = collect_anchors(reader, ids)
+
+  pairs: list[tuple[tuple[int, ...], int]] = []
+  for index, fragment in indexed:
+    if fragment is None:
+      pairs.append(((), index))
+    elif fragment in found:
+      pairs.append((found[fragment], index))
+  pairs.sort()
+
+  anchors = DocumentAnchors([key for key, _ in pairs], [index for _, index in pairs])
+  if documents is not None:
+    documents.set(member, kind, anchors)
+  return anchors
+
+# builds the index in one streaming pass over either an NCX document or an EPUB 3 navigation document
+class _TocBuilder:
+  def __init__(self, root_path: str, base_path: str, toc_format: TocFormat, exists: Callable[[str], bool]):
+    self._root_path: str = root_path
+    self._base_path: str = base_path
+    self._exists: Callable[[str], bool] = exists
+    self._format: TocFormat = toc_format
+    self._toc: TocIndex = TocIndex()
+    self._stack: list[int] = []
+    self._depth: int = 0
+    # element depth at which label text is being captured, -1 when it is not
+    self._capture_depth: int = -1
+    self._chunks: list[str] = []
+    self._in_label: bool = False
+    self._in_toc: bool = False
+    self._toc_depth: int = 0
+    self._toc_done: bool = False
+
+  def build(self, reader: any) -> TocIndex:
+    # pylint: disable=import-outside-toplevel
+    from xml.parsers.expat import ParserCreate
+    parser = ParserCreate(namespace_separator="}")
+    if self._format == "ncx":
+      parser.StartElementHandler = self._start_ncx
+      parser.EndElementHandler = self._end_ncx
+    else:
+      parser.StartElementHandler = self._start_nav
+      parser.EndElementHandler = self._end_nav
+    parser.CharacterDataHandler = self._char_data
+    parser.ParseFile(reader)
+
+    for index, entry in enumerate(self._toc.entries):
+      if entry.path is not None:
+        self._toc.paths.setdefault(entry.path, []).append(index)
+    return self._toc
+
+  # NCX: <navPoint playOrder><navLabel><text>label</text></navLabel><content src/>...</navPoint>
+  def _start_ncx(self, name: str, attrs: dict[str, str]):
+    self._depth += 1
+    local_name = _local_name(name)
+    if local_name == "navPoint":
+      play_order = attrs.get("playOrder", "").strip()
+      self._push(int(play_order) if play_order.isdigit() else None)
+    elif len(self._stack) == 0:
+      return
+    elif local_name == "navLabel":
+      self._in_label = True
+    elif local_name == "text" and self._in_label:
+      self._capture_depth = self._depth
+    elif local_name == "content":
+      entry = self._toc.entries[self._stack[-1]]
+      if entry.path is None:
+        self._set_href(entry, attrs.get("src", None))
+
+  def _end_ncx(self, name: str):
+    local_name = _local_name(name)
+    if local_name == "navPoint":
+      self._stack.pop()
+    elif local_name == "navLabel" and self._in_label:
+      self._in_label = False
+      entry = self._toc.entries[self._stack[-1]]
+      if entry.label == "":
+        entry.label = "".join(self._chunks).strip()
+      self._chunks.clear()
+    elif self._depth == self._capture_depth:
+      self._capture_depth = -1
+    self._depth -= 1
+
+  # EPUB 3: <nav epub:type="toc"><ol><li><a href>label</a><ol>...</ol></li></ol></nav>
+  def _start_nav(self, name: str, attrs: dict[str, str]):
+    self._depth += 1
+    local_name = _local_name(name)
+    if not self._in_toc:
+      if local_name == "nav" and not self._toc_done and _is_toc_nav(attrs):
+        self._in_toc = True
+        self._toc_depth = self._depth
+      return
+    if local_name == "li":
+      self._push(None)
+    elif local_name in ("a", "span") and len(self._stack) > 0 and self._capture_depth < 0:
+      entry = self._toc.entries[self._stack[-1]]
+      if entry.label == "" and entry.path is None:
+        self._capture_depth = self._depth
+        if local_name == "a":
+          self._set_href(entry, attrs.get("href", None))
+
+  def _end_nav(self, name: str):
+    local_name = _local_name(name)
+    if self._in_toc:
+      if self._depth == self._capture_depth:
+        self._capture_depth = -1
+        entry = self._toc.entries[self._stack[-1]]
+        entry.label = " ".join("".join(self._chunks).split())
+        self._chunks.clear()
+      elif local_name == "li":
+        self._stack.pop()
+      elif local_name == "nav" and self._depth == self._toc_depth:
+        self._in_toc = False
+        self._toc_done = True
+    self._depth -= 1
+
+  def _char_data(self, text: str):
+    if self._capture_depth >= 0:
+      self._chunks.append(text)
+
+  def _push(self, play_order: int | None):
+    entries = self._toc.entries
+    if play_order is None:
+      play_order = len(entries) + 1
+    entries.append(TocEntry(
+      label="",
+      path=None,
+      fragment=None,
+      play_order=play_order,
+      depth=len(self._stack),
+      parent=self._stack[-1] if len(self._stack) > 0 else -1,
+    ))
+    self._stack.append(len(entries) - 1)
+
+  def _set_href(self, entry: TocEntry, href: str | None):
+    if href is None:
+      return
+    href, _, fragment = href.strip().partition("#")
+    if href == "":
+      return
+    entry.path = relative_root_path(self._root_path, self._base_path, href, self._exists)
+    entry.fragment = fragment if fragment != "" else None
+
+def _local_name(name: str) -> str:
+  return name.rpartition("}")[2]
+
+def _is_toc_nav(attrs: dict[str, str]) -> bool:
+  for name, value in attrs.items():
+    if _local_name(name) == "type" and "toc" in value.split():
+      return True
+  return False
@@ -1,35 +1,185 @@
 import os
+import json
 import shutil
 import hashlib
 import zipfile
 
+from typing import Any, Callable, Iterable
+from ..metrics import Metrics, default_metrics
+
+_SAMPLE_SIZE = 64 * 1024
+
+# books are extracted under their fingerprint, so copies of one book under several paths share
+# the same directory, and a renamed or touched file still finds it. a version no path uses any more
+# stays until prune(): a process sharing the cache may still be reading it.
 class Unzip:
-  def __init__(self, unzip_path: str):
+  def __init__(
+      self,
+      unzip_path: str,
+      metrics: Metrics | None = None,
+      incremental: bool = False,
+      full_hash: bool = False,
+      on_remove: Callable[[str], None] | None = None,
+    ):
     self._unzip_path: str = unzip_path
+    self._metrics: Metrics = metrics or default_metrics
+    self._incremental: bool = incremental
+    self._full_hash: bool = full_hash
+    # called with the directory of every removed version, for the files derived from it elsewhere
+    self._on_remove: Callable[[str], None] | None = on_remove
+    # path -> (stat, fingerprint), the memo files without reading them again
+    self._memos: dict[str, tuple[list[int], str]] = {}
 
   def unzip_file(self, file_path: str) -> str:
+    to_path, _ = self.unzip_file_changes(file_path)
+    return to_path
+
+  # also returns the members that were rewritten or deleted since the last call for this path.
+  # None means that the whole book is new to this path.
+  def unzip_file_changes(self, file_path: str) -> tuple[str, set[str] | None]:
     if not os.path.exists(file_path):
       raise FileNotFoundError(f"File not found: {file_path}")
     if os.path.isdir(file_path):
-      return file_path
+      return file_path, set()
+
+    started_at = self._metrics.start()
+    result = self._unzip_file(file_path)
+    self._metrics.stop("epub.unzip", started_at)
+    return result
+
+  def fingerprint(self, file_path: str) -> str:
+    fingerprint, _ = self._fingerprint(file_path)
+    return fingerprint
+
+  def _fingerprint(self, file_path: str) -> tuple[str, str | None]:
+    # also returns the fingerprint this path had before, when it changed since
+    stat_key = _stat_key(file_path)
+    memo_path = os.path.join(self._unzip_path, f"{self._to_hash(file_path)}.fingerprint")
+    memo = self._memos.get(file_path, None)
+    if memo is None:
+      memo = self._read_memo(memo_path)
+    if memo is not None and memo[0] == stat_key:
+      self._metrics.cache("epub.fingerprint", True)
+      self._memos[file_path] = memo
+      return memo[1], memo[1]
+
+    self._metrics.cache("epub.fingerprint", False)
+    started_at = self._metrics.start()
+    fingerprint = file_fingerprint(file_path, self._full_hash)
+    self._metrics.stop("epub.fingerprint", started_at)
+    self._memos[file_path] = (stat_key, fingerprint)
+    self._write_json(memo_path, { "stat": stat_key, "fingerprint": fingerprint, "path": file_path })
+    return fingerprint, None if memo is None else memo[1]
+
+  def _unzip_file(self, file_path: str) -> tuple[str, set[str] | None]:
+    fingerprint, previous = self._fingerprint(file_path)
+    to_path = os.path.join(self._unzip_path, fingerprint)
+    manifest_path = os.path.join(self._unzip_path, f"{fingerprint}.manifest")
+
+    # the previous version of this path, when it is still extracted
+    base: tuple[str, dict[str, list[int]]] | None = None
+    if self._incremental and previous is not None and previous != fingerprint:
+      base_manifest = self._read_manifest(os.path.join(self._unzip_path, f"{previous}.manifest"))
+      if base_manifest is not None:
+        base = (os.path.join(self._unzip_path, previous), base_manifest)
+
+    manifest = self._read_manifest(manifest_path)
+    if manifest is not None and self._check_cache_exist(to_path):
+      self._metrics.cache("epub.extraction", True)
+    else:
+      self._metrics.cache("epub.extraction", False)
+      manifest = self._extract_book(file_path, to_path, manifest_path, base)
+
+    if previous == fingerprint:
+      return to_path, set()
+    if base is None:
+      return to_path, None
+    changes = _manifest_changes(base[1], manifest)
+    self._metrics.count("epub.members_rewritten", len(changes))
+    return to_path, changes
+
+  # removes the versions no memo points at, after dropping the memos of the books that were deleted.
+  # one pass over the memo files, meant to run when no other process reads the versions it removes.
+  # keep names the extraction directories still in use. returns the removed fingerprints
+  def prune(self, keep: Iterable[str] = ()) -> list[str]:
+    if not os.path.isdir(self._unzip_path):
+      return []
+    # the memo files are the reference counts: one per path, naming the version it uses
+    referenced = {os.path.basename(os.path.normpath(dir_path)) for dir_path in keep}
+    for memo_path, memo in self._memo_files():
+      path = memo.get("path", None)
+      if isinstance(path, str) and not os.path.exists(path):
+        os.remove(memo_path)
+        self._memos.pop(path, None)
+      elif isinstance(memo.get("fingerprint", None), str):
+        referenced.add(memo["fingerprint"])
+
+    removed: list[str] = []
+    for name in sorted(os.listdir(self._unzip_path)):
+      if name.endswith(".manifest"):
+        fingerprint = name[:-len(".manifest")]
+        if fingerprint not in referenced:
+          self._remove_version(fingerprint)
+          removed.append(fingerprint)
+    return removed
 
-    to_hash = f"{self._to_hash(file_path)}"
-    to_path = os.path.join(self._unzip_path, to_hash)
-    mtime_path = os.path.join(self._unzip_path, f"{to_hash}.mtime")
+  def _memo_files(self) -> list[tuple[str, dict]]:
+    memos: list[tuple[str, dict]] = []
+    for name in os.listdir(self._unzip_path):
+      if name.endswith(".fingerprint"):
+        memo_path = os.path.join(self._unzip_path, name)
+        memo = self._read_json(memo_path)
+        if isinstance(memo, dict):
+          memos.append((memo_path, memo))
+    return memos
 
-    if self._check_cache_exist(to_path):
-      if self._check_mtime_match(mtime_path, file_path):
-        return to_path
-      shutil.rmtree(to_path)
+  def _remove_version(self, fingerprint: str):
+    to_path = os.path.join(self._unzip_path, fingerprint)
+    # the manifest goes first, without it the directory no longer counts as extracted
+    manifest_path = os.path.join(self._unzip_path, f"{fingerprint}.manifest")
+    if os.path.isfile(manifest_path):
+      os.remove(manifest_path)
+    prefix = f"{fingerprint}."
+    for name in os.listdir(self._unzip_path):
+      # .part files and directories are another process writing this version again
+      if name.startswith(prefix) and not name.endswith(".part"):
+        file_path = os.path.join(self._unzip_path, name)
+        if os.path.isfile(file_path):
+          os.remove(file_path)
+    shutil.rmtree(to_path, ignore_errors=True)
+    if self._on_remove is not None:
+      self._on_remove(to_path)
+    self._metrics.count("epub.versions_removed", 1)
 
+  def _extract_book(
+      self,
+      file_path: str,
+      to_path: str,
+      manifest_path: str,
+      base: tuple[str, dict[str, list[int]]] | None,
+    ) -> dict[str, list[int]]:
+    # extracted aside and moved in place, another process may be extracting the same book
+    temp_path = f"{to_path}.{os.getpid()}.part"
+    shutil.rmtree(temp_path, ignore_errors=True)
     try:
-      self._unzip(file_path, to_path)
+      manifest = self._unzip(file_path, temp_path, base)
+      if os.path.isdir(to_path):
+        # left by an extraction that did not finish
+        shutil.rmtree(to_path)
+      try:
+        os.rename(temp_path, to_path)
+      except OSError:
+        if not os.path.isdir(to_path):
+          raise
+        shutil.rmtree(temp_path, ignore_errors=True)
+      # the manifest is written last: without it the directory does not count as extracted
+      self._write_json(manifest_path, manifest)
+
     except Exception as e:
-      shutil.rmtree(to_path)
-      os.remove(mtime_path)
+      shutil.rmtree(temp_path, ignore_errors=True)
       raise e
 
-    return to_path
+    return manifest
 
   def _check_cache_exist(self, to_path: str) -> bool:
     if not os.path.exists(to_path):
@@ -39,38 +189,109 @@ class Unzip:
     os.remove(to_path)
     return False
 
-  def _check_mtime_match(self, mtime_path: str, file_path: str) -> bool:
-    mtime = str(os.path.getmtime(file_path))
+  def _read_memo(self, memo_path: str) -> tuple[list[int], str] | None:
+    memo = self._read_json(memo_path)
+    if not isinstance(memo, dict) or "stat" not in memo or "fingerprint" not in memo:
+      return None
+    return memo["stat"], memo["fingerprint"]
 
-    if not os.path.exists(mtime_path):
-      return False
+  def _read_manifest(self, manifest_path: str) -> dict[str, list[int]] | None:
+    manifest = self._read_json(manifest_path)
+    if not isinstance(manifest, dict):
+      return None
+    return manifest
 
-    if not os.path.isfile(mtime_path):
-      shutil.rmtree(mtime_path)
-      return False
+  def _read_json(self, path: str) -> Any:
+    if not os.path.isfile(path):
+      return None
+    try:
+      with open(path, "r", encoding="utf8") as file:
+        return json.load(file)
+    except ValueError:
+      return None
 
-    with open(mtime_path, "r", encoding="utf8") as file:
-      if file.read() == mtime:
-        return True
+  def _write_json(self, path: str, value: Any):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.part"
+    with open(temp_path, "w", encoding="utf8") as file:
+      file.write(json.dumps(value))
+    os.replace(temp_path, path)
 
-    with open(mtime_path, "w", encoding="utf8") as file:
-      file.write(mtime)
+  def _unzip(
+      self,
+      file_path: str,
+      to_path: str,
+      base: tuple[str, dict[str, list[int]]] | None,
+    ) -> dict[str, list[int]]:
+    # the central directory tells the CRC32 and size of every member without decompressing anything,
+    # the members that did not change since the base version are linked instead of extracted
+    manifest: dict[str, list[int]] = {}
+    os.makedirs(to_path, exist_ok=True)
+    with zipfile.ZipFile(file_path, "r") as zip_ref:
+      for info in zip_ref.infolist():
+        if info.is_dir():
+          os.makedirs(os.path.join(to_path, info.filename), exist_ok=True)
+          continue
+        entry = [info.CRC, info.file_size]
+        manifest[info.filename] = entry
+        if base is None or base[1].get(info.filename, None) != entry or not self._link(base[0], info, to_path):
+          self._extract(zip_ref, info, to_path)
+    return manifest
 
-    return False
+  def _link(self, base_path: str, info: zipfile.ZipInfo, to_path: str) -> bool:
+    source_path = os.path.join(base_path, info.filename)
+    if not os.path.isfile(source_path):
+      return False
+    target_path = os.path.join(to_path, info.filename)
+    os.makedirs(os.path.dirname(target_path), exist_ok=True)
+    # extracted files are only ever replaced, never written in place, so both versions can share them
+    try:
+      os.link(source_path, target_path)
+    except OSError:
+      shutil.copyfile(source_path, target_path)
+    return True
 
-  def _unzip(self, file_path: str, to_path: str):
-    with zipfile.ZipFile(file_path, "r") as zip_ref:
-      for member in zip_ref.namelist():
-        target_path = os.path.join(to_path, member)
-        if member.endswith("/"):
-          os.makedirs(target_path, exist_ok=True)
-        else:
-          target_dir_path = os.path.dirname(target_path)
-          os.makedirs(target_dir_path, exist_ok=True)
-          with zip_ref.open(member) as source, open(target_path, "wb") as file:
-            file.write(source.read())
+  def _extract(self, zip_ref: zipfile.ZipFile, info: zipfile.ZipInfo, to_path: str):
+    target_path = os.path.join(to_path, info.filename)
+    os.makedirs(os.path.dirname(target_path), exist_ok=True)
+    # written aside and moved in place, so a reader never sees half of a file
+    temp_path = f"{target_path}.part"
+    with zip_ref.open(info) as source, open(temp_path, "wb") as file:
+      shutil.copyfileobj(source, file)
+    os.replace(temp_path, target_path)
+    self._metrics.count("epub.bytes_read", info.compress_size)
+    self._metrics.count("epub.bytes_decompressed", info.file_size)
 
   def _to_hash(self, text: str) -> str:
     sha512_hash = hashlib.sha512()
     sha512_hash.update(text.encode())
-    return sha512_hash.hexdigest()
\ No newline at end of file
+    return sha512_hash.hexdigest()
+
+# the size, the central directory (name, CRC32 and sizes of every member) and three sampled
+# blocks tell books apart without reading them whole. full hashes every byte instead of the samples
+def file_fingerprint(file_path: str, full: bool = False) -> str:
+  size = os.path.getsize(file_path)
+  sha256_hash = hashlib.sha256(f"{'full' if full else 'sampled'}\t{size}".encode())
+  with zipfile.ZipFile(file_path, "r") as zip_ref:
+    for info in zip_ref.infolist():
+      sha256_hash.update(f"\n{info.filename}\t{info.CRC}\t{info.file_size}\t{info.compress_size}".encode())
+
+  with open(file_path, "rb") as file:
+    if full:
+      for block in iter(lambda: file.read(1024 * 1024), b""):
+        sha256_hash.update(block)
+    else:
+      last_offset = max(size - _SAMPLE_SIZE, 0)
+      for offset in sorted({0, last_offset // 2, last_offset}):
+        file.seek(offset)
+        sha256_hash.update(file.read(_SAMPLE_SIZE))
+  return sha256_hash.hexdigest()
+
+def _stat_key(file_path: str) -> list[int]:
+  stat = os.stat(file_path)
+  return [stat.st_size, stat.st_mtime_ns, stat.st_ino]
+
+def _manifest_changes(old: dict[str, list[int]], new: dict[str, list[int]]) -> set[str]:
+  changes = {member for member, entry in new.items() if old.get(member, None) != entry}
+  changes.update(old.keys() - new.keys())
+  return changes
@@ -1,14 +1,25 @@
 import os
-from typing import Iterable, TypeVar, Generic, Callable
+import sys
 
-def relative_root_path(root_path: str, base_path: str, href: str):
+from array import array
+from typing import Any, BinaryIO, Iterable, TypeVar, Generic, Callable
+
+# a tuple of steps and a content path, the items of the tables of DocumentCache
+_TABLE_ITEM_SIZE = 256
+
+def relative_root_path(
+    root_path: str,
+    base_path: str,
+    href: str,
+    exists: Callable[[str], bool] = os.path.exists,
+  ):
   if not root_path.endswith(os.path.sep):
     root_path = root_path + os.path.sep
 
   path = os.path.join(base_path, href)
   path = os.path.abspath(path)
 
-  if not os.path.exists(path):
+  if not exists(path):
     path = os.path.join(root_path, href)
     path = os.path.abspath(path)
 
@@ -20,15 +31,154 @@ def relative_root_path(root_path: str, base_path: str, href: str):
 
   return path
 
+def member_path(root_path: str, path: str) -> str:
+  # the name of the ZIP member that was extracted to path
+  return os.path.relpath(path, root_path).replace(os.path.sep, "/")
+
+# the files of a book under its root path, as picking a book reads them
+class DiskFiles:
+  def open(self, path: str) -> BinaryIO:
+    return open(path, "rb")
+
+  def exists(self, path: str) -> bool:
+    return os.path.exists(path)
+
+# the same paths served from the members of an EPUB that was not extracted, root_path standing for
+# the directory it would be extracted to
+class MemberFiles:
+  def __init__(
+      self,
+      root_path: str,
+      open_member: Callable[[str], BinaryIO],
+      has_member: Callable[[str], bool],
+    ):
+    self._root_path: str = root_path
+    self._open_member: Callable[[str], BinaryIO] = open_member
+    self._has_member: Callable[[str], bool] = has_member
+
+  def open(self, path: str) -> BinaryIO:
+    return self._open_member(member_path(self._root_path, path))
+
+  def exists(self, path: str) -> bool:
+    return self._has_member(member_path(self._root_path, path))
+
+# values derived from the documents of one book, dropped when their document changes
+class DocumentCache:
+  def __init__(self):
+    self._documents: dict[str, dict[str, Any]] = {}
+    # estimated bytes of every value and their sum, tables are estimated when asked since they keep growing
+    self._sizes: dict[str, dict[str, int]] = {}
+    self._size: int = 0
+    self._tables: dict[str, dict[str, dict]] = {}
+
+  def get(self, member: str, name: str) -> Any | None:
+    values = self._documents.get(member, None)
+    if values is None:
+      return None
+    return values.get(name, None)
+
+  def set(self, member: str, name: str, value: Any):
+    values = self._documents.get(member, None)
+    if values is None:
+      values = {}
+      self._documents[member] = values
+    values[name] = value
+    sizes = self._sizes.setdefault(member, {})
+    size = estimate_size(value)
+    self._size += size - sizes.get(name, 0)
+    sizes[name] = size
+    tables = self._tables.get(member, None)
+    if tables is not None:
+      tables.pop(name, None)
+
+  def table(self, member: str, name: str) -> dict:
+    table = self.get(member, name)
+    if table is None:
+      table = {}
+      self.set(member, name, table)
+      self._size -= self._sizes[member].pop(name)
+      self._tables.setdefault(member, {})[name] = table
+    return table
+
+  def invalidate(self, members: Iterable[str]):
+    for member in members:
+      self._documents.pop(member, None)
+      self._size -= sum(self._sizes.pop(member, {}).values())
+      self._tables.pop(member, None)
+
+  def clear(self):
+    self._documents.clear()
+    self._sizes.clear()
+    self._size = 0
+    self._tables.clear()
+
+  # estimated bytes of the values of each name, all documents together
+  def sizes(self) -> dict[str, int]:
+    sizes: dict[str, int] = {}
+    for member_sizes in self._sizes.values():
+      for name, size in member_sizes.items():
+        sizes[name] = sizes.get(name, 0) + size
+    for tables in self._tables.values():
+      for name, table in tables.items():
+        sizes[name] = sizes.get(name, 0) + _table_size(table)
+    return sizes
+
+  @property
+  def size(self) -> int:
+    return self._size + sum(
+      _table_size(table)
+      for tables in self._tables.values()
+      for table in tables.values()
+    )
+
+def _table_size(table: dict) -> int:
+  return sys.getsizeof(table) + len(table) * _TABLE_ITEM_SIZE
+
+# sys.getsizeof of a value and of everything it holds, what is shared inside the value counts once
+def estimate_size(value: Any) -> int:
+  size: int = 0
+  seen: set[int] = set()
+  stack: list[Any] = [value]
+  while len(stack) > 0:
+    item = stack.pop()
+    if id(item) in seen:
+      continue
+    seen.add(id(item))
+    size += sys.getsizeof(item)
+    if isinstance(item, (str, bytes, bytearray, int, float, array, type)):
+      continue
+    if isinstance(item, dict):
+      stack.extend(item.keys())
+      stack.extend(item.values())
+    elif isinstance(item, (list, tuple, set, frozenset)):
+      stack.extend(item)
+    elif hasattr(item, "__dict__"):
+      stack.append(item.__dict__)
+  return size
+
 E = TypeVar("E")
 
 class SizeLimitMap(Generic[E]):
-  def __init__(self, limit: int, on_close: Callable[[E], None]):
+  def __init__(
+      self,
+      limit: int,
+      on_close: Callable[[E], None],
+      byte_limit: int | None = None,
+      size_of: Callable[[E], int] | None = None,
+    ):
     super().__init__()
+    if byte_limit is not None and size_of is None:
+      raise ValueError("A byte limit needs size_of")
     self._store: dict[str, E] = {}
     self._keys: list[str] = []
     self._limit: int = limit
     self._on_close: Callable[[E], None] = on_close
+    self._byte_limit: int | None = byte_limit
+    self._size_of: Callable[[E], int] | None = size_of
+    # sizes are measured when values are stored and kept in a running total. values keep growing
+    # while they are used, right after they were stored, so the last one is measured again with the next
+    self._sizes: dict[str, int] = {}
+    self._size: int = 0
 
   def items(self) -> Iterable[tuple[str, E]]:
     return self._store.items()
@@ -42,6 +192,13 @@ class SizeLimitMap(Generic[E]):
   def get(self, key: str) -> E | None:
     return self._store.get(key, None)
 
+  @property
+  def byte_limit(self) -> int | None:
+    return self._byte_limit
+
+  def size(self) -> int:
+    return self._size
+
   def __len__(self):
     return len(self._store)
 
@@ -52,20 +209,38 @@ class SizeLimitMap(Generic[E]):
     return str(self._store)
 
   def __setitem__(self, key: str, value: E):
-    removed_value: E | None = None
-
+    if len(self._keys) > 0 and self._keys[-1] != key:
+      self._measure(self._keys[-1])
     if key not in self._store:
       self._keys.append(key)
-      if len(self._keys) > self._limit:
-        removed_key = self._keys.pop(0)
-        removed_value = self._store.pop(removed_key)
-
     self._store[key] = value
-    if removed_value is not None:
+    self._measure(key)
+
+    # the oldest values go first, the one just stored stays even when it is over the byte limit alone
+    removed_values: list[E] = []
+    while len(self._keys) > 1 and self._keys[0] != key and (
+      len(self._keys) > self._limit or
+      (self._byte_limit is not None and self._size > self._byte_limit)
+    ):
+      removed_key = self._keys.pop(0)
+      self._forget(removed_key)
+      removed_values.append(self._store.pop(removed_key))
+    for removed_value in removed_values:
       self._on_close(removed_value)
 
   def __getitem__(self, key: str) -> E | None:
     if key not in self._store:
       return None
     self._keys.remove(key)
-    return self._store.pop(key)
\ No newline at end of file
+    self._forget(key)
+    return self._store.pop(key)
+
+  def _measure(self, key: str):
+    if self._size_of is None:
+      return
+    size = self._size_of(self._store[key])
+    self._size += size - self._sizes.get(key, 0)
+    self._sizes[key] = size
+
+  def _forget(self, key: str):
+    self._size -= self._sizes.pop(key, 0)
@@ -0,0 +1,166 @@
+import time
+import math
+
+from dataclasses import dataclass, field
+from typing import Any, Callable, Literal
+
+MetricKind = Literal["timing", "counter", "cache"]
+
+@dataclass
+class MetricEvent:
+  kind: MetricKind
+  name: str
+  value: float
+  tags: dict[str, Any] | None = None
+
+MetricSink = Callable[[MetricEvent], None]
+
+class Metrics:
+  def __init__(self):
+    self._sinks: list[MetricSink] = []
+    # callers check it before they measure anything, so no sink means almost no cost
+    self.enabled: bool = False
+
+  def add_sink(self, sink: MetricSink):
+    self._sinks.append(sink)
+    self.enabled = True
+
+  def remove_sink(self, sink: MetricSink):
+    self._sinks.remove(sink)
+    self.enabled = len(self._sinks) > 0
+
+  def start(self) -> float:
+    if not self.enabled:
+      return 0.0
+    return time.perf_counter()
+
+  def stop(self, name: str, started_at: float, **tags: Any):
+    if self.enabled:
+      self.emit(MetricEvent("timing", name, time.perf_counter() - started_at, tags or None))
+
+  def count(self, name: str, value: float, **tags: Any):
+    if self.enabled:
+      self.emit(MetricEvent("counter", name, value, tags or None))
+
+  def cache(self, name: str, hit: bool):
+    if self.enabled:
+      self.emit(MetricEvent("cache", name, 1.0 if hit else 0.0))
+
+  def emit(self, event: MetricEvent):
+    for sink in self._sinks:
+      sink(event)
+
+# used by the parser, and by every EpubNode that is not given its own Metrics
+default_metrics = Metrics()
+
+def add_sink(sink: MetricSink):
+  default_metrics.add_sink(sink)
+
+def remove_sink(sink: MetricSink):
+  default_metrics.remove_sink(sink)
+
+class LoggingSink:
+  def __init__(self, logger: Any = None, level: int | None = None):
+    # pylint: disable=import-outside-toplevel
+    import logging
+    self._logger = logger or logging.getLogger("epubcfi.metrics")
+    self._level: int = logging.DEBUG if level is None else level
+
+  def __call__(self, event: MetricEvent):
+    if not self._logger.isEnabledFor(self._level):
+      return
+    if event.kind == "timing":
+      text = f"{event.value * 1000.0:.3f}ms"
+    elif event.kind == "cache":
+      text = "hit" if event.value > 0.0 else "miss"
+    else:
+      text = f"{event.value:g}"
+    if event.tags:
+      tags = " ".join(f"{key}={value}" for key, value in event.tags.items())
+      text = f"{text} {tags}"
+    self._logger.log(self._level, "%s %s %s", event.kind, event.name, text)
+
+@dataclass
+class _Histogram:
+  count: int = 0
+  total: float = 0.0
+  min: float = math.inf
+  max: float = 0.0
+  buckets: dict[int, int] = field(default_factory=dict)
+
+class HistogramSink:
+  # timings fall into buckets that grow by 2^(1/4), so percentiles are accurate to about 20%
+  _BUCKETS_PER_DOUBLING = 4
+
+  def __init__(self):
+    self._timings: dict[str, _Histogram] = {}
+    self._counters: dict[str, float] = {}
+    self._caches: dict[str, list[int]] = {}
+
+  def __call__(self, event: MetricEvent):
+    if event.kind == "timing":
+      histogram = self._timings.get(event.name, None)
+      if histogram is None:
+        histogram = _Histogram()
+        self._timings[event.name] = histogram
+      histogram.count += 1
+      histogram.total += event.value
+      histogram.min = min(histogram.min, event.value)
+      histogram.max = max(histogram.max, event.value)
+      bucket = self._bucket(event.value)
+      histogram.buckets[bucket] = histogram.buckets.get(bucket, 0) + 1
+    elif event.kind == "counter":
+      self._counters[event.name] = self._counters.get(event.name, 0.0) + event.value
+    elif event.kind == "cache":
+      counts = self._caches.get(event.name, None)
+      if counts is None:
+        counts = [0, 0]
+        self._caches[event.name] = counts
+      counts[0 if event.value > 0.0 else 1] += 1
+
+  def timing(self, name: str) -> dict[str, float] | None:
+    histogram = self._timings.get(name, None)
+    if histogram is None:
+      return None
+    return {
+      "count": histogram.count,
+      "total": histogram.total,
+      "mean": histogram.total / histogram.count,
+      "min": histogram.min,
+      "max": histogram.max,
+      "p50": self._percentile(histogram, 0.5),
+      "p90": self._percentile(histogram, 0.9),
+      "p99": self._percentile(histogram, 0.99),
+    }
+
+  def counter(self, name: str) -> float:
+    return self._counters.get(name, 0.0)
+
+  def cache(self, name: str) -> tuple[int, int]:
+    hits, misses = self._caches.get(name, (0, 0))
+    return hits, misses
+
+  def summary(self) -> dict[str, Any]:
+    return {
+      "timings": { name: self.timing(name) for name in self._timings },
+      "counters": dict(self._counters),
+      "caches": {
+        name: { "hits": hits, "misses": misses }
+        for name, (hits, misses) in self._caches.items()
+      },
+    }
+
+  def _bucket(self, value: float) -> int:
+    if value <= 0.0:
+      return -1 << 16
+    return math.floor(math.log2(value) * self._BUCKETS_PER_DOUBLING)
+
+  def _percentile(self, histogram: _Histogram, rank: float) -> float:
+    target = rank * histogram.count
+    seen: int = 0
+    for bucket in sorted(histogram.buckets.keys()):
+      seen += histogram.buckets[bucket]
+      if seen >= target:
+        upper = 2.0 ** ((bucket + 1) / self._BUCKETS_PER_DOUBLING)
+        return min(max(upper, histogram.min), histogram.max)
+    return histogram.max
@@ -0,0 +1,267 @@
+import os
+import json
+import stat
+import signal
+import socket
+import asyncio
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
+from typing import Any
+from .cfi import parse, ParsedPath, Path
+from .epub import EpubNode
+
+# every frame is a 4 bytes big-endian length followed by an UTF-8 JSON object.
+# requests look like {"id": 1, "op": "label", "epub": "...", "cfi": "..."} and each one is answered by
+# {"id": 1, "ok": true, "result": ...} or {"id": 1, "ok": false, "error": "..."}.
+# answers carry the id of their request and may come back in any order.
+_HEADER_SIZE = 4
+_MAX_FRAME_SIZE = 16 * 1024 * 1024
+
+class RemoteException(Exception):
+  pass
+
+class EpubServer:
+  def __init__(
+      self,
+      socket_path: str,
+      cache_path: str | None = None,
+      max_concurrency: int = 64,
+      max_frame_size: int = _MAX_FRAME_SIZE,
+      memory_budget: int | None = None,
+      shared_indexes: bool = False,
+    ):
+    self._socket_path: str = socket_path
+    self._cache_path: str | None = cache_path
+    self._max_concurrency: int = max_concurrency
+    self._max_frame_size: int = max_frame_size
+    self._memory_budget: int | None = memory_budget
+    self._shared_indexes: bool = shared_indexes
+    self._ready: threading.Event = threading.Event()
+    self._loop: asyncio.AbstractEventLoop | None = None
+    self._stopping: asyncio.Event | None = None
+    self._semaphore: asyncio.Semaphore | None = None
+    self._tasks: set[asyncio.Task] = set()
+    self._writers: set[asyncio.StreamWriter] = set()
+    self._node: EpubNode | None = None
+    self._executor: ThreadPoolExecutor | None = None
+
+  def wait_ready(self, timeout: float | None = None) -> bool:
+    return self._ready.wait(timeout)
+
+  def shutdown(self):
+    loop = self._loop
+    if loop is not None and self._stopping is not None:
+      loop.call_soon_threadsafe(self._stopping.set)
+
+  async def serve(self):
+    _remove_stale_socket(self._socket_path)
+    self._loop = asyncio.get_running_loop()
+    self._stopping = asyncio.Event()
+    self._semaphore = asyncio.Semaphore(self._max_concurrency)
+    # EpubNode is not thread-safe, so a single thread owns it and requests queue up in front of it
+    self._executor = ThreadPoolExecutor(max_workers=1)
+    self._node = EpubNode(
+      cache_path=self._cache_path,
+      memory_budget=self._memory_budget,
+      shared_indexes=self._shared_indexes,
+    )
+
+    server = await asyncio.start_unix_server(self._handle_connection, path=self._socket_path)
+    self._ready.set()
+    try:
+      await self._stopping.wait()
+    finally:
+      await self._close(server)
+
+  async def _close(self, server: asyncio.AbstractServer):
+    server.close()
+    if len(self._tasks) > 0:
+      await asyncio.wait(list(self._tasks))
+    for writer in list(self._writers):
+      writer.close()
+    self._executor.shutdown(wait=True)
+    self._node.__exit__(None, None, None)
+    if os.path.exists(self._socket_path):
+      os.remove(self._socket_path)
+    self._ready.clear()
+
+  async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    # the concurrency limit is taken before the next frame is read, so slow requests push back on the client
+    pending: set[asyncio.Task] = set()
+    self._writers.add(writer)
+    try:
+      while not self._stopping.is_set():
+        await self._semaphore.acquire()
+        body = await self._read_frame(reader)
+        if body is None:
+          self._semaphore.release()
+          break
+        task = asyncio.create_task(self._respond(body, writer))
+        for tasks in (pending, self._tasks):
+          tasks.add(task)
+          task.add_done_callback(tasks.discard)
+        task.add_done_callback(lambda _: self._semaphore.release())
+
+    except (ConnectionError, asyncio.IncompleteReadError):
+      self._semaphore.release()
+
+    finally:
+      self._writers.discard(writer)
+      if len(pending) > 0:
+        await asyncio.wait(list(pending))
+      writer.close()
+
+  async def _read_frame(self, reader: asyncio.StreamReader) -> bytes | None:
+    try:
+      header = await reader.readexactly(_HEADER_SIZE)
+    except asyncio.IncompleteReadError:
+      return None
+    size = int.from_bytes(header, "big")
+    if size > self._max_frame_size:
+      raise ConnectionError(f"Frame is too large: {size}")
+    return await reader.readexactly(size)
+
+  async def _respond(self, body: bytes, writer: asyncio.StreamWriter):
+    request_id: Any = None
+    try:
+      request = json.loads(body)
+      if not isinstance(request, dict):
+        raise ValueError("Request must be a JSON object")
+      request_id = request.get("id", None)
+      result = await self._loop.run_in_executor(self._executor, self._execute, request)
+      response = { "id": request_id, "ok": True, "result": result }
+
+    # pylint: disable=broad-exception-caught
+    except Exception as e:
+      response = { "id": request_id, "ok": False, "error": f"{type(e).__name__}: {e}" }
+
+    if writer.is_closing():
+      return
+    writer.write(_encode_frame(response))
+    try:
+      await writer.drain()
+    except ConnectionError:
+      pass
+
+  def _execute(self, request: dict[str, Any]) -> Any:
+    op = request.get("op", None)
+    if op == "batch":
+      results: list[dict[str, Any]] = []
+      for sub_request in request["requests"]:
+        try:
+          results.append({ "ok": True, "result": self._execute_single(sub_request) })
+        # pylint: disable=broad-exception-caught
+        except Exception as e:
+          results.append({ "ok": False, "error": f"{type(e).__name__}: {e}" })
+      return results
+    return self._execute_single(request)
+
+  def _execute_single(self, request: dict[str, Any]) -> Any:
+    op = request.get("op", None)
+    if op == "parse":
+      path = _parse(request["cfi"])
+      return {
+        "cfi": str(path),
+        "type": "path" if isinstance(path, Path) else "range",
+      }
+    elif op == "sort":
+      pairs = [(_parse(cfi), cfi) for cfi in request["cfis"]]
+      pairs.sort(key=lambda pair: pair[0])
+      return [cfi for _, cfi in pairs]
+    elif op == "label":
+      return self._node.ncx_label(request["epub"], _parse(request["cfi"]))
+    elif op == "resolve":
+      return self._node.resolve(request["epub"], _parse(request["cfi"]))
+    elif op == "progress":
+      return self._node.progress(request["epub"], _parse(request["cfi"]))
+    elif op == "search":
+      hits = self._node.search(request["epub"], request["query"], request.get("limit", None))
+      return [f"epubcfi({hit})" for hit in hits]
+    elif op == "overlay_time":
+      found = self._node.overlay_time(request["epub"], _parse(request["cfi"]))
+      return None if found is None else list(found)
+    elif op == "overlay_clips":
+      clips = self._node.overlay_clips(request["epub"], request["audio"], request["times"])
+      return [None if clip is None else asdict(clip) for clip in clips]
+    elif op == "memory":
+      return asdict(self._node.memory_report())
+    else:
+      raise ValueError(f"Unknown op: {op}")
+
+class EpubClient:
+  def __init__(self, socket_path: str, timeout: float | None = None):
+    self._socket: socket.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    self._socket.settimeout(timeout)
+    self._socket.connect(socket_path)
+    self._reader = self._socket.makefile("rb")
+    self._next_id: int = 0
+
+  def request(self, op: str, **params: Any) -> Any:
+    response = self.pipeline([{ "op": op, **params }])[0]
+    if not response["ok"]:
+      raise RemoteException(response["error"])
+    return response["result"]
+
+  def pipeline(self, requests: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    ids: list[int] = []
+    buffer = bytearray()
+    for request in requests:
+      self._next_id += 1
+      ids.append(self._next_id)
+      buffer.extend(_encode_frame({ **request, "id": self._next_id }))
+    self._socket.sendall(buffer)
+
+    responses: dict[int, dict[str, Any]] = {}
+    while len(responses) < len(ids):
+      header = self._reader.read(_HEADER_SIZE)
+      if len(header) < _HEADER_SIZE:
+        raise ConnectionError("Connection closed by server")
+      body = self._reader.read(int.from_bytes(header, "big"))
+      response = json.loads(body)
+      responses[response["id"]] = response
+    return [responses[request_id] for request_id in ids]
+
+  def close(self):
+    self._reader.close()
+    self._socket.close()
+
+  def __enter__(self) -> "EpubClient":
+    return self
+
+  def __exit__(self, exc_type, exc_val, exc_tb):
+    self.close()
+
+def run_server(server: EpubServer):
+  async def serve():
+    loop = asyncio.get_running_loop()
+    for signal_number in (signal.SIGINT, signal.SIGTERM):
+      loop.add_signal_handler(signal_number, server.shutdown)
+    await server.serve()
+  asyncio.run(serve())
+
+# a socket left behind by a server that died is removed, but one that still answers keeps its server
+def _remove_stale_socket(socket_path: str):
+  try:
+    if not stat.S_ISSOCK(os.stat(socket_path).st_mode):
+      return
+  except FileNotFoundError:
+    return
+  with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+    try:
+      probe.connect(socket_path)
+    except ConnectionRefusedError:
+      os.remove(socket_path)
+      return
+  raise FileExistsError(f"A server already listens on {socket_path}")
+
+def _parse(cfi: str) -> ParsedPath:
+  path = parse(cfi)
+  if path is None:
+    raise ValueError(f"Not an epubcfi expression: {cfi}")
+  return path
+
+def _encode_frame(message: dict[str, Any]) -> bytes:
+  body = json.dumps(message, ensure_ascii=False, separators=(",", ":")).encode("utf8")
+  return len(body).to_bytes(_HEADER_SIZE, "big") + body
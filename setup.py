@@ -12,4 +12,12 @@ setup(
   install_requires=[
     "lxml>=5.3.0,<6.0",
   ],
+  extras_require={
+    "numpy": ["numpy>=1.24"],
+  },
+  entry_points={
+    "console_scripts": [
+      "epubcfi=epubcfi.cli:main",
+    ],
+  },
 )
\ No newline at end of file
@@ -1,7 +1,8 @@
 import unittest
 
 from epubcfi.cfi.path import PathRange
-from epubcfi.cfi.handler import parse, split, to_absolute, _capture_cfi
+from epubcfi.cfi.error import TokenizerException
+from epubcfi.cfi.handler import parse, split, parse_lines, to_absolute, dumps_many, _capture_cfi
 
 
 class TestCFI(unittest.TestCase):
@@ -20,6 +21,78 @@ class TestCFI(unittest.TestCase):
     self.assertEqual(prefix, "book.epub")
     self.assertEqual(str(results), "/6/4,!/2[foobar],/10/4[foz]")
 
+  def test_cached_str(self):
+    path = parse("epubcfi(/6/4,!/2[foo(bar)^,],/10/4[foz]:3)")
+    self.assertEqual(str(path), "/6/4,!/2[foo^(bar^)^,],/10/4[foz]:3")
+    # the string is built once
+    self.assertIs(str(path), str(path))
+
+    start, end = to_absolute(path)
+    self.assertEqual(str(start), "/6/4!/2[foo^(bar^)^,]")
+    self.assertIs(str(start), str(start))
+    self.assertEqual(str(end), "/6/4/10/4[foz]:3")
+    self.assertEqual(start, parse("epubcfi(/6/4!/2)"))
+
+    self.assertEqual(
+      dumps_many([path, end], wrap=True),
+      "epubcfi(/6/4,!/2[foo^(bar^)^,],/10/4[foz]:3)\nepubcfi(/6/4/10/4[foz]:3)",
+    )
+    self.assertEqual(dumps_many([start, end], separator=" "), "/6/4!/2[foo^(bar^)^,] /6/4/10/4[foz]:3")
+
+  def test_mutated_str(self):
+    path = parse("epubcfi(/6/4!/4/10:3)")
+    self.assertEqual(str(path), "/6/4!/4/10:3")
+    path.offset = None
+    self.assertEqual(str(path), "/6/4!/4/10")
+    path.steps = path.steps[:2]
+    self.assertEqual(str(path), "/6/4")
+
+    r = parse("epubcfi(/6/4!/4,/2:1,/10:3)")
+    self.assertEqual(str(r), "/6/4!/4,/2:1,/10:3")
+    self.assertEqual(str(to_absolute(r)[1]), "/6/4!/4/10:3")
+    # a path of the range changed, not the range itself
+    r.end.steps = parse("epubcfi(/12)").steps
+    self.assertEqual(str(r), "/6/4!/4,/2:1,/12:3")
+    self.assertEqual(str(to_absolute(r)[1]), "/6/4!/4/12:3")
+    r.start = parse("epubcfi(/4:2)")
+    self.assertEqual(str(r), "/6/4!/4,/4:2,/12:3")
+    self.assertEqual(str(r.absolute_start), "/6/4!/4/4:2")
+
+    # a change in one path leaves the caches of the others alone
+    other = parse("epubcfi(/6/2!/4,/2:1,/10:3)")
+    text = str(other)
+    r.parent.offset = None
+    self.assertIs(str(other), text)
+
+  def test_parse_bytes(self):
+    source = "book.epub#epubcfi(/6/4[chap01ref]!/4[body01]/10[para05]/3:10[forêt^,^]])"
+    expected = parse(source)
+    for content in (source.encode("utf8"), bytearray(source.encode("utf8")), memoryview(source.encode("utf8"))):
+      self.assertEqual(str(parse(content)), str(expected))
+      self.assertEqual(parse(content).offset.assertion, "forêt,]")
+      prefix, path = split(content)
+      self.assertEqual(prefix, "book.epub")
+      self.assertEqual(str(path), str(expected))
+    self.assertIsNone(parse(b"book.epub"))
+    with self.assertRaises(TokenizerException):
+      parse(b"epubcfi(/6/4[\xff\xfe])")
+    with self.assertRaises(TokenizerException):
+      split(b"\xff#epubcfi(/6/4)")
+
+  def test_parse_lines(self):
+    lines = [
+      "epubcfi(/6/2!/4/1:3)",
+      "",
+      "not an expression",
+      "book.epub#epubcfi(/6/4[中文],!/2,!/8)",
+      "epubcfi(/6/8!/2)",
+    ]
+    content = "\r\n".join(lines) + "\n"
+    expected = [None if path is None else str(path) for path in map(parse, lines)]
+    for source in (content, content.encode("utf8"), memoryview(content.encode("utf8"))):
+      results = [None if path is None else str(path) for path in parse_lines(source)]
+      self.assertListEqual(results, expected)
+
   def test_capture_cfi(self):
     pairs = [(
       "book.epub#epubcfi(/6/4[chap01ref]!/4[body01]/10[para05]/3:10)",
@@ -0,0 +1,58 @@
+import random
+import unittest
+
+from importlib.util import find_spec
+from epubcfi.cfi import parse, PathColumns, Path
+
+HAS_NUMPY = find_spec("numpy") is not None
+
+class TestColumnar(unittest.TestCase):
+
+  def setUp(self):
+    expressions = [
+      "/6/4", "/6/4!", "/6/4!/2", "/6/4!/2:0", "/6/4!/2:10", "/6/4!/2/1:3", "/6/4/2", "/6/4:3", "/6/4:0",
+      "/6/4~5", "/6/4~0@0:0", "/6/4~5@1:2", "/6/4~5@2:1", "/6/4@3:4", "/6/4@4:3", "/6/4[chap]!/4[body]/10",
+      "/6/0", "/6", "/6/14!/4/2/1:27", "/6/14!/4/2/1:27[yes]", "!/4", ":12",
+    ]
+    rand = random.Random(0)
+    for _ in range(300):
+      steps = "".join(f"/{rand.randint(0, 6) * 2}" for _ in range(rand.randint(1, 5)))
+      if rand.random() < 0.3:
+        steps += "!" + "".join(f"/{rand.randint(0, 3) * 2}" for _ in range(rand.randint(1, 3)))
+      if rand.random() < 0.5:
+        steps += f":{rand.randint(0, 20)}"
+      expressions.append(steps)
+    self._paths: list[Path] = [parse(f"epubcfi({expression})") for expression in expressions]
+    rand.shuffle(self._paths)
+
+  def test_sort_like_paths(self):
+    for use_numpy in self._modes():
+      columns = PathColumns(self._paths, use_numpy=use_numpy)
+      self.assertListEqual([str(path) for path in columns.sorted()], [str(path) for path in sorted(self._paths)])
+
+  def test_searchsorted(self):
+    sorted_paths = sorted(self._paths)
+    queries = self._paths[:50]
+    for use_numpy in self._modes():
+      columns = PathColumns(sorted_paths, use_numpy=use_numpy)
+      lefts = list(columns.searchsorted(queries))
+      rights = list(columns.searchsorted(queries, side="right"))
+      for query, left, right in zip(queries, lefts, rights):
+        self.assertEqual(left, sum(1 for path in sorted_paths if path < query))
+        self.assertEqual(right, sum(1 for path in sorted_paths if path <= query))
+      self.assertEqual(columns.searchsorted(queries[0]), lefts[0])
+
+  def test_compare(self):
+    others = list(reversed(self._paths))
+    expected = [(path1 > path2) - (path1 < path2) for path1, path2 in zip(self._paths, others)]
+    for use_numpy in self._modes():
+      columns1 = PathColumns(self._paths, use_numpy=use_numpy)
+      columns2 = PathColumns(others, use_numpy=use_numpy)
+      self.assertListEqual([int(value) for value in columns1.compare(columns2)], expected)
+    self.assertListEqual(
+      PathColumns(self._paths, use_numpy=False).compare(PathColumns(others, use_numpy=HAS_NUMPY)),
+      expected,
+    )
+
+  def _modes(self) -> list[bool]:
+    return [False, True] if HAS_NUMPY else [False]
@@ -0,0 +1,73 @@
+import random
+import unittest
+
+from epubcfi.cfi import parse, spine_steps, group_by_spine, pick_spine_steps
+from epubcfi.cfi.error import EpubCFIException, TokenizerException
+
+
+class TestPrefix(unittest.TestCase):
+
+  def test_spine_steps(self):
+    pairs = [
+      ("book.epub#epubcfi(/6/4[chap01ref]!/4[body01]/10[para05]/3:10)", (6, 4)),
+      ("epubcfi(/6/4[chap^]01ref]!/4/1:3[yes,^,no])", (6, 4)),
+      ("epubcfi(/6/14!)", (6, 14)),
+      ("epubcfi(!/4/2)", ()),
+      ("epubcfi(/6/4,!/2[foobar],/10/4[foz])", (6, 4)),
+      ("epubcfi(/6/4!/2,/1:3,/1:9)", (6, 4)),
+      ("epubcfi(/6/4,/2,/10)", None),
+      ("epubcfi(/6/4:12)", None),
+    ]
+    for cfi, expected in pairs:
+      self.assertEqual(spine_steps(cfi), expected, cfi)
+
+    for cfi in ("epubcfi(/6/04!/2)", "epubcfi(/6!!/2)", "epubcfi(!/6,/2,/4)", "epubcfi(/6/4!/2", "/6/4!/2"):
+      with self.assertRaises((EpubCFIException, TokenizerException, ValueError)):
+        spine_steps(cfi)
+
+  def test_group_by_spine(self):
+    groups = group_by_spine([
+      "epubcfi(/6/4!/4/2/1:0)",
+      "epubcfi(/6/2!/4)",
+      "epubcfi(/6/4[chap02]!/4/6)",
+      "epubcfi(/6/4)",
+      "epubcfi(/6/04!/4)",
+      "epubcfi(/6/4,!/2,!/6)",
+    ])
+    self.assertDictEqual(groups.groups, {
+      (6, 4): [0, 2, 5],
+      (6, 2): [1],
+    })
+    self.assertListEqual(groups.no_redirect, [3])
+    self.assertListEqual(groups.invalid, [4])
+
+  def test_agree_with_parser(self):
+    # random expressions built from the pieces of the grammar, most of them invalid
+    pieces = ["/6", "/4", "/0", "/01", "/12", "!", ",", ":3", ":0", "~2", "@1:2", "~1@2:3", ":1:2", "[a]", "[x^,y]", "[]", "/"]
+    rand = random.Random(42)
+    cfis: list[str] = []
+    for _ in range(3000):
+      body = "".join(rand.choice(pieces) for _ in range(rand.randint(1, 8)))
+      cfis.append(f"book.epub#epubcfi({body})")
+
+    groups = group_by_spine(cfis)
+    expected_groups: dict[tuple[int, ...], list[int]] = {}
+    expected_no_redirect: list[int] = []
+    expected_invalid: list[int] = []
+
+    for index, cfi in enumerate(cfis):
+      try:
+        steps = pick_spine_steps(parse(cfi))
+      except (EpubCFIException, TokenizerException, ValueError):
+        expected_invalid.append(index)
+        continue
+      if steps is None:
+        expected_no_redirect.append(index)
+      else:
+        expected_groups.setdefault(tuple(steps), []).append(index)
+        self.assertEqual(spine_steps(cfi), tuple(steps))
+
+    self.assertDictEqual(groups.groups, expected_groups)
+    self.assertListEqual(groups.no_redirect, expected_no_redirect)
+    self.assertListEqual(groups.invalid, expected_invalid)
+    self.assertGreater(len(cfis) - len(expected_invalid), 300)
@@ -0,0 +1,103 @@
+import random
+import unittest
+
+from epubcfi.cfi import (
+  parse, from_absolute, union_ranges, intersect_ranges, subtract_ranges, locate_in_ranges, PathRange,
+)
+
+def _cfi(expression: str):
+  return parse(f"epubcfi({expression})")
+
+class TestRanges(unittest.TestCase):
+
+  def test_contains(self):
+    r = _cfi("/6/4!/4/6,/1:3,/1:9")
+    self.assertTrue(r.contains(_cfi("/6/4!/4/6/1:3")))
+    self.assertTrue(_cfi("/6/4!/4/6/1:8").within(r))
+    self.assertFalse(_cfi("/6/4!/4/6/1:9").within(r))
+    self.assertFalse(_cfi("/6/4!/4/6/1:2").within(r))
+    self.assertTrue(r.contains(_cfi("/6/4!/4/6/1,:4,:9")))
+    self.assertFalse(r.contains(_cfi("/6/4!/4/6/1,:4,:10")))
+
+  def test_intersect(self):
+    r1 = _cfi("/6/4!/4,/2/1:0,/10/1:5")
+    r2 = _cfi("/6/4!/4/6,/1:3,/1:9")
+    self.assertEqual(str(r1.intersect(r2)), "/6/4!/4/6/1,:3,:9")
+    self.assertEqual(str(r2.intersect(r1)), "/6/4!/4/6/1,:3,:9")
+    self.assertIsNone(r2.intersect(_cfi("/6/4!/4/6,/1:9,/1:12")))
+
+  def test_union(self):
+    r1 = _cfi("/6/4!/4/6,/1:3,/1:9")
+    self.assertEqual(str(r1.union(_cfi("/6/4!/4/6,/1:9,/1:12"))), "/6/4!/4/6/1,:3,:12")
+    self.assertEqual(str(r1.union(_cfi("/6/4!/4/6,/1:0,/1:5"))), "/6/4!/4/6/1,:0,:9")
+    self.assertEqual(str(r1.union(_cfi("/6/4!/4/6/1,:4,:5"))), "/6/4!/4/6/1,:3,:9")
+    self.assertIsNone(r1.union(_cfi("/6/4!/4/8,/1:0,/1:2")))
+    self.assertIsNone(r1.union(_cfi("/6/6!/4,/2:0,/2:1")))
+
+  def test_subtract(self):
+    r1 = _cfi("/6/4!/4/6/1,:0,:10")
+    self.assertEqual(
+      [str(r) for r in r1.subtract(_cfi("/6/4!/4/6/1,:3,:5"))],
+      ["/6/4!/4/6/1,:0,:3", "/6/4!/4/6/1,:5,:10"],
+    )
+    self.assertEqual([str(r) for r in r1.subtract(_cfi("/6/4!/4/6/1,:0,:10"))], [])
+    self.assertEqual([str(r) for r in r1.subtract(_cfi("/6/4!/4/8/1,:0,:3"))], [str(r1)])
+
+  def test_from_absolute(self):
+    self.assertEqual(str(from_absolute(_cfi("/6/4!/4/1:3"), _cfi("/6/4!/4/1:9"))), "/6/4!/4/1,:3,:9")
+    self.assertEqual(str(from_absolute(_cfi("/6/4!/4/2"), _cfi("/6/4!/4/2/1:3"))), "/6/4!/4,/2,/2/1:3")
+    self.assertEqual(str(from_absolute(_cfi("/6/4!/4"), _cfi("/6/6!/4"))), "/6,/4!/4,/6!/4")
+    self.assertEqual(str(from_absolute(_cfi("/6/4!/4"), _cfi("/6/4!/6"))), "/6/4,!/4,!/6")
+
+    # different spine items share the spine as their parent
+    spanned = from_absolute(_cfi("/6/4!/4/2/1:3"), _cfi("/6/8!/4/1:0"))
+    self.assertEqual(str(spanned), "/6,/4!/4/2/1:3,/8!/4/1:0")
+    self.assertTrue(spanned.contains(_cfi("/6/6!/4/2")))
+    self.assertEqual(str(from_absolute(_cfi("/6"), _cfi("/6/4!/2")).absolute_end), "/6/4!/2")
+    self.assertEqual(str(_cfi("/6/4!/4,/2:0,/2:5").union(spanned)), str(spanned))
+
+    outside = from_absolute(_cfi("/4/2"), _cfi("/6/2"))
+    self.assertEqual((str(outside.absolute_start), str(outside.absolute_end)), ("/4/2", "/6/2"))
+    self.assertTrue(outside.contains(_cfi("/6/1")))
+
+    for expression in ("/6/4!/4,/2/1:0,/10/1:5", "/6/4,!/4,!/6", "/6/4!/4/6/1,:3,:9"):
+      r = _cfi(expression)
+      self.assertEqual(from_absolute(r.absolute_start, r.absolute_end), r)
+
+  def test_bulk_like_pairs(self):
+    rand = random.Random(0)
+    ranges1 = self._random_ranges(rand)
+    ranges2 = self._random_ranges(rand)
+    merged1 = union_ranges(ranges1)
+    merged2 = union_ranges(ranges2)
+
+    for r in ranges1:
+      self.assertTrue(any(m.contains(r) for m in merged1))
+    for m1, m2 in zip(merged1, merged1[1:]):
+      self.assertLess(m1.absolute_end, m2.absolute_start)
+
+    expected = [r for m1 in merged1 for m2 in merged2 if (r := m1.intersect(m2)) is not None]
+    self.assertEqual(intersect_ranges(merged1, merged2), expected)
+
+    expected = merged1
+    for m2 in merged2:
+      expected = [part for r in expected for part in r.subtract(m2)]
+    self.assertEqual(subtract_ranges(merged1, merged2), expected)
+
+    targets = sorted(r.absolute_start for r in ranges2)
+    self.assertEqual(
+      locate_in_ranges(merged1, targets),
+      [next((i for i, m in enumerate(merged1) if m.contains(t)), -1) for t in targets],
+    )
+    with self.assertRaises(ValueError):
+      union_ranges(list(reversed(merged1)))
+
+  def _random_ranges(self, rand: random.Random) -> list[PathRange]:
+    ranges: list[PathRange] = []
+    for _ in range(200):
+      node = rand.randint(1, 8) * 2
+      start = rand.randint(0, 30)
+      end = start + rand.randint(1, 10)
+      ranges.append(_cfi(f"/6/4!/4/{node}/1,:{start},:{end}"))
+    ranges.sort(key=lambda r: r.absolute_start)
+    return ranges
@@ -0,0 +1,56 @@
+import random
+import unittest
+
+from epubcfi.cfi import parse, reconcile, PathRange
+
+def _same(path1, path2) -> bool:
+  # a point is never the same annotation as a range starting there
+  return type(path1) is type(path2) and path1 == path2
+
+def _random_annotations(rand: random.Random, count: int):
+  annotations = []
+  for _ in range(count):
+    node = f"/6/{rand.randint(1, 3) * 2}!/4/{rand.randint(1, 4) * 2}"
+    start = rand.randint(0, 20)
+    if rand.random() < 0.3:
+      annotations.append(parse(f"epubcfi({node}/1:{start})"))
+    else:
+      assertion = "[x]" if rand.random() < 0.2 else ""
+      annotations.append(parse(f"epubcfi({node}{assertion}/1,:{start},:{start + rand.randint(1, 8)})"))
+  return annotations
+
+class TestReconcile(unittest.TestCase):
+
+  def test_like_pairs(self):
+    rand = random.Random(0)
+    for _ in range(20):
+      ours = _random_annotations(rand, rand.randint(0, 60))
+      theirs = _random_annotations(rand, rand.randint(0, 60))
+      result = reconcile(ours, theirs)
+
+      # duplicates pair equal paths one to one, the rest is added or removed
+      self.assertTrue(all(_same(ours[i], theirs[j]) for i, j in result.duplicates))
+      matched1 = {i for i, _ in result.duplicates}
+      matched2 = {j for _, j in result.duplicates}
+      self.assertListEqual(result.removed, [i for i in range(len(ours)) if i not in matched1])
+      self.assertListEqual(result.added, [j for j in range(len(theirs)) if j not in matched2])
+      for i in result.removed:
+        self.assertFalse(any(_same(ours[i], theirs[j]) for j in result.added))
+
+      expected = [
+        (i, j)
+        for i in result.removed for j in result.added
+        if isinstance(ours[i], PathRange) and isinstance(theirs[j], PathRange)
+        and ours[i].intersect(theirs[j]) is not None
+      ]
+      self.assertListEqual(result.overlaps, sorted(expected))
+
+  def test_assertions_ignored(self):
+    result = reconcile(
+      [parse("epubcfi(/6/4[chap]!/4/2/1,:1,:5)"), parse("epubcfi(/6/4!/4/2/1:3)")],
+      [parse("epubcfi(/6/4!/4/2/1:3[yes])"), parse("epubcfi(/6/4!/4/2,/1:1,/1:5)"), parse("epubcfi(/6/4!/4/2/1,:4,:9)")],
+    )
+    self.assertListEqual(result.duplicates, [(1, 0), (0, 1)])
+    self.assertListEqual(result.added, [2])
+    self.assertListEqual(result.removed, [])
+    self.assertListEqual(result.overlaps, [])
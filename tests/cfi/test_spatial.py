@@ -0,0 +1,60 @@
+import random
+import unittest
+
+from epubcfi.cfi import parse, SpatialIndex, Path
+
+def _cfi(expression: str):
+  return parse(f"epubcfi({expression})")
+
+class TestSpatial(unittest.TestCase):
+
+  def setUp(self):
+    rand = random.Random(0)
+    self._paths = []
+    for _ in range(500):
+      image = rand.choice(("/6/4!/4/2/2", "/6/4!/4/2/4", "/6/6!/4/2"))
+      self._paths.append(_cfi(f"{image}@{rand.randint(0, 100)}:{rand.randint(0, 100)}"))
+    self._paths.append(_cfi("/6/4!/4/2/2:3"))
+    self._paths.append(_cfi("/6/4!/4/2/2~12@50:50"))
+    self._index = SpatialIndex(self._paths, cell_size=8)
+
+  def test_within_like_scan(self):
+    rand = random.Random(1)
+    for _ in range(100):
+      element = _cfi(rand.choice(("/6/4!/4/2/2", "/6/4!/4/2/4", "/6/8!/4")))
+      left, right = sorted((rand.randint(-10, 110), rand.randint(-10, 110)))
+      top, bottom = sorted((rand.randint(-10, 110), rand.randint(-10, 110)))
+      expected = [
+        id for id, (x, y) in self._points(element)
+        if left <= x <= right and top <= y <= bottom
+      ]
+      self.assertListEqual(self._index.within(element, left, top, right, bottom), expected)
+
+  def test_nearest_like_scan(self):
+    rand = random.Random(2)
+    for _ in range(100):
+      element = _cfi(rand.choice(("/6/4!/4/2/2", "/6/6!/4/2")))
+      x, y = rand.randint(-20, 120), rand.randint(-20, 120)
+      k = rand.randint(1, 6)
+      max_distance = rand.choice((None, 5.0, 20.0))
+      expected = sorted(
+        (((px - x) ** 2 + (py - y) ** 2, id) for id, (px, py) in self._points(element)),
+      )
+      if max_distance is not None:
+        expected = [item for item in expected if item[0] <= max_distance ** 2]
+      self.assertListEqual(
+        self._index.nearest(element, x, y, k, max_distance),
+        [id for _, id in expected[:k]],
+      )
+
+  def test_temporal_spatial_and_skipped(self):
+    element = _cfi("/6/4!/4/2/2")
+    self.assertIn(len(self._paths) - 1, self._index.within(element, 50, 50, 50, 50))
+    self.assertListEqual(self._index.nearest(_cfi("/6/4!/4/2/2/1"), 0, 0), [])
+    self.assertEqual(len(self._index), len(self._paths))
+
+  def _points(self, element: Path):
+    for id, path in enumerate(self._paths):
+      offset = path.offset
+      if path.steps == element.steps and hasattr(offset, "x"):
+        yield id, (offset.x, offset.y)
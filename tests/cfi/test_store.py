@@ -0,0 +1,40 @@
+import random
+import unittest
+
+from epubcfi.cfi import parse, PathStore
+
+class TestStore(unittest.TestCase):
+
+  def setUp(self):
+    expressions = [
+      "/6/4", "/6/4!", "/6/4!/2", "/6/4!/2:0", "/6/4!/2:10", "/6/4~5", "/6/4~0@0:0", "/6/4~5@1:2",
+      "/6/4@3:4", "/6/4[chap]!/4[body]/10", "/6/14!/4/2/1:27[yes]", "/6/14!/4/2/1:27[yes;s=b]", "!/4", ":12",
+    ]
+    rand = random.Random(0)
+    for _ in range(2000):
+      # annotations pile up on the same paragraphs
+      steps = f"/6/{rand.randint(1, 10) * 2}!/4/{rand.randint(1, 3) * 2}/{rand.randint(1, 20) * 2}"
+      expressions.append(f"{steps}/1:{rand.randint(0, 500)}")
+    self._paths = [parse(f"epubcfi({expression})") for expression in expressions]
+    rand.shuffle(self._paths)
+    self._store = PathStore(self._paths)
+
+  def test_roundtrip(self):
+    self.assertEqual(len(self._store), len(self._paths))
+    for id, path in enumerate(self._paths):
+      self.assertEqual(self._store[id], path)
+      self.assertEqual(str(self._store[id]), str(path))
+    self.assertListEqual([str(path) for path in self._store], [str(path) for path in self._paths])
+
+  def test_sorted(self):
+    self.assertListEqual(
+      [str(path) for path in self._store.iter_sorted()],
+      [str(path) for path in sorted(self._paths)],
+    )
+
+  def test_shared_prefixes(self):
+    self.assertLess(self._store.nodes, len(self._paths) * 2)
+    self.assertLess(self._store.bytes_per_path(), 50)
+    self.assertEqual(PathStore().bytes_per_path(), 0.0)
+    with self.assertRaises(TypeError):
+      self._store.add(parse("epubcfi(/6/4,/2,/4)"))
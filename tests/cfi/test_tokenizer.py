@@ -25,3 +25,14 @@ class TestTokenizer(unittest.TestCase):
         tokens.append(token)
 
       self.assertEqual(cfi, "".join(map(str, tokens)))
+
+  def test_tokenizer_bytes(self):
+    content = b"book.epub#epubcfi(/6/4[chap^]\xe7\xab\xa0]!/4:10)"
+    tokenizer = Tokenizer(memoryview(content), start=18, end=len(content) - 1)
+    tokens: list[Token] = []
+    while True:
+      token = tokenizer.read()
+      if isinstance(token, EOF):
+        break
+      tokens.append(token)
+    self.assertEqual("".join(map(str, tokens)), "/6/4[chap^]章]!/4:10")
@@ -0,0 +1,96 @@
+import os
+import unittest
+
+from unittest.mock import patch
+from epubcfi.epub import EpubBatch
+from epubcfi.epub.batch import _run_group
+
+CONTEXT = os.path.dirname(os.path.abspath(__file__))
+
+class TestBatch(unittest.TestCase):
+
+  def test_label_in_process(self):
+    self._check_labels(EpubBatch(workers=0, chunk_size=3))
+
+  def test_label_with_process_pool(self):
+    self._check_labels(EpubBatch(workers=2, chunk_size=2, max_pending=1))
+
+  def test_broken_worker(self):
+    zip_file = os.path.join(CONTEXT, "assets", "zip_sample.epub")
+    dir_file = os.path.join(CONTEXT, "assets", "sample.epub")
+    pairs = [
+      (zip_file, "epubcfi(/6/16!:32)"),
+      (dir_file, "epubcfi(/6/24!)"),
+      (zip_file, "epubcfi(/4/34!)"),
+    ]
+    batch = EpubBatch(workers=1, chunk_size=2)
+    with patch("epubcfi.epub.batch._run_group", _crash_group):
+      items = sorted(batch.ncx_labels(iter(pairs)), key=lambda item: item.index)
+
+    self.assertListEqual([item.index for item in items], [0, 1, 2])
+    self.assertListEqual([item.ok for item in items], [False, False, False])
+    self.assertTrue(all(item.error.startswith("BrokenProcessPool") for item in items))
+    self.assertEqual(batch.progress.completed, 3)
+    self.assertEqual(batch.progress.failed, 3)
+
+  def test_worker_killed_by_one_book(self):
+    zip_file = os.path.join(CONTEXT, "assets", "zip_sample.epub")
+    dir_file = os.path.join(CONTEXT, "assets", "sample.epub")
+    pairs = [
+      (zip_file, "epubcfi(/6/16!:32)"),
+      (dir_file, "epubcfi(/6/24!)"),
+      (zip_file, "epubcfi(/4/34!)"),
+      (dir_file, "epubcfi(/6/16!:32)"),
+      (zip_file, "epubcfi(/6/24!)"),
+    ]
+    # the pool is replaced after the crash, the other books still get their labels
+    batch = EpubBatch(workers=2, chunk_size=2, max_pending=2)
+    with patch("epubcfi.epub.batch._run_group", _crash_on_directory):
+      items = sorted(batch.ncx_labels(iter(pairs)), key=lambda item: item.index)
+
+    self.assertListEqual(
+      [item.value for item in items],
+      ["Introduction", None, "III. The Subject", None, "II. Lack in the Other"],
+    )
+    self.assertTrue(items[1].error.startswith("BrokenProcessPool"))
+    self.assertTrue(items[3].error.startswith("BrokenProcessPool"))
+    self.assertEqual(batch.progress.completed, 5)
+    self.assertEqual(batch.progress.failed, 2)
+
+  def _check_labels(self, batch: EpubBatch):
+    zip_file = os.path.join(CONTEXT, "assets", "zip_sample.epub")
+    dir_file = os.path.join(CONTEXT, "assets", "sample.epub")
+    pairs = [
+      (zip_file, "sample.epub#epubcfi(/6/16!:32)"),
+      (dir_file, "sample.epub#epubcfi(/6/24!)"),
+      (zip_file, "sample.epub#epubcfi(/4/34!)"),
+      (zip_file, "sample.epub#epubcfi(/6/16!:32"),
+      (os.path.join(CONTEXT, "assets", "missing.epub"), "epubcfi(/6/16!:32)"),
+    ]
+    items = sorted(batch.ncx_labels(iter(pairs)), key=lambda item: item.index)
+
+    self.assertListEqual(
+      [item.value for item in items],
+      ["Introduction", "II. Lack in the Other", "III. The Subject", None, None],
+    )
+    self.assertListEqual(
+      [item.ok for item in items],
+      [True, True, True, False, False],
+    )
+    self.assertTrue(items[4].error.startswith("FileNotFoundError"))
+
+    progress = batch.progress
+    self.assertEqual(progress.submitted, 5)
+    self.assertEqual(progress.completed, 5)
+    self.assertEqual(progress.failed, 2)
+    self.assertEqual(progress.pending, 0)
+    self.assertGreater(progress.throughput, 0.0)
+
+def _crash_group(_method: str, _items: list) -> list:
+  # a worker dying in the middle of a group, as it would on a segfault or the OOM killer
+  os._exit(1)
+
+def _crash_on_directory(method: str, items: list) -> list:
+  if os.path.isdir(items[0].epub_path):
+    os._exit(1)
+  return _run_group(method, items)
@@ -0,0 +1,105 @@
+import os
+import shutil
+import zipfile
+import unittest
+import tempfile
+
+from unittest.mock import patch
+from epubcfi.epub import Catalog
+from epubcfi.epub.catalog import _scan_book
+
+CONTEXT = os.path.dirname(os.path.abspath(__file__))
+
+class TestCatalog(unittest.TestCase):
+
+  def setUp(self):
+    self._temp_path = tempfile.mkdtemp()
+    self._root_path = os.path.join(self._temp_path, "books")
+    self._db_path = os.path.join(self._temp_path, "catalog.db")
+    zip_file = os.path.join(CONTEXT, "assets", "zip_sample.epub")
+    for name in ("a/sample.epub", "b/copy.epub"):
+      os.makedirs(os.path.dirname(self._path(name)), exist_ok=True)
+      shutil.copyfile(zip_file, self._path(name))
+
+    nav_path = os.path.join(CONTEXT, "assets", "nav.epub")
+    with zipfile.ZipFile(self._path("nav.epub"), "w") as zip_ref:
+      for dir_path, _, file_names in os.walk(nav_path):
+        for file_name in file_names:
+          file_path = os.path.join(dir_path, file_name)
+          zip_ref.write(file_path, os.path.relpath(file_path, nav_path))
+
+    with open(self._path("broken.epub"), "wb") as file:
+      file.write(b"not a zip")
+    with open(self._path("notes.txt"), "w", encoding="utf8") as file:
+      file.write("skipped")
+
+  def tearDown(self):
+    shutil.rmtree(self._temp_path, ignore_errors=True)
+
+  def test_scan_in_process(self):
+    with Catalog(self._db_path, workers=0, chunk_size=1, batch_size=2) as catalog:
+      progress = catalog.scan(self._root_path)
+      self.assertEqual((progress.found, progress.scanned, progress.failed), (4, 4, 1))
+      self.assertGreater(progress.throughput, 0.0)
+      self._check_entries(catalog)
+
+  def test_scan_resumes(self):
+    with Catalog(self._db_path, workers=2, chunk_size=1, max_pending=1) as catalog:
+      progress = catalog.scan(self._root_path)
+      self.assertEqual((progress.scanned, progress.skipped), (4, 0))
+      self._check_entries(catalog)
+
+    with Catalog(self._db_path, workers=0) as catalog:
+      progress = catalog.scan(self._root_path)
+      self.assertEqual((progress.scanned, progress.skipped), (0, 4))
+
+      stat = os.stat(self._path("b/copy.epub"))
+      os.utime(self._path("b/copy.epub"), ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+      os.remove(self._path("broken.epub"))
+      progress = catalog.scan(self._root_path)
+      self.assertEqual((progress.found, progress.scanned, progress.skipped, progress.removed), (3, 1, 2, 1))
+      self.assertEqual(len(catalog), 3)
+      self.assertListEqual(catalog.errors(), [])
+
+  def test_worker_killed_by_one_book(self):
+    shutil.copyfile(self._path("nav.epub"), self._path("crash.epub"))
+    with Catalog(self._db_path, workers=2, chunk_size=3) as catalog:
+      with patch("epubcfi.epub.catalog._scan_book", _crash_on_name):
+        progress = catalog.scan(self._root_path)
+      self.assertEqual((progress.found, progress.scanned, progress.failed), (5, 5, 2))
+      self._check_entries(catalog, [self._path("crash.epub")])
+      errors = dict(catalog.errors())
+      self.assertTrue(errors[self._path("crash.epub")].startswith("BrokenProcessPool"))
+
+  def _check_entries(self, catalog: Catalog, crashed: list[str] | None = None):
+    sample = catalog.entry(self._path("a/sample.epub"))
+    copy = catalog.entry(self._path("b/copy.epub"))
+    self.assertTrue(sample.ok)
+    self.assertEqual(sample.title, "The Sublime Object of Ideology")
+    self.assertListEqual(sample.authors, ["Slavoj Žižek"])
+    self.assertEqual(sample.content_path, "OEBPS/content.opf")
+    self.assertEqual(sample.toc_path, "OEBPS/toc.ncx")
+    self.assertEqual(len(sample.spine), 20)
+    self.assertEqual(sample.toc[0], ("Cover Page", "CoverJohnBrownvl3063thmfuwrmefxonbsyetochqcom.xhtml", None, 0))
+    self.assertEqual(sample.fingerprint, copy.fingerprint)
+
+    nav = catalog.entry(self._path("nav.epub"))
+    self.assertEqual(nav.title, "Navigation Sample")
+    self.assertEqual(nav.toc_path, "OEBPS/nav.xhtml")
+    self.assertListEqual(nav.spine, ["OEBPS/chapter1.xhtml", "OEBPS/chapter2.xhtml"])
+    self.assertEqual(nav.toc[2], ("First Section", "OEBPS/chapter2.xhtml", "s1", 1))
+    self.assertNotEqual(nav.fingerprint, sample.fingerprint)
+
+    errors = [(path, error) for path, error in catalog.errors(self._root_path) if path not in (crashed or [])]
+    self.assertEqual(len(errors), 1)
+    self.assertEqual(errors[0][0], self._path("broken.epub"))
+    self.assertTrue(errors[0][1].startswith("BadZipFile"))
+
+  def _path(self, name: str) -> str:
+    return os.path.join(self._root_path, name)
+
+def _crash_on_name(entry) -> None:
+  # a book that kills its worker, as a decompression bomb would through the OOM killer
+  if os.path.basename(entry.epub_path) == "crash.epub":
+    os._exit(1)
+  _scan_book(entry)
@@ -14,3 +14,102 @@ class TestEPub(unittest.TestCase):
       cfi_path = parse("sample.epub#epubcfi(/6/16!:32)")
       label = epub.ncx_label(epub_file, cfi_path)
       self.assertEqual(label, "Introduction")
+
+  def test_extract_text(self):
+    epub_file = os.path.join(CONTEXT, "assets", "article.epub")
+    expected_texts = [
+      ("epubcfi(/6/2!/4/4/1:7)", "It was a bright cold day in April."),
+      ("epubcfi(/6/2!/4/4,/1:3,/1:6)", "was"),
+      ("epubcfi(/6/2!/4,/4/1:27,/6/1:10)", " April.\nThe clocks"),
+      ("epubcfi(/6/2!/4/6)", "The clocks were striking thirteen at noon."),
+      ("epubcfi(/6/4!/4/4/4/1,:4,:20)", "hallway smelt of"),
+      ("epubcfi(/6/2)", None),
+    ]
+    with EpubNode(remove_cache_path=True) as epub:
+      for cfi, expected_text in expected_texts:
+        text = epub.extract_text(epub_file, parse(cfi))
+        self.assertEqual(text, expected_text)
+
+  def test_progress(self):
+    epub_file = os.path.join(CONTEXT, "assets", "article.epub")
+    cfis = [
+      "epubcfi(/6/2!/4/2)",
+      "epubcfi(/6/2!/4/4/1:0)",
+      "epubcfi(/6/2!/4/4/1:7)",
+      "epubcfi(/6/2!/4/6/2/1:3)",
+      "epubcfi(/6/4!/4/2)",
+      "epubcfi(/6/4!/4/4/4/1:52)",
+    ]
+    with EpubNode(remove_cache_path=True) as epub:
+      progresses = [epub.progress(epub_file, parse(cfi)) for cfi in cfis]
+      self.assertListEqual(progresses, sorted(progresses))
+      self.assertTrue(0.0 < progresses[0] and progresses[-1] < 1.0)
+
+      # the book holds 253 characters, the first chapter 119 of them
+      self.assertAlmostEqual(progresses[2] - progresses[1], 7 / 253)
+      self.assertAlmostEqual(progresses[4], 119 / 253)
+
+      # a range is as far as its start, offsets never leave their text node
+      self.assertEqual(epub.progress(epub_file, parse("epubcfi(/6/2!/4/4,/1:7,/1:9)")), progresses[2])
+      self.assertAlmostEqual(epub.progress(epub_file, parse("epubcfi(/6/4!/4/4/4/1:999)")), 250 / 253)
+      self.assertIsNone(epub.progress(epub_file, parse("epubcfi(/6/2)")))
+
+  def test_media_overlay(self):
+    epub_file = os.path.join(CONTEXT, "assets", "nav.epub")
+    audio1 = os.path.join(".", "OEBPS", "audio", "chapter1.mp3")
+    audio2 = os.path.join(".", "OEBPS", "audio", "chapter2.mp3")
+    expected_times = [
+      ("epubcfi(/6/2!/4/2/1:3)", (audio1, 0.0)),
+      ("epubcfi(/6/2!/4/4/1:7)", (audio1, 1.5)),
+      ("epubcfi(/6/2!/4/6/1:0)", (audio1, 4.5)),
+      ("epubcfi(/6/2!/4/4~1)", (audio1, 2.5)),
+      ("epubcfi(/6/2!/4/4~100)", (audio1, 4.0)),
+      ("epubcfi(/6/4!/4/4/4/1:3)", (audio2, 30.0)),
+      ("epubcfi(/6/4!/4,/2/2/1:0,/4/2/1:1)", (audio2, 0.0)),
+    ]
+    with EpubNode(remove_cache_path=True) as epub:
+      for cfi, expected_time in expected_times:
+        self.assertEqual(epub.overlay_time(epub_file, parse(cfi)), expected_time, cfi)
+
+      clip = epub.overlay_clip(epub_file, parse("epubcfi(/6/4!/4/2/4)"))
+      self.assertEqual((clip.fragment, clip.begin, clip.end), ("s1", 0.0, 30.0))
+      self.assertIsNone(epub.overlay_time(epub_file, parse("epubcfi(/6/2)")))
+
+      clips = epub.overlay_clips(epub_file, audio1, [0.2, 1.5, 4.2, 5.0, 3.0, 9.0])
+      self.assertListEqual(
+        [None if clip is None else clip.fragment for clip in clips],
+        ["c1", "p1", None, "p2", "p1", None],
+      )
+      self.assertListEqual(epub.overlay_clips(epub_file, "missing.mp3", [1.0]), [None])
+
+      # the last clip without clipEnd has no end, it plays until the audio does
+      clip = epub.overlay_clips(epub_file, audio2, [45.0])[0]
+      self.assertEqual((clip.fragment, clip.begin, clip.end), ("s2", 30.0, None))
+      self.assertEqual(epub.overlay_time(epub_file, parse("epubcfi(/6/4!/4/4~100)")), (audio2, 130.0))
+
+  def test_memory_budget(self):
+    books = [os.path.join(CONTEXT, "assets", name) for name in ("zip_sample.epub", "article.epub", "nav.epub")]
+    cfi = parse("epubcfi(/6/2!/4/2)")
+    with EpubNode(remove_cache_path=True) as epub:
+      for book in books:
+        epub.progress(book, cfi)
+      report = epub.memory_report()
+      self.assertIsNone(report.budget)
+      self.assertListEqual([book.epub_path for book in report.books], books)
+      self.assertEqual(report.size, sum(book.size for book in report.books))
+      parts = report.books[1].parts
+      self.assertGreater(parts["book"], 0)
+      self.assertGreater(parts["lengths"], 0)
+      self.assertEqual(report.books[1].size, sum(parts.values()))
+      sizes = [book.size for book in report.books]
+
+    # the budget holds the last two books, loading a third one drops the oldest
+    with EpubNode(remove_cache_path=True, memory_budget=sizes[1] + sizes[2]) as epub:
+      for book in books:
+        epub.progress(book, cfi)
+      # the size of a book is taken again every time it is used
+      epub.progress(books[2], cfi)
+      report = epub.memory_report()
+      self.assertEqual(report.budget, sizes[1] + sizes[2])
+      self.assertListEqual([book.epub_path for book in report.books], books[1:])
+      self.assertLessEqual(report.size, report.budget)
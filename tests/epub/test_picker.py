@@ -1,14 +1,51 @@
 import os
+import tempfile
 import unittest
+import zipfile
 
 from epubcfi.cfi import parse
-from epubcfi.epub.picker import pick
+from epubcfi.epub.picker import pick, pick_members
 from epubcfi.epub.ncx_finder import find_ncx_label
 
 CONTEXT = os.path.dirname(os.path.abspath(__file__))
 
 class TestPicker(unittest.TestCase):
 
+  def test_pick_members(self):
+    dir_path = os.path.join(CONTEXT, "assets", "nav.epub")
+    book = pick(dir_path)
+    with tempfile.TemporaryDirectory() as temp_path:
+      epub_path = os.path.join(temp_path, "nav.epub")
+      with zipfile.ZipFile(epub_path, "w") as zip_file:
+        for parent, _, names in os.walk(dir_path):
+          for name in names:
+            file_path = os.path.join(parent, name)
+            zip_file.write(file_path, os.path.relpath(file_path, dir_path).replace(os.path.sep, "/"))
+
+      opened: list[str] = []
+      with zipfile.ZipFile(epub_path, "r") as zip_ref:
+        names = set(zip_ref.namelist())
+        def open_member(name: str):
+          opened.append(name)
+          return zip_ref.open(name)
+        member_book = pick_members(epub_path, open_member, names.__contains__)
+
+      # only what pick parses is read, no member is extracted
+      self.assertListEqual(opened, ["META-INF/container.xml", "OEBPS/content.opf", "OEBPS/nav.xhtml"])
+      self.assertEqual(member_book.root_path, epub_path)
+      self.assertEqual(member_book.title, book.title)
+      self.assertListEqual(member_book.spine, book.spine)
+      self.assertListEqual(member_book.toc.entries, book.toc.entries)
+      for paths, member_paths in (
+        ([book.content_path, book.toc_path], [member_book.content_path, member_book.toc_path]),
+        (book.overlay_paths, member_book.overlay_paths),
+      ):
+        self.assertListEqual(
+          [os.path.relpath(path, dir_path) for path in paths],
+          [os.path.relpath(path, epub_path) for path in member_paths],
+        )
+      self.assertListEqual(os.listdir(temp_path), ["nav.epub"])
+
   def test_pick_from_book(self):
     book = pick(os.path.join(CONTEXT, "assets", "sample.epub"))
     self.assertEqual(book.title, "The Sublime Object of Ideology")
@@ -34,6 +71,13 @@ class TestPicker(unittest.TestCase):
       ("This eBook is licensed to John Brown, vlthmfuwrmefxonbsy@etochq.com on 10/22/2020", "./disclaimerJohnBrown5019vlthmfuwrmefxonbsyetochqcom.xhtml")
     ])
 
+  def test_pick_spine(self):
+    book = pick(os.path.join(CONTEXT, "assets", "article.epub"))
+    self.assertListEqual(book.spine, [
+      os.path.join(".", "OEBPS", "chapter1.xhtml"),
+      os.path.join(".", "OEBPS", "chapter2.xhtml"),
+    ])
+
   def test_find_label(self):
     book = pick(os.path.join(CONTEXT, "assets", "sample.epub"))
     except_labels = [
@@ -47,3 +91,37 @@ class TestPicker(unittest.TestCase):
         label = find_ncx_label(book, reader, path)
         self.assertEqual(label, expected_label)
         reader.seek(0)
+
+  def test_pick_nav(self):
+    book = pick(os.path.join(CONTEXT, "assets", "nav.epub"))
+    chapter1 = os.path.join(".", "OEBPS", "chapter1.xhtml")
+    chapter2 = os.path.join(".", "OEBPS", "chapter2.xhtml")
+    self.assertIsNone(book.ncx_path)
+    self.assertListEqual(book.ncx, [
+      ("Chapter One", chapter1),
+      ("Chapter Two", chapter2),
+      ("First Section", f"{chapter2}#s1"),
+      ("Second Section", f"{chapter2}#s2"),
+    ])
+    self.assertListEqual(
+      [(entry.depth, entry.parent, entry.play_order) for entry in book.toc.entries],
+      [(0, -1, 1), (0, -1, 2), (1, 1, 3), (1, 1, 4)],
+    )
+    self.assertEqual(book.toc.label(chapter2), "Chapter Two")
+
+  def test_find_fragment_label(self):
+    book = pick(os.path.join(CONTEXT, "assets", "nav.epub"))
+    except_labels = [
+      ("epubcfi(/6/2!/4/4/1:7)", "Chapter One"),
+      ("epubcfi(/6/4!)", "Chapter Two"),
+      ("epubcfi(/6/4!/4/1:0)", "Chapter Two"),
+      ("epubcfi(/6/4!/4/2/4/1:3)", "First Section"),
+      ("epubcfi(/6/4!/4/3:0)", "First Section"),
+      ("epubcfi(/6/4!/4/4)", "Second Section"),
+      ("epubcfi(/6/4!/4,/2/4/1:0,/4/4/1:5)", "First Section"),
+    ]
+    with open(book.content_path, "rb") as reader:
+      for cfi, expected_label in except_labels:
+        label = find_ncx_label(book, reader, parse(cfi))
+        self.assertEqual(label, expected_label, cfi)
+        reader.seek(0)
@@ -0,0 +1,59 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from unittest import mock
+from epubcfi.epub import EpubNode
+
+CONTEXT = os.path.dirname(os.path.abspath(__file__))
+ARTICLE_PATH = os.path.join(CONTEXT, "assets", "article.epub")
+
+class TestSearch(unittest.TestCase):
+
+  def setUp(self):
+    self._temp_path = tempfile.mkdtemp()
+    self._cache_path = os.path.join(self._temp_path, "cache")
+    self._epub_path = os.path.join(self._temp_path, "article.epub")
+    shutil.copytree(ARTICLE_PATH, self._epub_path)
+
+  def tearDown(self):
+    shutil.rmtree(self._temp_path)
+
+  def test_search(self):
+    expected_hits = [
+      ("bright cold day", ["/6/2!/4/4/1,:9,:24"]),
+      ("THE", ["/6/2!/4/6/1,:0,:3", "/6/4!/4/2/4/1,:29,:32", "/6/4!/4/4/4/1,:0,:3"]),
+      ("striking, thirteen", ["/6/2!/4/6,/1:16,/2/1:8"]),
+      ("section", ["/6/4!/4/2/2/1,:6,:13", "/6/4!/4/4/2/1,:7,:14"]),
+      ("cabbage soup", []),
+      ("  ", []),
+    ]
+    with EpubNode(self._cache_path) as epub:
+      for query, expected in expected_hits:
+        hits = epub.search(self._epub_path, query)
+        self.assertListEqual([str(hit) for hit in hits], expected, query)
+        for hit in hits:
+          text = epub.extract_text(self._epub_path, hit)
+          self.assertEqual(" ".join(text.casefold().split()), " ".join(query.casefold().replace(",", "").split()))
+      self.assertEqual(len(epub.search(self._epub_path, "the", limit=2)), 2)
+
+  def test_saved_index(self):
+    with EpubNode(self._cache_path) as epub:
+      self.assertEqual(len(epub.search(self._epub_path, "winston")), 1)
+
+    with EpubNode(self._cache_path) as epub:
+      with mock.patch("epubcfi.epub.search.collect_words", side_effect=AssertionError("indexed again")):
+        self.assertEqual(len(epub.search(self._epub_path, "winston")), 1)
+
+    chapter_path = os.path.join(self._epub_path, "OEBPS", "chapter2.xhtml")
+    with open(chapter_path, "r", encoding="utf8") as file:
+      chapter = file.read()
+    with open(chapter_path, "w", encoding="utf8") as file:
+      file.write(chapter.replace("Winston Smith", "Julia"))
+    stat = os.stat(chapter_path)
+    os.utime(chapter_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    with EpubNode(self._cache_path) as epub:
+      self.assertListEqual(epub.search(self._epub_path, "winston"), [])
+      self.assertEqual(len(epub.search(self._epub_path, "julia walked")), 1)
@@ -0,0 +1,72 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from epubcfi.cfi import parse
+from epubcfi.epub import EpubNode
+from epubcfi.epub.picker import pick
+from epubcfi.epub.progress import spine_lengths
+from epubcfi.epub.shared import publish_book, attach_book, publish_spine, attach_spine
+from epubcfi.epub.utils import DocumentCache
+from epubcfi.metrics import Metrics, HistogramSink
+
+CONTEXT = os.path.dirname(os.path.abspath(__file__))
+
+class TestShared(unittest.TestCase):
+
+  def setUp(self):
+    self._temp_path = tempfile.mkdtemp()
+
+  def tearDown(self):
+    shutil.rmtree(self._temp_path)
+
+  def test_attach_book(self):
+    for name in ("sample.epub", "nav.epub"):
+      book = pick(os.path.join(CONTEXT, "assets", name))
+      index_path = os.path.join(self._temp_path, f"{name}.book")
+      self.assertIsNone(attach_book(index_path))
+      publish_book(index_path, book)
+      attached = attach_book(index_path)
+
+      for field in ("title", "root_path", "content_path", "ncx_path", "toc_path"):
+        self.assertEqual(getattr(attached, field), getattr(book, field))
+      self.assertListEqual(list(attached.authors), book.authors)
+      self.assertListEqual(list(attached.spine), book.spine)
+      self.assertListEqual(list(attached.overlay_paths), book.overlay_paths)
+      self.assertListEqual(list(attached.ncx), book.ncx)
+      self.assertDictEqual(dict(attached.ref2path), book.ref2path)
+      self.assertListEqual(list(attached.toc.entries), book.toc.entries)
+      self.assertDictEqual({ path: list(indexes) for path, indexes in attached.toc.paths.items() }, book.toc.paths)
+      self.assertIsNone(attached.ref2path.get("missing", None))
+
+      spine = spine_lengths(book, DocumentCache())
+      publish_spine(f"{index_path}.spine", spine)
+      attached_spine = attach_spine(f"{index_path}.spine")
+      self.assertDictEqual(dict(attached_spine.indexes), spine.indexes)
+      self.assertListEqual(list(attached_spine.starts), spine.starts)
+      for attached_lengths, lengths in zip(attached_spine.documents, spine.documents):
+        self.assertListEqual(list(attached_lengths.keys), lengths.keys)
+        self.assertListEqual(list(attached_lengths.starts), lengths.starts)
+        self.assertEqual(attached_lengths.position([4, 4, 1], 3), lengths.position([4, 4, 1], 3))
+
+  def test_nodes_share_indexes(self):
+    epub_file = os.path.join(CONTEXT, "assets", "zip_sample.epub")
+    cache_path = os.path.join(self._temp_path, "cache")
+    cfis = [parse(cfi) for cfi in ("epubcfi(/6/16!:32)", "epubcfi(/6/24!)", "epubcfi(/6/16!/4/2:3)")]
+    results: list[list] = []
+    histograms: list[HistogramSink] = []
+
+    for _ in range(2):
+      metrics = Metrics()
+      histograms.append(HistogramSink())
+      metrics.add_sink(histograms[-1])
+      with EpubNode(cache_path=cache_path, metrics=metrics, shared_indexes=True) as epub:
+        results.append([(epub.ncx_label(epub_file, cfi), epub.progress(epub_file, cfi)) for cfi in cfis])
+
+    self.assertListEqual(results[0], results[1])
+    self.assertEqual(results[0][0][0], "Introduction")
+    self.assertEqual(histograms[0].cache("epub.shared_book"), (0, 1))
+    self.assertEqual(histograms[1].cache("epub.shared_book"), (1, 0))
+    self.assertEqual(histograms[1].cache("epub.shared_spine"), (1, 0))
+    self.assertIsNone(histograms[1].timing("epub.pick"))
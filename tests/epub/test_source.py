@@ -0,0 +1,149 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from threading import Barrier
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from epubcfi.cfi import parse
+from epubcfi.epub import EpubNode
+from epubcfi.epub.source import MappedDocument, DocumentSources
+from epubcfi.epub.stepper import forward_steps, collect_lengths, collect_text
+
+CONTEXT = os.path.dirname(os.path.abspath(__file__))
+ARTICLE = os.path.join(CONTEXT, "assets", "article.epub", "OEBPS")
+
+class TestSource(unittest.TestCase):
+
+  def setUp(self):
+    self._temp_path = tempfile.mkdtemp()
+
+  def tearDown(self):
+    shutil.rmtree(self._temp_path)
+
+  def test_reader(self):
+    file_path = os.path.join(self._temp_path, "document.xhtml")
+    with open(file_path, "wb") as file:
+      file.write(b"0123456789")
+
+    document = MappedDocument(file_path)
+    reader = document.reader()
+    self.assertEqual(len(document), 10)
+    self.assertEqual(reader.read(4), b"0123")
+    self.assertEqual(reader.tell(), 4)
+    self.assertEqual(reader.read(), b"456789")
+    self.assertEqual(reader.read(), b"")
+    self.assertEqual(reader.seek(-3, os.SEEK_END), 7)
+    self.assertListEqual([bytes(chunk) for chunk in reader.chunks(2)], [b"78", b"9"])
+    self.assertEqual(reader.tell(), 10)
+    self.assertEqual(bytes(document.view(2, 5)), b"234")
+
+    # readers of one document keep their own position
+    other = document.reader()
+    self.assertEqual(other.read(2), b"01")
+    self.assertEqual(reader.tell(), 10)
+    document.close()
+
+    empty_path = os.path.join(self._temp_path, "empty.xhtml")
+    with open(empty_path, "wb"):
+      pass
+    empty = MappedDocument(empty_path)
+    self.assertEqual(len(empty), 0)
+    self.assertEqual(empty.reader().read(), b"")
+    empty.close()
+
+  def test_stepper(self):
+    sources = DocumentSources()
+    for name in ("chapter1.xhtml", "chapter2.xhtml"):
+      file_path = os.path.join(ARTICLE, name)
+      with open(file_path, "rb") as reader:
+        expected_lengths = collect_lengths(reader)
+      with open(file_path, "rb") as reader:
+        expected_tags = forward_steps(reader, [4, 2])
+      with open(file_path, "rb") as reader:
+        expected_text = collect_text(reader, [4, 2, 1], 0, [4, 2, 1], 5)
+
+      self.assertEqual(collect_lengths(sources.reader(file_path)), expected_lengths)
+      self.assertEqual(forward_steps(sources.reader(file_path), [4, 2]), expected_tags)
+      self.assertEqual(collect_text(sources.reader(file_path), [4, 2, 1], 0, [4, 2, 1], 5), expected_text)
+    sources.close()
+
+  def test_concurrent_readers(self):
+    file_path = os.path.join(ARTICLE, "chapter1.xhtml")
+    with open(file_path, "rb") as reader:
+      expected = collect_lengths(reader)
+
+    sources = DocumentSources()
+    barrier = Barrier(8)
+    def read(_) -> tuple:
+      barrier.wait()
+      return collect_lengths(sources.reader(file_path))
+
+    # the threads share a single mapping of the document
+    with patch("epubcfi.epub.source.MappedDocument", wraps=MappedDocument) as mapped:
+      with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(read, range(8)))
+    self.assertEqual(mapped.call_count, 1)
+    self.assertTrue(all(result == expected for result in results))
+    sources.close()
+
+  def test_changed_file(self):
+    file_path = os.path.join(self._temp_path, "document.xhtml")
+    with open(file_path, "wb") as file:
+      file.write(b"<html><body><p>first</p></body></html>")
+
+    sources = DocumentSources()
+    reader = sources.reader(file_path)
+    self.assertEqual(reader.read(6), b"<html>")
+
+    # replaced as a whole, as the extracted files are
+    temp_path = f"{file_path}.part"
+    with open(temp_path, "wb") as file:
+      file.write(b"<html><body><p>second version</p></body></html>")
+    os.replace(temp_path, file_path)
+    self.assertEqual(collect_text(sources.reader(file_path), [2, 2, 1], 0, [2, 2, 1], 6), "second")
+    # the first mapping still reads the file it mapped
+    self.assertEqual(reader.read(6), b"<body>")
+    sources.close()
+
+  def test_truncated_file(self):
+    file_path = os.path.join(self._temp_path, "document.xhtml")
+    data = b"<html><body>" + b"<p>first</p>" * 100_000 + b"</body></html>"
+    with open(file_path, "wb") as file:
+      file.write(data)
+
+    # the documents of a directory book are not mapped, truncating a mapped file in place
+    # would kill the process with SIGBUS
+    sources = DocumentSources(mapped=False)
+    with sources.reader(file_path) as reader:
+      self.assertEqual(reader.read(6), b"<html>")
+      with open(file_path, "r+b") as file:
+        file.truncate(0)
+      self.assertLess(len(reader.read()), len(data) - 6)
+
+    with open(file_path, "wb") as file:
+      file.write(b"<html><body><p>second version</p></body></html>")
+    with sources.reader(file_path) as reader:
+      self.assertEqual(collect_text(reader, [2, 2, 1], 0, [2, 2, 1], 6), "second")
+    sources.close()
+
+  def test_node_edited_in_place(self):
+    book_path = os.path.join(self._temp_path, "article.epub")
+    shutil.copytree(os.path.dirname(ARTICLE), book_path)
+    chapter_path = os.path.join(book_path, "OEBPS", "chapter1.xhtml")
+    cfi = parse("epubcfi(/6/2!/4/4)")
+
+    with EpubNode(cache_path=os.path.join(self._temp_path, "cache")) as epub:
+      self.assertEqual(epub.extract_text(book_path, cfi), "It was a bright cold day in April.")
+      with open(chapter_path, "r", encoding="utf8") as file:
+        chapter = file.read()
+      with open(chapter_path, "r+b") as file:
+        file.truncate(0)
+      with open(chapter_path, "w", encoding="utf8") as file:
+        file.write(chapter.replace("April", "May"))
+      self.assertEqual(epub.extract_text(book_path, cfi), "It was a bright cold day in May.")
+
+if __name__ == "__main__":
+  unittest.main()
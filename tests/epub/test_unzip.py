@@ -0,0 +1,168 @@
+import os
+import shutil
+import zipfile
+import tempfile
+import unittest
+
+from epubcfi.cfi import parse
+from epubcfi.epub import EpubNode
+from epubcfi.epub.unzip import Unzip
+
+CONTEXT = os.path.dirname(os.path.abspath(__file__))
+ARTICLE_PATH = os.path.join(CONTEXT, "assets", "article.epub")
+
+class TestUnzip(unittest.TestCase):
+
+  def setUp(self):
+    self._temp_path = tempfile.mkdtemp()
+    self._epub_path = os.path.join(self._temp_path, "article.epub")
+    self._mtime: int = 1_600_000_000
+    self._members: dict[str, bytes] = {}
+    for root, _, files in os.walk(ARTICLE_PATH):
+      for file_name in files:
+        file_path = os.path.join(root, file_name)
+        member = os.path.relpath(file_path, ARTICLE_PATH).replace(os.path.sep, "/")
+        with open(file_path, "rb") as file:
+          self._members[member] = file.read()
+    self._write_epub({})
+
+  def tearDown(self):
+    shutil.rmtree(self._temp_path)
+
+  def test_incremental_extraction(self):
+    unzip = Unzip(os.path.join(self._temp_path, "cache"), incremental=True)
+    to_path, changes = unzip.unzip_file_changes(self._epub_path)
+    self.assertIsNone(changes)
+    self.assertEqual(unzip.unzip_file_changes(self._epub_path), (to_path, set()))
+
+    self._write_epub({
+      "OEBPS/chapter1.xhtml": b"<html><body><p>Rewritten.</p></body></html>",
+      "OEBPS/chapter2.xhtml": None,
+      "OEBPS/chapter3.xhtml": b"<html><body><p>Added.</p></body></html>",
+    })
+    to_path, changes = unzip.unzip_file_changes(self._epub_path)
+    self.assertSetEqual(changes, {
+      "OEBPS/chapter1.xhtml",
+      "OEBPS/chapter2.xhtml",
+      "OEBPS/chapter3.xhtml",
+    })
+    self.assertFalse(os.path.exists(os.path.join(to_path, "OEBPS", "chapter2.xhtml")))
+    with open(os.path.join(to_path, "OEBPS", "chapter1.xhtml"), "rb") as file:
+      self.assertEqual(file.read(), b"<html><body><p>Rewritten.</p></body></html>")
+
+  def test_full_extraction(self):
+    unzip = Unzip(os.path.join(self._temp_path, "cache"))
+    unzip.unzip_file_changes(self._epub_path)
+    self._write_epub({ "OEBPS/chapter3.xhtml": b"<html/>" })
+    _, changes = unzip.unzip_file_changes(self._epub_path)
+    self.assertIsNone(changes)
+
+  def test_shared_extraction(self):
+    unzip = Unzip(os.path.join(self._temp_path, "cache"))
+    to_path = unzip.unzip_file(self._epub_path)
+
+    # a copy under another path, then a rename, find the same extraction
+    copy_path = os.path.join(self._temp_path, "tenant", "copy.epub")
+    os.makedirs(os.path.dirname(copy_path))
+    shutil.copyfile(self._epub_path, copy_path)
+    self.assertEqual(unzip.unzip_file_changes(copy_path), (to_path, None))
+    moved_path = os.path.join(self._temp_path, "moved.epub")
+    os.rename(copy_path, moved_path)
+    self.assertEqual(Unzip(os.path.join(self._temp_path, "cache")).unzip_file(moved_path), to_path)
+
+    # a new mtime alone is not a new book
+    os.utime(self._epub_path, (self._mtime + 5, self._mtime + 5))
+    self.assertEqual(unzip.unzip_file_changes(self._epub_path), (to_path, set()))
+    self.assertEqual(unzip.fingerprint(self._epub_path), unzip.fingerprint(moved_path))
+    self.assertNotEqual(Unzip(self._temp_path, full_hash=True).fingerprint(moved_path), unzip.fingerprint(moved_path))
+
+    self._write_epub({ "OEBPS/chapter3.xhtml": b"<html/>" })
+    self.assertNotEqual(unzip.unzip_file(self._epub_path), to_path)
+    self.assertEqual(unzip.unzip_file(moved_path), to_path)
+    # the moved copy still uses the first version, so it was kept
+    self.assertTrue(os.path.isdir(to_path))
+
+  def test_removed_versions(self):
+    cache_path = os.path.join(self._temp_path, "cache")
+    removed: list[str] = []
+    unzip = Unzip(cache_path, on_remove=removed.append)
+    first_path = unzip.unzip_file(self._epub_path)
+
+    # another process may still read the first version, it stays until the cache is pruned
+    self._write_epub({ "OEBPS/chapter3.xhtml": b"<html/>" })
+    second_path = unzip.unzip_file(self._epub_path)
+    self.assertTrue(os.path.isdir(first_path))
+    self.assertListEqual(unzip.prune(), [os.path.basename(first_path)])
+    self.assertListEqual(removed, [first_path])
+    self.assertFalse(os.path.exists(first_path))
+    self.assertFalse(os.path.exists(f"{first_path}.manifest"))
+    self.assertTrue(os.path.isdir(second_path))
+
+    # a deleted book leaves its version behind while a copy or a caller still uses it
+    copy_path = os.path.join(self._temp_path, "copy.epub")
+    shutil.copyfile(self._epub_path, copy_path)
+    self.assertEqual(unzip.unzip_file(copy_path), second_path)
+    os.remove(self._epub_path)
+    self.assertListEqual(unzip.prune(), [])
+    os.remove(copy_path)
+    self.assertListEqual(unzip.prune(keep=[second_path]), [])
+    self.assertTrue(os.path.isdir(second_path))
+    self.assertListEqual(unzip.prune(), [os.path.basename(second_path)])
+    self.assertFalse(os.path.exists(second_path))
+    self.assertListEqual(os.listdir(cache_path), [])
+
+  def test_node_prunes_search_indexes(self):
+    cache_path = os.path.join(self._temp_path, "cache")
+    search_path = os.path.join(cache_path, "search")
+    with EpubNode(cache_path=cache_path, incremental=True) as epub:
+      self.assertGreater(len(epub.search(self._epub_path, "April")), 0)
+      indexes = os.listdir(search_path)
+      self.assertEqual(len(indexes), 1)
+
+      self._write_epub({ "OEBPS/chapter3.xhtml": b"<html/>" })
+      self.assertGreater(len(epub.search(self._epub_path, "April")), 0)
+      self.assertListEqual(os.listdir(search_path), indexes)
+      # the loaded version is kept, the previous one goes with its indexes
+      self.assertEqual(len(epub.prune()), 1)
+      self.assertNotIn(indexes[0], os.listdir(search_path))
+      self.assertGreater(len(epub.search(self._epub_path, "April")), 0)
+
+  def test_node_invalidates_changed_documents(self):
+    cfi = parse("epubcfi(/6/2!/4/4)")
+    with EpubNode(cache_path=os.path.join(self._temp_path, "cache"), incremental=True) as epub:
+      self.assertEqual(epub.extract_text(self._epub_path, cfi), "It was a bright cold day in April.")
+      self.assertEqual(epub.ncx_label(self._epub_path, cfi), "Chapter One")
+
+      with open(os.path.join(ARTICLE_PATH, "OEBPS", "chapter1.xhtml"), "r", encoding="utf8") as file:
+        chapter = file.read().replace("April", "May")
+      self._write_epub({ "OEBPS/chapter1.xhtml": chapter.encode("utf8") })
+      self.assertEqual(epub.extract_text(self._epub_path, cfi), "It was a bright cold day in May.")
+
+      with open(os.path.join(ARTICLE_PATH, "OEBPS", "toc.ncx"), "r", encoding="utf8") as file:
+        ncx = file.read().replace("Chapter One", "The First Chapter")
+      self._write_epub({ "OEBPS/toc.ncx": ncx.encode("utf8") })
+      self.assertEqual(epub.ncx_label(self._epub_path, cfi), "The First Chapter")
+
+  def test_node_keeps_loaded_book(self):
+    cfi = parse("epubcfi(/6/2!/4/4)")
+    with EpubNode(cache_path=os.path.join(self._temp_path, "cache")) as epub:
+      self.assertEqual(epub.extract_text(self._epub_path, cfi), "It was a bright cold day in April.")
+      with open(os.path.join(ARTICLE_PATH, "OEBPS", "chapter1.xhtml"), "r", encoding="utf8") as file:
+        chapter = file.read().replace("April", "May")
+      self._write_epub({ "OEBPS/chapter1.xhtml": chapter.encode("utf8") })
+      # without incremental, the book is not checked again while it stays cached
+      self.assertEqual(epub.extract_text(self._epub_path, cfi), "It was a bright cold day in April.")
+
+  def _write_epub(self, replaced: dict[str, bytes | None]):
+    for member, data in replaced.items():
+      if data is None:
+        self._members.pop(member, None)
+      else:
+        self._members[member] = data
+
+    with zipfile.ZipFile(self._epub_path, "w") as zip_file:
+      for member, data in self._members.items():
+        zip_file.writestr(member, data)
+    # every version gets its own mtime, even when written within the same second
+    self._mtime += 10
+    os.utime(self._epub_path, (self._mtime, self._mtime))
@@ -1,7 +1,7 @@
 import unittest
 
 from dataclasses import dataclass
-from epubcfi.epub.utils import SizeLimitMap
+from epubcfi.epub.utils import SizeLimitMap, DocumentCache, estimate_size
 
 
 @dataclass
@@ -60,3 +60,63 @@ class TestUtils(unittest.TestCase):
       [True, True, False, False, False],
     )
 
+
+  def test_size_limit_map_bytes(self):
+    closed: list[str] = []
+    limit_map: SizeLimitMap[str] = SizeLimitMap(
+      limit=10,
+      on_close=closed.append,
+      byte_limit=10,
+      size_of=len,
+    )
+    limit_map["a"] = "aaaa"
+    limit_map["b"] = "bbbb"
+    self.assertEqual(limit_map.size(), 8)
+    limit_map["c"] = "cccc"
+    self.assertListEqual(closed, ["aaaa"])
+    self.assertListEqual(list(limit_map.keys()), ["b", "c"])
+
+    # a value alone over the limit stays until the next one comes
+    limit_map["d"] = "d" * 20
+    self.assertListEqual(closed, ["aaaa", "bbbb", "cccc"])
+    self.assertListEqual(list(limit_map.keys()), ["d"])
+    with self.assertRaises(ValueError):
+      SizeLimitMap(limit=1, on_close=closed.append, byte_limit=10)
+
+  def test_size_limit_map_running_size(self):
+    measured: list[int] = []
+    def size_of(value: list[int]) -> int:
+      measured.append(len(value))
+      return len(value)
+
+    limit_map: SizeLimitMap[list[int]] = SizeLimitMap(
+      limit=1000,
+      on_close=lambda _: None,
+      byte_limit=10_000,
+      size_of=size_of,
+    )
+    for i in range(100):
+      limit_map[str(i)] = [i]
+    # each value is measured when stored and once more with the next one, never all of them
+    self.assertEqual(limit_map.size(), 100)
+    self.assertLessEqual(len(measured), 200)
+
+    # the value used last grew after it was stored
+    grown = limit_map["99"]
+    limit_map["99"] = grown
+    grown.extend(range(9))
+    limit_map["100"] = [100]
+    self.assertEqual(limit_map.size(), 110)
+    self.assertEqual(len(limit_map["5"]), 1)
+    self.assertEqual(limit_map.size(), 109)
+
+  def test_document_cache_sizes(self):
+    documents = DocumentCache()
+    documents.set("a.xhtml", "lengths", [1, 2, 3])
+    table = documents.table("content.opf", "content_paths")
+    empty_size = documents.size
+    table[(6, 2)] = "./a.xhtml"
+    self.assertGreater(documents.size, empty_size)
+    self.assertEqual(documents.sizes()["lengths"], estimate_size([1, 2, 3]))
+    documents.invalidate(["a.xhtml"])
+    self.assertNotIn("lengths", documents.sizes())
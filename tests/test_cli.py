@@ -0,0 +1,88 @@
+import io
+import os
+import json
+import shutil
+import unittest
+import tempfile
+
+from argparse import Namespace
+from epubcfi.cli import _create_parser, _Command, _scan
+
+CONTEXT = os.path.dirname(os.path.abspath(__file__))
+
+class TestCLI(unittest.TestCase):
+
+  def setUp(self):
+    # pylint: disable=consider-using-with
+    self._input = tempfile.NamedTemporaryFile("w", encoding="utf8", suffix=".txt", delete=False)
+    self._input.write("\n".join([
+      "book.epub#epubcfi(/6/4[chap^]01]!/4/10:3)",
+      "epubcfi(/6/2!/4/6)",
+      "not a cfi",
+      "epubcfi(/6/2!/4/4/1:7)",
+    ]))
+    self._input.close()
+
+  def tearDown(self):
+    os.remove(self._input.name)
+
+  def test_validate(self):
+    code, output, errors = self._run("validate", self._input.name, "--stats")
+    self.assertEqual(code, 1)
+    self.assertListEqual(output.splitlines(), [
+      "book.epub#epubcfi(/6/4[chap^]01]!/4/10:3)",
+      "epubcfi(/6/2!/4/6)",
+      "epubcfi(/6/2!/4/4/1:7)",
+    ])
+    self.assertTrue(errors.startswith("not a cfi\tValueError"))
+    self.assertIn("validate: 4 records, 1 failed", errors)
+
+  def test_sort(self):
+    for workers in ("0", "2"):
+      code, output, _ = self._run("sort", self._input.name, "--workers", workers)
+      self.assertEqual(code, 1)
+      self.assertListEqual(output.splitlines(), [
+        "epubcfi(/6/2!/4/4/1:7)",
+        "epubcfi(/6/2!/4/6)",
+        "book.epub#epubcfi(/6/4[chap^]01]!/4/10:3)",
+      ])
+
+  def test_label_jsonl(self):
+    epub_file = os.path.join(CONTEXT, "epub", "assets", "article.epub")
+    with open(self._input.name, "w", encoding="utf8") as file:
+      for cfi in ("epubcfi(/6/4!/4/2)", "epubcfi(/6/2!/4/6)", "epubcfi(/6/2!/4/6"):
+        file.write(json.dumps({ "cfi": cfi, "epub": epub_file }))
+        file.write("\n")
+
+    code, output, _ = self._run("label", self._input.name, "--jsonl", "--workers", "1")
+    records = [json.loads(line) for line in output.splitlines()]
+    self.assertEqual(code, 1)
+    self.assertListEqual(
+      [record.get("label") for record in records],
+      ["Chapter Two", "Chapter One", None],
+    )
+    self.assertIn("error", records[2])
+
+  def test_scan(self):
+    with tempfile.TemporaryDirectory() as temp_path:
+      root_path = os.path.join(temp_path, "books")
+      os.makedirs(root_path)
+      shutil.copyfile(os.path.join(CONTEXT, "epub", "assets", "zip_sample.epub"), os.path.join(root_path, "a.epub"))
+      with open(os.path.join(root_path, "b.epub"), "wb") as file:
+        file.write(b"not a zip")
+
+      args = _create_parser().parse_args([
+        "scan", root_path, "--catalog", os.path.join(temp_path, "catalog.db"), "--workers", "0", "--stats",
+      ])
+      errors = io.StringIO()
+      self.assertEqual(_scan(args, errors), 1)
+      lines = errors.getvalue().splitlines()
+      self.assertTrue(lines[0].startswith(f"{os.path.join(root_path, 'b.epub')}\tBadZipFile"))
+      self.assertIn("scan: 2 books, 2 scanned, 0 skipped, 1 failed", lines[1])
+
+  def _run(self, *argv: str) -> tuple[int, str, str]:
+    args: Namespace = _create_parser().parse_args(argv)
+    output = io.StringIO()
+    errors = io.StringIO()
+    code = _Command(args, output, errors).run()
+    return code, output.getvalue(), errors.getvalue()
@@ -0,0 +1,32 @@
+import unittest
+
+import epubcfi
+import epubcfi.cfi
+import epubcfi.epub
+
+CFI_NAMES = (
+  "union_ranges", "intersect_ranges", "subtract_ranges", "locate_in_ranges",
+  "PathColumns", "path_key", "PathStore", "reconcile", "Reconciliation", "SpatialIndex", "element_key",
+)
+EPUB_NAMES = (
+  "EpubNode", "MemoryReport", "BookMemory", "EpubBatch", "BatchItem", "BatchProgress",
+  "Catalog", "CatalogEntry", "ScanProgress",
+)
+
+class TestExports(unittest.TestCase):
+
+  def test_cfi_names(self):
+    for name in (*epubcfi.cfi.__all__, *CFI_NAMES):
+      self.assertIs(getattr(epubcfi, name), getattr(epubcfi.cfi, name))
+      self.assertIn(name, dir(epubcfi))
+    # the helpers of epubcfi.cfi do not leak through the star import
+    self.assertFalse(hasattr(epubcfi, "import_module"))
+
+  def test_epub_names(self):
+    for name in EPUB_NAMES:
+      self.assertIs(getattr(epubcfi, name), getattr(epubcfi.epub, name))
+      self.assertIn(name, dir(epubcfi))
+
+  def test_missing_name(self):
+    with self.assertRaises(AttributeError):
+      getattr(epubcfi, "missing_name")
@@ -0,0 +1,42 @@
+import os
+import sys
+import unittest
+import subprocess
+
+XML_MODULES = ("lxml", "pyexpat", "xml.parsers.expat")
+PROJECT_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class TestImportTime(unittest.TestCase):
+
+  # what is imported says more about the startup cost than a timing, which depends on the machine
+  def test_cfi_loads_no_xml(self):
+    modules = _loaded_modules("import epubcfi.cfi")
+    self.assertIn("epubcfi.cfi", modules)
+    xml_modules = [name for name in modules if name.startswith(XML_MODULES)]
+    self.assertListEqual(xml_modules, [])
+
+  def test_epub_loads_xml_on_first_use(self):
+    output = subprocess.run(
+      [sys.executable, "-c", "\n".join([
+        "import sys",
+        "from epubcfi.epub import EpubNode",
+        "print('lxml' in sys.modules, 'pyexpat' in sys.modules)",
+        "from epubcfi.epub.picker import pick",
+        "pick('tests/epub/assets/sample.epub')",
+        "print('lxml' in sys.modules)",
+      ])],
+      cwd=PROJECT_PATH,
+      capture_output=True,
+      check=True,
+      text=True,
+    ).stdout
+    self.assertEqual(output.split(), ["False", "False", "True"])
+
+def _loaded_modules(statement: str) -> list[str]:
+  return subprocess.run(
+    [sys.executable, "-c", f"{statement}\nimport sys\nprint('\\n'.join(sys.modules))"],
+    cwd=PROJECT_PATH,
+    capture_output=True,
+    check=True,
+    text=True,
+  ).stdout.split()
@@ -0,0 +1,61 @@
+import os
+import unittest
+
+from epubcfi.cfi import parse
+from epubcfi.epub import EpubNode
+from epubcfi.metrics import Metrics, MetricEvent, HistogramSink, LoggingSink, add_sink, remove_sink
+
+CONTEXT = os.path.dirname(os.path.abspath(__file__))
+
+class TestMetrics(unittest.TestCase):
+
+  def test_epub_stages(self):
+    metrics = Metrics()
+    histogram = HistogramSink()
+    metrics.add_sink(histogram)
+    epub_file = os.path.join(CONTEXT, "epub", "assets", "zip_sample.epub")
+
+    with EpubNode(remove_cache_path=True, metrics=metrics) as epub:
+      for cfi, expected_label in (
+        ("sample.epub#epubcfi(/6/16!:32)", "Introduction"),
+        ("sample.epub#epubcfi(/6/24!)", "II. Lack in the Other"),
+        ("sample.epub#epubcfi(/6/16!/4/2:3)", "Introduction"),
+      ):
+        label = epub.ncx_label(epub_file, parse(cfi))
+        self.assertEqual(label, expected_label)
+
+    summary = histogram.summary()
+    self.assertEqual(summary["timings"]["epub.unzip"]["count"], 1)
+    self.assertEqual(summary["timings"]["epub.pick"]["count"], 1)
+    self.assertEqual(summary["timings"]["epub.forward_steps"]["count"], 2)
+    self.assertEqual(summary["timings"]["epub.ncx_scan"]["count"], 3)
+    self.assertGreater(histogram.counter("epub.bytes_decompressed"), 0)
+    self.assertGreater(histogram.counter("epub.xml_events"), 0)
+    self.assertEqual(histogram.cache("epub.books"), (2, 1))
+    self.assertEqual(histogram.cache("epub.extraction"), (0, 1))
+
+  def test_parser_and_logging(self):
+    histogram = HistogramSink()
+    logging_sink = LoggingSink()
+    add_sink(histogram)
+    add_sink(logging_sink)
+    try:
+      with self.assertLogs("epubcfi.metrics", level="DEBUG") as logs:
+        parse("epubcfi(/6/4[chap01ref]!/4/10/3:10)")
+    finally:
+      remove_sink(histogram)
+      remove_sink(logging_sink)
+
+    self.assertEqual(histogram.timing("cfi.parse")["count"], 1)
+    self.assertTrue(logs.output[0].startswith("DEBUG:epubcfi.metrics:timing cfi.parse"))
+
+  def test_histogram_percentiles(self):
+    histogram = HistogramSink()
+    for i in range(1, 101):
+      histogram(MetricEvent("timing", "stage", i / 1000.0))
+    timing = histogram.timing("stage")
+    self.assertEqual(timing["count"], 100)
+    self.assertAlmostEqual(timing["mean"], 0.0505)
+    self.assertLess(abs(timing["p50"] - 0.05) / 0.05, 0.2)
+    self.assertLess(abs(timing["p99"] - 0.099) / 0.099, 0.2)
+    self.assertEqual(timing["max"], 0.1)
@@ -0,0 +1,117 @@
+import os
+import socket
+import asyncio
+import tempfile
+import threading
+import unittest
+
+from epubcfi.server import EpubServer, EpubClient, RemoteException
+
+CONTEXT = os.path.dirname(os.path.abspath(__file__))
+
+@unittest.skipUnless(hasattr(socket, "AF_UNIX"), "unix domain sockets are not available")
+class TestServer(unittest.TestCase):
+
+  def setUp(self):
+    self._temp_path = tempfile.mkdtemp()
+    self._socket_path = os.path.join(self._temp_path, "epubcfi.sock")
+    self._server = EpubServer(self._socket_path, max_concurrency=2)
+    self._thread = threading.Thread(target=lambda: asyncio.run(self._server.serve()))
+    self._thread.start()
+    self.assertTrue(self._server.wait_ready(timeout=10.0))
+
+  def tearDown(self):
+    self._server.shutdown()
+    self._thread.join(timeout=10.0)
+    self.assertFalse(self._thread.is_alive())
+    self.assertFalse(os.path.exists(self._socket_path))
+    os.rmdir(self._temp_path)
+
+  def test_socket_in_use(self):
+    # a second server must not take the socket of one that answers
+    with self.assertRaises(FileExistsError):
+      asyncio.run(EpubServer(self._socket_path).serve())
+    with EpubClient(self._socket_path, timeout=10.0) as client:
+      self.assertDictEqual(client.request("parse", cfi="epubcfi(/6/4)"), { "cfi": "/6/4", "type": "path" })
+
+  def test_stale_socket(self):
+    stale_path = os.path.join(self._temp_path, "stale.sock")
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as stale_socket:
+      stale_socket.bind(stale_path)
+    self.assertTrue(os.path.exists(stale_path))
+
+    server = EpubServer(stale_path)
+    thread = threading.Thread(target=lambda: asyncio.run(server.serve()))
+    thread.start()
+    try:
+      self.assertTrue(server.wait_ready(timeout=10.0))
+      with EpubClient(stale_path, timeout=10.0) as client:
+        self.assertDictEqual(client.request("parse", cfi="epubcfi(/6/4)"), { "cfi": "/6/4", "type": "path" })
+    finally:
+      server.shutdown()
+      thread.join(timeout=10.0)
+    self.assertFalse(os.path.exists(stale_path))
+
+  def test_requests(self):
+    epub_file = os.path.join(CONTEXT, "epub", "assets", "zip_sample.epub")
+    with EpubClient(self._socket_path, timeout=10.0) as client:
+      self.assertDictEqual(
+        client.request("parse", cfi="book.epub#epubcfi(/6/4,!/2[foo^,bar],/10)"),
+        { "cfi": "/6/4,!/2[foo^,bar],/10", "type": "range" },
+      )
+      self.assertListEqual(
+        client.request("sort", cfis=["epubcfi(/6/4:23)", "epubcfi(/6/4/123)", "epubcfi(/6/4)"]),
+        ["epubcfi(/6/4)", "epubcfi(/6/4/123)", "epubcfi(/6/4:23)"],
+      )
+      self.assertEqual(client.request("label", epub=epub_file, cfi="epubcfi(/6/16!:32)"), "Introduction")
+      self.assertEqual(
+        client.request("resolve", epub=epub_file, cfi="epubcfi(/6/24!)"),
+        "./10_Part02JohnBr5372ownvlthmfuwrmefxonbsyetochqcom.xhtml",
+      )
+      article_file = os.path.join(CONTEXT, "epub", "assets", "article.epub")
+      self.assertAlmostEqual(client.request("progress", epub=article_file, cfi="epubcfi(/6/4!/4/2)"), 119 / 253)
+      self.assertListEqual(
+        client.request("search", epub=article_file, query="bright cold day"),
+        ["epubcfi(/6/2!/4/4/1,:9,:24)"],
+      )
+      nav_file = os.path.join(CONTEXT, "epub", "assets", "nav.epub")
+      audio_path = os.path.join(".", "OEBPS", "audio", "chapter1.mp3")
+      self.assertListEqual(
+        client.request("overlay_time", epub=nav_file, cfi="epubcfi(/6/2!/4/6~2)"),
+        [audio_path, 6.5],
+      )
+      self.assertListEqual(
+        [clip and clip["fragment"] for clip in client.request(
+          "overlay_clips", epub=nav_file, audio=audio_path, times=[0.5, 4.2, 5.0],
+        )],
+        ["c1", None, "p2"],
+      )
+      # an open end is sent as null, JSON has no Infinity
+      self.assertIsNone(client.request(
+        "overlay_clips", epub=nav_file, audio=os.path.join(".", "OEBPS", "audio", "chapter2.mp3"), times=[45.0],
+      )[0]["end"])
+      memory = client.request("memory")
+      self.assertEqual(len(memory["books"]), 3)
+      self.assertEqual(memory["size"], sum(book["size"] for book in memory["books"]))
+      with self.assertRaises(RemoteException):
+        client.request("parse", cfi="epubcfi(/6/04)")
+
+  def test_pipeline_and_batch(self):
+    epub_file = os.path.join(CONTEXT, "epub", "assets", "zip_sample.epub")
+    requests = [
+      { "op": "label", "epub": epub_file, "cfi": f"epubcfi(/6/{index * 2}!)" }
+      for index in range(1, 21)
+    ]
+    requests.append({ "op": "batch", "requests": [
+      { "op": "label", "epub": epub_file, "cfi": "epubcfi(/6/24!)" },
+      { "op": "unknown" },
+    ]})
+    with EpubClient(self._socket_path, timeout=10.0) as client:
+      responses = client.pipeline(requests)
+
+    self.assertEqual(len(responses), 21)
+    self.assertTrue(all(response["ok"] for response in responses))
+    self.assertEqual(responses[7]["result"], "Introduction")
+    batch = responses[20]["result"]
+    self.assertEqual(batch[0], { "ok": True, "result": "II. Lack in the Other" })
+    self.assertFalse(batch[1]["ok"])